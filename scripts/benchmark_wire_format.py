@@ -0,0 +1,70 @@
+"""
+Compare sending meshes through the load queue as a pickled Trimesh
+with sending them as a WireMesh, with and without compression.
+
+Run with:
+
+    python scripts/benchmark_wire_format.py [--max-faces N]
+"""
+
+import argparse
+import math
+from multiprocessing.reduction import ForkingPickler
+from time import perf_counter
+from typing import Any, Callable
+
+from manifold3d import Manifold
+
+from scadview.api.utils import manifold_to_trimesh
+from scadview.mesh_transport import decode_wire_mesh, encode_wire_mesh
+
+FACE_COUNTS = [10_000, 100_000, 1_000_000, 10_000_000]
+# Compress every array, to show what compression costs and saves
+COMPRESS_ALL = 0
+REPEATS = 3
+
+
+def sphere_with_faces(faces: int):
+    # A Manifold sphere with n segments has about n * n / 2 faces
+    return manifold_to_trimesh(Manifold.sphere(1.0, round(math.sqrt(2 * faces))))
+
+
+def best_time(func: Callable[[], Any]) -> tuple[float, Any]:
+    best = math.inf
+    result = None
+    for _ in range(REPEATS):
+        t0 = perf_counter()
+        result = func()
+        best = min(best, perf_counter() - t0)
+    return best, result
+
+
+def measure(name: str, encode: Callable[[], Any], decode: Callable[[Any], Any]):
+    # The load queue pickles with ForkingPickler
+    encode_time, data = best_time(lambda: bytes(ForkingPickler.dumps(encode())))
+    decode_time, _ = best_time(lambda: decode(ForkingPickler.loads(data)))
+    print(
+        f"  {name:<16} {len(data) / 1e6:>10.2f} MB"
+        f" {encode_time * 1000:>10.1f} ms {decode_time * 1000:>10.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-faces", type=int, default=FACE_COUNTS[-1])
+    args = parser.parse_args()
+    for faces in [f for f in FACE_COUNTS if f <= args.max_faces]:
+        mesh = sphere_with_faces(faces)
+        print(f"{len(mesh.faces):,} faces, {len(mesh.vertices):,} vertices")
+        print(f"  {'format':<16} {'size':>13} {'encode':>13} {'decode':>13}")
+        measure("pickled Trimesh", lambda: mesh, lambda m: m)
+        measure("WireMesh", lambda: encode_wire_mesh(mesh), decode_wire_mesh)
+        measure(
+            "WireMesh + zlib",
+            lambda: encode_wire_mesh(mesh, COMPRESS_ALL),
+            decode_wire_mesh,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,10 @@
 
 # This is so the the documetation tools can see these symbols
 if False:
+    from scadview.api.cache import (
+        cache,
+        clear_cache,
+    )
     from scadview.api.colors import (
         Color,
         set_mesh_color,
@@ -11,6 +15,7 @@ if False:
         ProfileType,
         linear_extrude,
     )
+    from scadview.api.parallel import parallel_map
     from scadview.api.surface import (
         mesh_from_heightmap,
         surface,
@@ -25,6 +30,8 @@ if False:
 
 # Things to expose at the top level
 __all__ = [
+    "cache",  # type: ignore[reportUnsupportedDunderAll]
+    "clear_cache",  # type: ignore[reportUnsupportedDunderAll]
     "Color",  # type: ignore[reportUnsupportedDunderAll]
     "set_mesh_color",  # type: ignore[reportUnsupportedDunderAll]
     "ProfileType",  # type: ignore[reportUnsupportedDunderAll]
@@ -35,10 +42,13 @@ __all__ = [
     "text",  # type: ignore[reportUnsupportedDunderAll]
     "text_polys",  # type: ignore[reportUnsupportedDunderAll]
     "manifold_to_trimesh",  # type: ignore[reportUnsupportedDunderAll]
+    "parallel_map",  # type: ignore[reportUnsupportedDunderAll]
 ]
 
 # Map attribute names to (module, attribute) so we can lazy-load
 _lazy_map = {
+    "cache": ("scadview.api.cache", "cache"),
+    "clear_cache": ("scadview.api.cache", "clear_cache"),
     "Color": ("scadview.api.colors", "Color"),
     "set_mesh_color": ("scadview.api.colors", "set_mesh_color"),
     "ProfileType": ("scadview.api.linear_extrude", "ProfileType"),
@@ -49,6 +59,7 @@ _lazy_map = {
     "text": ("scadview.api.text_builder", "text"),
     "text_polys": ("scadview.api.text_builder", "text_polys"),
     "manifold_to_trimesh": ("scadview.api.utils", "manifold_to_trimesh"),
+    "parallel_map": ("scadview.api.parallel", "parallel_map"),
 }
 
 
@@ -1,5 +1,9 @@
 def main():
     # Load modules only when needed to speed up initial import before showing splash
+    import argparse
+    from time import perf_counter
+
+    started = perf_counter()
 
     from scadview.logging_main import (
         DEFAULT_LOG_LEVEL,
@@ -8,14 +12,121 @@ def main():
     )
 
     configure_logging(DEFAULT_LOG_LEVEL)
-    parse_logging_level()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse the stored result of a module that has not changed instead of running create_mesh",
+    )
+    parser.add_argument(
+        "--project-root",
+        help="Also reload changed modules under this directory",
+    )
+    parser.add_argument(
+        "--frames",
+        choices=["latest", "every", "rate"],
+        default="latest",
+        help="Which meshes yielded by create_mesh to show: the latest (default), every one, or at most --max-frame-rate per second",
+    )
+    parser.add_argument(
+        "--max-frame-rate",
+        type=float,
+        default=30.0,
+        help="Meshes shown per second with --frames rate (default 30)",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        metavar="SECONDS",
+        help="Abort a load that runs longer than this",
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        metavar="MB",
+        help="Abort a load whose process uses more memory than this",
+    )
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    export_parser = commands.add_parser(
+        "export",
+        help="Export the mesh of a module without the UI",
+        description="Run create_mesh in a module and export its final mesh, without the UI",
+    )
+    export_parser.add_argument("module", help="The module defining create_mesh")
+    export_parser.add_argument(
+        "-o", "--output", required=True, help="Output file, e.g. model.stl"
+    )
+    export_parser.add_argument(
+        "--format",
+        help="Export format, e.g. 3mf (default: from the output file extension)",
+    )
+    export_parser.add_argument(
+        "--cache",
+        action="store_true",
+        # Not to reset the option when given before the command
+        default=argparse.SUPPRESS,
+        help="Reuse the stored result of a module that has not changed instead of running create_mesh",
+    )
+    batch_parser = commands.add_parser(
+        "batch",
+        help="Export a mesh for each combination of parameters",
+        description="Call create_mesh(**params) for each combination of parameters on a pool of processes, export each mesh and print a JSON summary",
+    )
+    batch_parser.add_argument("module", help="The module defining create_mesh")
+    batch_parser.add_argument(
+        "--param",
+        action="append",
+        metavar="NAME=VALUES",
+        help="A parameter of create_mesh and its values, as a,b,c or start:stop:step with stop included; may be repeated",
+    )
+    batch_parser.add_argument(
+        "-o",
+        "--output",
+        required=True,
+        help="Output file for each job, naming the parameters, e.g. out/{radius}_{height}.stl",
+    )
+    batch_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="Jobs run at once (default: the number of cores)",
+    )
+    args = parse_logging_level(parser)
+    if args.max_frame_rate <= 0:
+        parser.error("--max-frame-rate must be positive")
+    for budget in (args.time_budget, args.memory_budget):
+        if budget is not None and budget <= 0:
+            parser.error("Budgets must be positive")
+
+    if args.command == "export":
+        import sys
+
+        from scadview.headless import run_export
+
+        sys.exit(run_export(args, started))
+    if args.command == "batch":
+        import sys
+
+        from scadview.batch import run_batch_command
+
+        sys.exit(run_batch_command(args))
 
     from scadview.ui.splash import start_splash_process
 
     splash_conn = start_splash_process()
     from scadview.app import main
 
-    main(splash_conn)
+    main(
+        splash_conn,
+        use_result_cache=args.cache,
+        project_root=args.project_root,
+        frame_delivery=args.frames,
+        max_frame_rate=args.max_frame_rate,
+        load_time_budget=args.time_budget,
+        load_rss_budget=None
+        if args.memory_budget is None
+        else int(args.memory_budget * 2**20),
+    )
 
 
 if __name__ == "__main__":
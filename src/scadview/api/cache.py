@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import logging
+import os
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Callable, TypeVar, overload
+
+import numpy as np
+from manifold3d import Manifold
+from trimesh import Trimesh
+
+from scadview.mesh_store import MeshStore
+from scadview.result_cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_ENTRIES = 256
+DISK_MAX_BYTES = 1024**3
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# The memory tier lives in this module, which is not reloaded with the user's
+# module, so entries survive reloads for as long as the loader process runs.
+_memory: OrderedDict[str, Any] = OrderedDict()
+# Keys stored on disk since the last take_new_keys
+_new_keys: list[str] = []
+_lock = threading.Lock()
+_disk_store: MeshStore | None = None
+
+
+def _reset_lock_in_child():
+    global _lock
+    _lock = threading.Lock()
+
+
+# A load may be forked while another thread holds the lock.
+# There is no fork on Windows.
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(
+        before=lambda: _lock.acquire(),
+        after_in_parent=lambda: _lock.release(),
+        after_in_child=_reset_lock_in_child,
+    )
+
+
+@overload
+def cache(func: F) -> F: ...
+
+
+@overload
+def cache(*, disk: bool = True) -> Callable[[F], F]: ...
+
+
+def cache(func: F | None = None, *, disk: bool = True) -> F | Callable[[F], F]:
+    """Memoize a function that builds meshes, so reloads can skip the work.
+
+    Results are keyed on the values of the arguments and the source code of the
+    function, so editing the function invalidates its results. Changes to other
+    functions it calls do not; decorate those separately.
+    Results are kept in memory across reloads and, unless `disk` is False,
+    in a size-bounded cache on disk that also survives restarts.
+
+    Arguments may be None, numbers, strings, bytes, Enums, NumPy arrays,
+    Trimesh and Manifold objects, or lists, tuples and dicts of these.
+    Results may be any of these except dicts and Enums.
+    Each call returns a copy, so the result can be modified freely.
+
+    Use as `@cache` or `@cache(disk=False)`:
+
+    ```python
+    @cache
+    def body(width: float) -> Manifold:
+        ...
+    ```
+
+    Args:
+        func: The function to memoize.
+        disk: Also store results on disk.
+
+    Returns:
+        The memoized function.
+    """
+
+    def decorate(f: F) -> F:
+        source_hash = _source_hash(f)
+
+        @functools.wraps(f)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            key = _call_key(f, source_hash, args, kwargs)
+            found, value = _get(key, disk)
+            if found:
+                logger.debug(f"Cache hit for {f.__qualname__}")
+                return _copy(value)
+            logger.debug(f"Cache miss for {f.__qualname__}")
+            value = f(*args, **kwargs)
+            _put(key, value, disk)
+            return _copy(value)
+
+        return wrapper  # type: ignore[reportReturnType] - wraps keeps the signature
+
+    if func is not None:
+        return decorate(func)
+    return decorate
+
+
+def clear_cache(disk: bool = True):
+    """Remove all memoized results.
+
+    Args:
+        disk: Also remove the results stored on disk.
+    """
+    with _lock:
+        _memory.clear()
+    if disk:
+        _disk().clear()
+
+
+def take_new_keys() -> list[str]:
+    """Keys of results stored on disk since the last call."""
+    global _new_keys
+    with _lock:
+        keys, _new_keys = _new_keys, []
+    return keys
+
+
+def load_from_disk(keys: list[str]):
+    """
+    Bring results stored by another process into the memory tier.
+    Forked loads report their new results this way,
+    so the next forked load starts with them in memory.
+    """
+    for key in keys:
+        values = _disk().get(key)
+        if values is not None:
+            _remember(key, values[0])
+
+
+def _disk() -> MeshStore:
+    global _disk_store
+    if _disk_store is None:
+        _disk_store = MeshStore(
+            os.path.join(default_cache_dir(), "functions"), DISK_MAX_BYTES
+        )
+    return _disk_store
+
+
+def _get(key: str, disk: bool) -> tuple[bool, Any]:
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return True, _memory[key]
+    if disk:
+        values = _disk().get(key)
+        if values is not None:
+            _remember(key, values[0])
+            return True, values[0]
+    return False, None
+
+
+def _put(key: str, value: Any, disk: bool):
+    _remember(key, value)
+    if not disk:
+        return
+    try:
+        _disk().put(key, [value])
+    except (OSError, TypeError) as e:
+        logger.warning(f"Could not store cached result on disk: {e}")
+        return
+    with _lock:
+        _new_keys.append(key)
+
+
+def _remember(key: str, value: Any):
+    with _lock:
+        _memory[key] = value
+        _memory.move_to_end(key)
+        while len(_memory) > MEMORY_MAX_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _source_hash(func: Callable[..., Any]) -> str:
+    try:
+        source = inspect.getsource(func).encode()
+    except (OSError, TypeError):
+        source = func.__code__.co_code
+    return hashlib.sha256(source).hexdigest()
+
+
+def _call_key(
+    func: Callable[..., Any],
+    source_hash: str,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> str:
+    h = hashlib.sha256()
+    h.update(f"{func.__module__}.{func.__qualname__}:{source_hash}".encode())
+    _hash_value(h, args)
+    _hash_value(h, kwargs)
+    return h.hexdigest()
+
+
+def _hash_value(h: Any, value: Any):
+    h.update(type(value).__name__.encode())
+    if value is None or isinstance(value, (bool, int, float, str, Enum)):
+        h.update(repr(value).encode())
+    elif isinstance(value, bytes):
+        h.update(value)
+    elif isinstance(value, np.ndarray):
+        arr: np.ndarray[Any, Any] = np.ascontiguousarray(value)  # pyright: ignore[reportUnknownArgumentType] - any array can be hashed
+        h.update(f"{arr.dtype.str}{arr.shape}".encode())
+        h.update(arr.tobytes())
+    elif isinstance(value, Trimesh):
+        _hash_value(h, np.asarray(value.vertices))
+        _hash_value(h, np.asarray(value.faces))
+    elif isinstance(value, Manifold):
+        mesh = value.to_mesh()
+        _hash_value(h, np.asarray(mesh.vert_properties, dtype=np.float32))
+        _hash_value(h, np.asarray(mesh.tri_verts, dtype=np.uint32))
+    elif isinstance(value, (list, tuple)):
+        h.update(str(len(value)).encode())  # pyright: ignore[reportUnknownArgumentType] - items are untyped
+        for item in value:  # pyright: ignore[reportUnknownVariableType] - items are untyped
+            _hash_value(h, item)
+    elif isinstance(value, dict):
+        h.update(str(len(value)).encode())  # pyright: ignore[reportUnknownArgumentType] - items are untyped
+        for k, v in sorted(value.items(), key=lambda item: repr(item[0])):  # pyright: ignore[reportUnknownVariableType, reportUnknownArgumentType, reportUnknownLambdaType] - items are untyped
+            _hash_value(h, k)
+            _hash_value(h, v)
+    else:
+        raise TypeError(f"Cannot cache a call with an argument of type {type(value)}")
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, Trimesh):
+        return value.copy()
+    if isinstance(value, np.ndarray):
+        return np.array(value)  # pyright: ignore[reportUnknownArgumentType, reportUnknownVariableType] - any array can be copied
+    if isinstance(value, list):
+        return [_copy(v) for v in value]  # pyright: ignore[reportUnknownVariableType] - items are untyped
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)  # pyright: ignore[reportUnknownVariableType] - items are untyped
+    # Manifolds are immutable
+    return value
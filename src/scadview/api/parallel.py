@@ -0,0 +1,452 @@
+"""
+Run a function over many items at once, on worker processes that stay warm.
+
+The loader forks the workers once it has imported the modules every load
+needs, and they live as long as it does, so reloads reuse them.
+Meshes go to and from the workers through shared memory instead of pickles.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
+import signal
+import sys
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Iterable, TypeVar
+
+import numpy as np
+from manifold3d import Manifold, Mesh
+from numpy.typing import NDArray
+from trimesh import Trimesh
+
+from scadview.mesh_transport import (
+    SHARED_MEMORY_SUPPORTED,
+    SharedArrays,
+    share_arrays,
+    take_shared_arrays,
+)
+from scadview.module_loader import (
+    INSTALLED_PACKAGE_DIRS,
+    FileState,
+    ModuleLoader,
+    user_modules,
+)
+
+logger = logging.getLogger(__name__)
+
+# Forking a process that has loaded native libraries is only safe on Linux
+PARALLEL_SUPPORTED = sys.platform == "linux"
+POOL_WORKERS = os.cpu_count() or 1
+# Smaller meshes are pickled with the rest of the message
+SHARED_MIN_BYTES = 64 * 1024
+# How often an idle worker checks that the process that forked it is alive
+PARENT_CHECK_INTERVAL = 1.0
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# (module name, module file, qualified name, whether the module is the user's)
+_Target = tuple[str, str, str, bool]
+
+
+@dataclass
+class _PackedMesh:
+    """A Trimesh or Manifold as its arrays, shared if they are large"""
+
+    manifold: bool
+    arrays: SharedArrays | list[NDArray[Any]]
+    metadata: dict[str, Any] | None = None
+
+
+def _mesh_arrays(value: Trimesh | Manifold) -> list[NDArray[Any]]:
+    if isinstance(value, Manifold):
+        mesh = value.to_mesh()
+        return [mesh.vert_properties, mesh.tri_verts]
+    arrays = [np.asarray(value.vertices), np.asarray(value.faces)]
+    if value.visual is not None and value.visual.kind == "vertex":
+        arrays.append(np.asarray(value.visual.vertex_colors))  # pyright: ignore[reportAttributeAccessIssue, reportUnknownArgumentType] - only ColorVisuals has vertex colors
+    return arrays
+
+
+def _pack(value: Any) -> Any:
+    """The value with the meshes in it, also in lists and tuples, packed"""
+    if isinstance(value, (Trimesh, Manifold)):
+        arrays = _mesh_arrays(value)
+        packed_arrays: SharedArrays | list[NDArray[Any]] = arrays
+        if (
+            SHARED_MEMORY_SUPPORTED
+            and sum(a.nbytes for a in arrays) >= SHARED_MIN_BYTES
+        ):
+            packed_arrays = share_arrays(arrays)
+        if isinstance(value, Manifold):
+            return _PackedMesh(True, packed_arrays)
+        return _PackedMesh(False, packed_arrays, dict(value.metadata))  # pyright: ignore[reportUnknownArgumentType] - trimesh metadata is untyped
+    if isinstance(value, list):
+        return [_pack(v) for v in value]  # pyright: ignore[reportUnknownVariableType] - user values are untyped
+    if isinstance(value, tuple):
+        return tuple(_pack(v) for v in value)  # pyright: ignore[reportUnknownVariableType] - user values are untyped
+    return value
+
+
+def _unpack(value: Any) -> Any:
+    if isinstance(value, _PackedMesh):
+        arrays = value.arrays
+        if isinstance(arrays, SharedArrays):
+            arrays = take_shared_arrays(arrays)
+        if value.manifold:
+            return Manifold(Mesh(vert_properties=arrays[0], tri_verts=arrays[1]))
+        return Trimesh(
+            vertices=arrays[0],
+            faces=arrays[1],
+            vertex_colors=arrays[2] if len(arrays) > 2 else None,
+            metadata=value.metadata,
+            process=False,
+        )
+    if isinstance(value, list):
+        return [_unpack(v) for v in value]  # pyright: ignore[reportUnknownVariableType] - user values are untyped
+    if isinstance(value, tuple):
+        return tuple(_unpack(v) for v in value)  # pyright: ignore[reportUnknownVariableType] - user values are untyped
+    return value
+
+
+def _target(fn: Callable[..., Any]) -> _Target | None:
+    """Where a worker finds the function, or None if it cannot"""
+    module_name = getattr(fn, "__module__", None)
+    qualname = getattr(fn, "__qualname__", None)
+    module = sys.modules.get(module_name or "")
+    path = getattr(module, "__file__", None)
+    if module_name is None or qualname is None or not isinstance(path, str):
+        return None
+    try:
+        if _resolve(module, qualname) is not fn:
+            return None
+    except AttributeError:  # A lambda or a function defined in another
+        return None
+    # Reloaded in the workers when it changes, as it is by the loader
+    user = "." not in module_name and not any(
+        d in path.split(os.sep) for d in INSTALLED_PACKAGE_DIRS
+    )
+    return module_name, path, qualname, user
+
+
+def _resolve(owner: Any, qualname: str) -> Any:
+    for name in qualname.split("."):
+        owner = getattr(owner, name)
+    return owner
+
+
+def _function(
+    target: _Target, project_root: str | None
+) -> tuple[Callable[..., Any], dict[str, FileState]]:
+    """The function, with the states of the user's modules it was loaded from"""
+    module_name, path, qualname, user = target
+    head, _, rest = qualname.partition(".")
+    states: dict[str, FileState] = {}
+    if user:
+        # Read first, so a change made while loading is seen by the next call
+        states = _user_file_states(path, project_root)
+        fn = ModuleLoader(head, project_root).load_function(path)
+    else:
+        fn = getattr(importlib.import_module(module_name), head)
+    return (_resolve(fn, rest) if rest else fn), states
+
+
+def _user_file_states(path: str, project_root: str | None) -> dict[str, FileState]:
+    roots = [os.path.dirname(path) or os.curdir]
+    if project_root:
+        roots.append(project_root)
+    states: dict[str, FileState] = {}
+    for module_path in {path, *user_modules(roots).values()}:
+        state = FileState.read(module_path)
+        if state is not None:
+            states[module_path] = state
+    return states
+
+
+def _unchanged(states: dict[str, FileState]) -> bool:
+    for path, state in states.items():
+        current = FileState.read(path, state)
+        if current is None or current.digest != state.digest:
+            return False
+    return True
+
+
+def _picklable(e: Exception) -> Exception:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+# Set in the workers, where parallel_map runs in the calling process
+_in_worker = False
+
+
+def _worker_main(conn: Connection, project_root: str | None, parent_pid: int):
+    global _in_worker, _pool
+    _in_worker = True
+    _pool = None
+    # Not the handler of the loader it was forked from
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    functions: dict[_Target, tuple[Callable[..., Any], dict[str, FileState]]] = {}
+    call = None
+    while True:
+        try:
+            if not conn.poll(PARENT_CHECK_INTERVAL):
+                if os.getppid() != parent_pid:
+                    return
+                continue
+            task_call, target, index, item = conn.recv()
+        except (EOFError, OSError):
+            return
+        if task_call != call:
+            # Modules are checked for changes once per call,
+            # and only the functions from those that changed are loaded again
+            call = task_call
+            functions = {t: f for t, f in functions.items() if _unchanged(f[1])}
+        try:
+            if target not in functions:
+                functions[target] = _function(target, project_root)
+            message = (
+                task_call,
+                index,
+                True,
+                _pack(functions[target][0](_unpack(item))),
+            )
+        except Exception as e:
+            message = (task_call, index, False, _picklable(e))
+        try:
+            conn.send(message)
+        except Exception as e:  # An unpicklable result; nothing was written
+            conn.send((task_call, index, False, _picklable(e)))
+
+
+class WorkerPool:
+    """
+    Worker processes forked from this process, each on its own pipe.
+    Processes forked from this one after it, like forked loads, can use it too,
+    but one map runs at a time; a map that finds it busy runs in its own process.
+    """
+
+    def __init__(self, workers: int, project_root: str | None = None):
+        self._workers = workers
+        self._project_root = project_root
+        self._owner_pid = os.getpid()
+        self._context = multiprocessing.get_context("fork")
+        # Held for a whole map by whichever thread of whichever process runs it
+        self._lock = self._context.Lock()
+        # The process talking to the workers. If it was killed mid-map,
+        # a pipe may hold part of a message, and the lock is never released,
+        # so the pool must be restarted
+        self._user_pid = self._context.RawValue("i", 0)
+        # Set when a worker died in a process that cannot restart the pool
+        self._broken = self._context.RawValue("i", 0)
+        self._conns: list[Connection] = []
+        self._processes: list[BaseProcess] = []
+        self._calls = 0
+        self._start()
+
+    def _start(self):
+        for i in range(self._workers):
+            conn, worker_conn = self._context.Pipe()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(worker_conn, self._project_root, os.getpid()),
+                name=f"ParallelMap-{i}",
+                daemon=True,
+            )
+            process.start()
+            worker_conn.close()
+            self._conns.append(conn)
+            self._processes.append(process)
+        self._lock = self._context.Lock()
+        self._user_pid.value = 0
+        self._broken.value = 0
+
+    def shut_down(self):
+        for conn in self._conns:
+            conn.close()
+        for process in self._processes:
+            process.kill()
+            process.join()
+        self._conns = []
+        self._processes = []
+
+    def restart(self):
+        self.shut_down()
+        self._start()
+
+    @property
+    def stale(self) -> bool:
+        """Whether a process was killed while it used the pool, or a worker died"""
+        if self._broken.value:
+            return True
+        pid = self._user_pid.value
+        if pid == 0:
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        return False
+
+    @property
+    def owned(self) -> bool:
+        return os.getpid() == self._owner_pid
+
+    def map(self, target: _Target, items: list[Any]) -> list[Any] | None:
+        """The results of the target on the items, or None if the pool is busy."""
+        # A restart during the map replaces the lock
+        lock = self._lock
+        if not self._conns or self._broken.value or not lock.acquire(block=False):
+            return None
+        try:
+            self._user_pid.value = os.getpid()
+            return self._map(target, items)
+        finally:
+            self._user_pid.value = 0
+            lock.release()
+
+    def _map(self, target: _Target, items: list[Any]) -> list[Any]:
+        self._calls += 1
+        call = (os.getpid(), self._calls)
+        results: list[Any] = [None] * len(items)
+        pending = iter(enumerate(items))
+        running: set[Connection] = set()
+        error: Exception | None = None
+        died = False
+
+        def submit(conn: Connection):
+            nonlocal error, died
+            next_item = next(pending, None)
+            if next_item is None:
+                return
+            index, item = next_item
+            try:
+                conn.send((call, target, index, _pack(item)))
+            except OSError:
+                died = True
+                error = error or ChildProcessError("A parallel_map worker died")
+                return
+            running.add(conn)
+
+        for conn in self._conns:
+            if error is None:
+                submit(conn)
+        # Those running finish even after an error, so the pipes are clear
+        # for the next map
+        while running:
+            for conn in wait(list(running)):
+                assert isinstance(conn, Connection)
+                try:
+                    reply_call, index, ok, value = conn.recv()
+                except (EOFError, OSError):
+                    running.discard(conn)
+                    died = True
+                    error = error or ChildProcessError("A parallel_map worker died")
+                    continue
+                try:
+                    value = _unpack(value)
+                except Exception as e:
+                    ok, value = False, e
+                if reply_call != call:
+                    # Left by a map that was killed before it read it;
+                    # the reply to this map comes next
+                    continue
+                running.discard(conn)
+                if ok:
+                    results[index] = value
+                else:
+                    error = error or value
+                if error is None:
+                    submit(conn)
+        if died:
+            if self.owned:
+                self.restart()
+            else:
+                # Only the process that forked the workers can replace them
+                self._broken.value = 1
+        if error is not None:
+            raise error
+        return results
+
+
+_pool: WorkerPool | None = None
+
+
+def start_pool(workers: int = POOL_WORKERS, project_root: str | None = None):
+    """
+    Fork the workers of parallel_map from this process, which should have
+    imported what create_mesh needs, so each worker starts with it.
+    Does nothing where parallel_map does not fork.
+    """
+    global _pool
+    if _pool is not None and _pool.owned:
+        _pool.shut_down()
+    _pool = None
+    if workers > 0 and PARALLEL_SUPPORTED:
+        _pool = WorkerPool(workers, project_root)
+
+
+def recover_pool():
+    """Restart the workers if a process was killed while using them, or one died."""
+    if _pool is not None and _pool.owned and _pool.stale:
+        logger.info("Restarting parallel_map workers, as a map was killed or one died")
+        _pool.restart()
+
+
+def _get_pool() -> WorkerPool | None:
+    if _pool is None and not multiprocessing.current_process().daemon:
+        # Started on first use where the loader did not start it
+        start_pool()
+    return _pool
+
+
+def parallel_map(fn: Callable[[T], R], iterable: Iterable[T]) -> list[R]:
+    """Call a function on each item on a pool of worker processes.
+
+    Use it in `create_mesh` to build independent parts at once,
+    such as the slots of a rack, before combining them:
+
+    ```python
+    def slot(position: tuple[float, float, float]) -> Manifold:
+        ...
+
+    def create_mesh():
+        slots = parallel_map(slot, positions)
+        ...
+    ```
+
+    The workers are started once and kept across reloads; each call
+    re-imports your module in them only if it changed.
+    `fn` must be defined at the top level of a module so the workers can find it;
+    other functions, like lambdas, are called in this process one item at a time,
+    as they are on platforms other than Linux.
+    Items and results are pickled, except Trimesh and Manifold objects,
+    including those in lists and tuples, which go through shared memory.
+
+    Args:
+        fn: The function to call on each item.
+        iterable: The items.
+
+    Returns:
+        The result of `fn` for each item, in the order of the items.
+        If `fn` raises for any item, `parallel_map` raises the first such error
+        once the items already started have finished.
+    """
+    items = list(iterable)
+    target = _target(fn)
+    if target is not None and PARALLEL_SUPPORTED and not _in_worker and len(items) > 1:
+        pool = _get_pool()
+        results = pool.map(target, items) if pool is not None else None
+        if results is not None:
+            return results
+        logger.debug(f"parallel_map workers are busy; calling {fn} here")
+    return [fn(item) for item in items]
@@ -2,6 +2,7 @@ import logging
 from multiprocessing.connection import Connection
 
 from scadview.controller import Controller
+from scadview.mesh_loader_process import FrameDelivery, LoaderOptions
 from scadview.render.camera import CameraPerspective
 from scadview.render.gl_widget_adapter import GlWidgetAdapter
 from scadview.render.renderer import RendererFactory
@@ -11,11 +12,28 @@ from scadview.ui.wx.gl_ui import GlUi
 logger = logging.getLogger(__name__)
 
 
-def main(splash_conn: Connection):
+def main(
+    splash_conn: Connection,
+    use_result_cache: bool = False,
+    project_root: str | None = None,
+    frame_delivery: str = FrameDelivery.LATEST.value,
+    max_frame_rate: float = 30.0,
+    load_time_budget: float | None = None,
+    load_rss_budget: int | None = None,
+):
     logger.info("SCADview app starting up")
     renderer_factory = RendererFactory(CameraPerspective())
     gl_widget_adapter = GlWidgetAdapter(renderer_factory)
-    controller = Controller()
+    controller = Controller(
+        LoaderOptions(
+            use_result_cache=use_result_cache,
+            project_root=project_root,
+            frame_delivery=FrameDelivery(frame_delivery),
+            max_frame_rate=max_frame_rate,
+            load_time_budget=load_time_budget,
+            load_rss_budget=load_rss_budget,
+        )
+    )
     logger.warning("*** SCADview has initialized ***")
     stop_splash_process(splash_conn)
     GlUi(controller, gl_widget_adapter).run()
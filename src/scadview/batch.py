@@ -0,0 +1,176 @@
+"""
+Run create_mesh over a grid of parameters and export each mesh.
+
+Jobs run on a pool of worker processes that import the module once,
+so each job only pays for create_mesh and the export.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from time import perf_counter
+from typing import Any, Callable
+
+from scadview.headless import final_trimesh, write_mesh
+from scadview.mesh_loader_process import CREATE_MESH_FUNCTION_NAME, prewarm_modules
+from scadview.module_loader import ModuleLoader, yield_if_return
+from scadview.parameters import ParamValue
+from scadview.process_memory import peak_rss_bytes, reset_peak_rss
+
+logger = logging.getLogger(__name__)
+
+# Lets a range end on its stop value despite rounding in the step
+RANGE_TOLERANCE = 1e-9
+
+
+@dataclass
+class JobResult:
+    params: dict[str, ParamValue]
+    output: str
+    seconds: float
+    # Of the worker during the job where the platform allows it,
+    # else of the worker so far; None if it cannot be measured
+    peak_rss_bytes: int | None
+    error: str | None = None
+
+
+def parse_number(text: str) -> int | float:
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_value(text: str) -> ParamValue:
+    try:
+        return parse_number(text)
+    except ValueError:
+        return text
+
+
+def parse_param(spec: str) -> tuple[str, list[ParamValue]]:
+    """
+    Parse `name=a,b,c` into the listed values,
+    or `name=start:stop:step` into the range from start to stop inclusive.
+    """
+    name, sep, values = spec.partition("=")
+    if not sep or not name.isidentifier():
+        raise ValueError(f"Expected name=values, got {spec!r}")
+    if ":" not in values:
+        return name, [parse_value(v) for v in values.split(",")]
+    try:
+        start, stop, step = (parse_number(v) for v in values.split(":"))
+    except ValueError:
+        raise ValueError(f"Expected name=start:stop:step, got {spec!r}") from None
+    if step <= 0:
+        raise ValueError(f"The step must be positive in {spec!r}")
+    count = int((stop - start) / step + RANGE_TOLERANCE) + 1
+    # Rounded, so 0:1:0.1 gives 0.3 rather than 0.30000000000000004
+    return name, [round(start + i * step, 12) for i in range(max(count, 0))]
+
+
+def param_grid(
+    params: list[tuple[str, list[ParamValue]]],
+) -> list[dict[str, ParamValue]]:
+    """Every combination of the values of the parameters"""
+    names = [name for name, _ in params]
+    return [
+        dict(zip(names, values))
+        for values in itertools.product(*(values for _, values in params))
+    ]
+
+
+def output_paths(template: str, grid: list[dict[str, ParamValue]]) -> list[str]:
+    try:
+        paths = [template.format(**params) for params in grid]
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"{template!r} names a parameter that is not given: {e}")
+    if len(set(paths)) != len(paths):
+        raise ValueError(f"{template!r} does not name every parameter")
+    return paths
+
+
+# Set in each worker by _init_worker
+_create_mesh: Callable[..., Any] | None = None
+_load_error: Exception | None = None
+
+
+def _init_worker(module_path: str, project_root: str | None):
+    global _create_mesh, _load_error
+    prewarm_modules()
+    try:
+        _create_mesh = ModuleLoader(
+            CREATE_MESH_FUNCTION_NAME, project_root
+        ).load_function(module_path)
+    except Exception as e:
+        # Reported by each job, as the pool cannot report it itself
+        _load_error = e
+
+
+def _run_job(module_path: str, params: dict[str, ParamValue], output: str) -> JobResult:
+    reset_peak_rss()
+    t0 = perf_counter()
+    error = None
+    try:
+        if _create_mesh is None:
+            raise _load_error or RuntimeError("Worker was not initialized")
+        mesh = None
+        for mesh in yield_if_return(_create_mesh(**params)):
+            pass
+        write_mesh(final_trimesh(mesh, module_path), output)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return JobResult(params, output, perf_counter() - t0, peak_rss_bytes(), error)
+
+
+def run_batch(
+    module_path: str,
+    grid: list[dict[str, ParamValue]],
+    outputs: list[str],
+    jobs: int | None = None,
+    project_root: str | None = None,
+) -> list[JobResult]:
+    """Export a mesh for each set of parameters, running at most `jobs` at once."""
+    with ProcessPoolExecutor(
+        max_workers=min(jobs or os.cpu_count() or 1, max(len(grid), 1)),
+        initializer=_init_worker,
+        initargs=(module_path, project_root),
+    ) as pool:
+        futures = [
+            pool.submit(_run_job, module_path, params, output)
+            for params, output in zip(grid, outputs)
+        ]
+        return [future.result() for future in futures]
+
+
+def run_batch_command(args: argparse.Namespace) -> int:
+    """Run the batch command, printing a JSON summary and returning the exit status."""
+    specs: list[str] = args.param or []
+    try:
+        grid = param_grid([parse_param(spec) for spec in specs])
+        outputs = output_paths(args.output, grid)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.jobs is not None and args.jobs < 1:
+        print("--jobs must be at least 1", file=sys.stderr)
+        return 2
+    t0 = perf_counter()
+    results = run_batch(
+        os.path.abspath(args.module), grid, outputs, args.jobs, args.project_root
+    )
+    summary = {
+        "module": args.module,
+        "seconds": perf_counter() - t0,
+        "failed": sum(r.error is not None for r in results),
+        "jobs": [asdict(r) for r in results],
+    }
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
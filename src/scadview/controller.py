@@ -1,26 +1,52 @@
 import logging
+import multiprocessing
 import os
 import queue
+from functools import partial
+from multiprocessing import resource_tracker
+from threading import Condition, Event, Thread
+from typing import Callable
 
 from trimesh import Trimesh
 from trimesh.exchange import export
 
+from scadview.file_watcher import FileWatcher
+from scadview.job_scheduler import Job
 from scadview.load_status import LoadStatus
 from scadview.logging_main import log_queue
+from scadview.mesh_delta import apply_mesh_delta, take_shared_vertices
 from scadview.mesh_loader_process import (
+    PRIMARY_MODEL_ID,
+    CancelJobCommand,
     Command,
+    FrameDelivery,
+    LoaderOptions,
     LoadMeshCommand,
     LoadResult,
     MeshLoaderProcess,
     MpCommandQueue,
     MpLoadQueue,
+    PrefetchJob,
     ShutDownCommand,
+    SubmitJobCommand,
+    carry_over,
+    discard_result,
 )
+from scadview.mesh_transport import SharedMeshReader
 from scadview.observable import Observable
+from scadview.parameters import (
+    Parameter,
+    ParamValue,
+    create_mesh_parameters,
+    neighbour_values,
+    with_value,
+)
 
 logger = logging.getLogger(__name__)
 
 UNSUPPORTED_EXPORT_FORMATS = ["dict", "dict64", "stl_ascii", "xyz"]
+# Only bounds how long stopping the listener takes; results wake it at once
+LOAD_RESULT_WAIT_TIMEOUT = 0.5
 
 
 def export_formats() -> list[str]:
@@ -31,102 +57,503 @@ def export_formats() -> list[str]:
     ]
 
 
-class Controller:
-    def __init__(self):
-        self.on_module_path_set = Observable()
+class PendingResult:
+    """
+    The latest load result of a model that the viewer has not taken yet.
+    A newer result replaces it, unless it must arrive, or replace is False;
+    then the listener waits for the viewer to take it, leaving newer results
+    in the load queue.
+    Taking it sets viewer_ready, which tells the loader to send its next frame.
+    """
+
+    def __init__(self, replace: bool = True):
+        self._replace = replace
+        self._condition = Condition()
+        self._result: LoadResult | None = None
+        # Shared with the loader, which clears it as it sends each frame
+        self.viewer_ready = multiprocessing.Event()
+        self.viewer_ready.set()
+
+    def put(self, result: LoadResult, stopped: Event) -> bool:
+        """
+        Hold the result, returning True if none was pending,
+        so the viewer has to be told to take it.
+        """
+        with self._condition:
+            while self._result is not None and (
+                self._result.must_arrive or not self._replace
+            ):
+                if stopped.is_set():
+                    return False
+                self._condition.wait(LOAD_RESULT_WAIT_TIMEOUT)
+            dropped = self._result
+            if dropped is not None and not carry_over(result, dropped):
+                discard_result(dropped)
+            self._result = result
+            return dropped is None
+
+    def take(self) -> LoadResult | None:
+        with self._condition:
+            result = self._result
+            self._result = None
+            self.viewer_ready.set()
+            self._condition.notify_all()
+            return result
+
+
+def _listen_for_results(
+    load_queue: MpLoadQueue,
+    pending: PendingResult,
+    on_pending: Callable[[], None],
+    stopped: Event,
+):
+    # Holds no reference to the Controller, so it can still be deleted
+    while not stopped.is_set():
+        try:
+            load_result = load_queue.get(timeout=LOAD_RESULT_WAIT_TIMEOUT)
+        except queue.Empty:
+            continue
+        except (OSError, ValueError, EOFError):
+            logger.debug("Load queue closed, listener stopping")
+            return
+        if pending.put(load_result, stopped):
+            on_pending()
+
+
+class LoadedModel:
+    """
+    A module shown in the scene.
+    Each model has its own loader process, so models load in parallel
+    and loading one never cancels the load of another.
+    """
+
+    def __init__(
+        self,
+        model_id: int,
+        options: LoaderOptions | None,
+        on_watched_files_change: Callable[[int], None],
+    ):
+        self.model_id = model_id
         self.module_path = ""
-        self._last_export_path = ""
-        self._load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+        self.current_mesh: list[Trimesh] | Trimesh | None = None
+        self.load_status = LoadStatus.NONE
+        self.visible = True
+        self.last_export_path = ""
+        self.module_files: list[str] = []
+        # The keyword parameters of create_mesh, and those set to other than their defaults
+        self.parameters: list[Parameter] = []
+        self.params: dict[str, ParamValue] = {}
+        # Load numbers count up from 1 with each LoadMeshCommand
+        self.load_count = 0
+        self.load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+        # Every frame reaches the viewer if the loader waits for it to take each
+        frame_delivery = (options or LoaderOptions()).frame_delivery
+        self.pending_result = PendingResult(
+            replace=frame_delivery != FrameDelivery.EVERY
+        )
         self._command_queue = MpCommandQueue(maxsize=0, type_=Command)
         self._loader_process = MeshLoaderProcess(
             self._command_queue,
-            self._load_queue,
+            self.load_queue,
             log_queue=log_queue,
             log_level=logger.getEffectiveLevel(),
+            options=options,
+            viewer_ready=self.pending_result.viewer_ready,
         )
         self._loader_process.start()
+        self.file_watcher = FileWatcher(partial(on_watched_files_change, model_id))
+        self._listener: Thread | None = None
+        self._listener_stopped = Event()
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.module_path)
+
+    def parameter(self, name: str) -> Parameter:
+        for parameter in self.parameters:
+            if parameter.name == name:
+                return parameter
+        raise ValueError(f"create_mesh in {self.name} has no parameter {name!r}")
+
+    @property
+    def param_values(self) -> dict[str, ParamValue]:
+        """The value of every parameter, default or not"""
+        return {p.name: self.params.get(p.name, p.default) for p in self.parameters}
+
+    def load(self, module_path: str, use_cache: bool):
+        if module_path != self.module_path:
+            self.last_export_path = ""  # Reset last export path if loading a new module
+            self.module_files = []
+            self.params = {}
+            self.module_path = module_path
+        # Read each load, as the module may have changed them
+        self.parameters = create_mesh_parameters(module_path)
+        names = {parameter.name for parameter in self.parameters}
+        self.params = {n: v for n, v in self.params.items() if n in names}
+        self.current_mesh = None
+        self.file_watcher.watch([module_path, *self.module_files])
+        self.file_watcher.mark_current()
+        logger.info(f"Starting load of {module_path}")
+        self.load_count += 1
+        self._command_queue.put(
+            LoadMeshCommand(module_path, use_cache, dict(self.params) or None)
+        )
+
+    def start_listening(self, on_pending: Callable[[int], None]):
+        if self._listener is not None:
+            return
+        self._listener_stopped.clear()
+        self._listener = Thread(
+            target=_listen_for_results,
+            args=(
+                self.load_queue,
+                self.pending_result,
+                partial(on_pending, self.model_id),
+                self._listener_stopped,
+            ),
+            name=f"LoadResultListener-{self.model_id}",
+            daemon=True,
+        )
+        self._listener.start()
+
+    def stop_listening(self):
+        self._listener_stopped.set()
+        self._listener = None
+
+    def take_result(self) -> LoadResult | None:
+        load_result = self.pending_result.take()
+        if load_result is not None:
+            load_result.model_id = self.model_id
+        return load_result
+
+    def submit_job(self, job_id: int, job: Job):
+        self._command_queue.put(SubmitJobCommand(job_id, job))
+
+    def cancel_job(self, job_id: int):
+        self._command_queue.put(CancelJobCommand(job_id))
+
+    def shut_down(self):
+        self.stop_listening()
+        pending = self.pending_result.take()
+        if pending is not None:
+            discard_result(pending)
+        self.file_watcher.stop()
+        self._command_queue.put(ShutDownCommand())
+        self._loader_process.terminate()
+
+
+class Controller:
+    """
+    Loads the modules shown in the scene.
+    The primary model is the one loaded by load_mesh;
+    more can be added with add_model, and each is reloaded,
+    hidden or removed without touching the others.
+    """
+
+    def __init__(self, options: LoaderOptions | None = None):
+        self._options = options
+        self.on_module_path_set = Observable()
+        self._shared_mesh_reader = SharedMeshReader()
+        # Share one tracker with the loaders so shared memory segments
+        # they create are unregistered when this process unlinks them.
+        resource_tracker.ensure_running()
         self.on_load_status_change = Observable()
-        self._load_status = LoadStatus.NONE
+        self.on_watching_change = Observable()
+        # Notified from a watcher thread with the id of the model whose
+        # files changed; subscribers call auto_reload
+        self.on_watched_files_change = Observable()
+        # Notified from the listener threads with the id of a model that has a
+        # result pending, once until it is taken; subscribers take it with
+        # take_load_result and pass it to handle_load_result
+        self.on_load_result_pending = Observable()
+        # Notified when a model is added, removed, shown or hidden
+        self.on_models_change = Observable()
+        # Notified with the result of each job, from handle_load_result
+        self.on_job_result = Observable()
+        # Notified when the parameters of the primary model's create_mesh change
+        self.on_parameters_change = Observable()
+        # The model whose loader runs each job not yet finished
+        self._job_models: dict[int, int] = {}
+        self._job_count = 0
+        self._watching = False
+        self._listening = False
+        self._models: dict[int, LoadedModel] = {}
+        self._next_model_id = PRIMARY_MODEL_ID
+        self._primary = self._create_model()
+
+    def _create_model(self) -> LoadedModel:
+        model = LoadedModel(
+            self._next_model_id, self._options, self.on_watched_files_change.notify
+        )
+        self._next_model_id += 1
+        self._models[model.model_id] = model
+        if self._watching:
+            model.file_watcher.start()
+        if self._listening:
+            model.start_listening(self.on_load_result_pending.notify)
+        return model
+
+    @property
+    def models(self) -> list[LoadedModel]:
+        """The models in the scene, in the order they were added"""
+        return list(self._models.values())
+
+    def model(self, model_id: int) -> LoadedModel:
+        try:
+            return self._models[model_id]
+        except KeyError:
+            raise ValueError(f"No model {model_id}") from None
 
     @property
     def current_mesh(self) -> list[Trimesh] | Trimesh | None:
-        return self._current_mesh
+        return self._primary.current_mesh
 
     @current_mesh.setter
     def current_mesh(self, value: list[Trimesh] | Trimesh | None):
-        self._current_mesh = value
+        self._primary.current_mesh = value
 
     @property
     def module_path(self) -> str:
-        return self._module_path
-
-    @module_path.setter
-    def module_path(self, value: str):
-        self._module_path = value
-        self.on_module_path_set.notify(value)
+        return self._primary.module_path
 
     @property
     def load_status(self) -> LoadStatus:
-        return self._load_status
+        return self._primary.load_status
 
     @load_status.setter
     def load_status(self, value: LoadStatus):
-        if self._load_status == value:
+        self._set_load_status(self._primary, value)
+
+    def _set_load_status(self, model: LoadedModel, value: LoadStatus):
+        if model.load_status == value:
             return
-        self._load_status = value
-        self.on_load_status_change.notify(value)
+        model.load_status = value
+        if model is self._primary:
+            self.on_load_status_change.notify(value)
 
-    def load_mesh(self, module_path: str):
-        self.current_mesh = None
-        self.load_status = LoadStatus.START
-        if module_path != self.module_path:
-            self._last_export_path = (
-                ""  # Reset last export path if loading a new module
+    @property
+    def watching(self) -> bool:
+        return self._watching
+
+    @watching.setter
+    def watching(self, value: bool):
+        if value == self.watching:
+            return
+        self._watching = value
+        for model in self._models.values():
+            if value:
+                model.file_watcher.start()
+            else:
+                model.file_watcher.stop()
+        self.on_watching_change.notify(value)
+
+    def load_mesh(self, module_path: str, use_cache: bool = True):
+        self._load(self._primary, module_path, use_cache)
+
+    def _load(self, model: LoadedModel, module_path: str, use_cache: bool):
+        self._set_load_status(model, LoadStatus.START)
+        path_changed = module_path != model.module_path
+        parameters = model.parameters
+        model.load(module_path, use_cache)
+        if model is self._primary:
+            if path_changed:
+                self.on_module_path_set.notify(module_path)
+            if model.parameters != parameters:
+                self.on_parameters_change.notify(model.parameters)
+
+    def set_param(self, name: str, value: ParamValue, model_id: int = PRIMARY_MODEL_ID):
+        """
+        Reload the model with the parameter of create_mesh set to the value.
+        Then the values the user may step to next are loaded into the result
+        cache by idle cores, until the next load needs them.
+        """
+        model = self.model(model_id)
+        parameter = model.parameter(name)
+        previous = model.param_values[name]
+        model.params = with_value(model.params, parameter, value)
+        self._load(model, model.module_path, use_cache=True)
+        self._prefetch(model, parameter, previous)
+
+    def _prefetch(self, model: LoadedModel, parameter: Parameter, previous: ParamValue):
+        options = self._options or LoaderOptions()
+        # PrefetchJob only runs where loads are forked
+        if not options.use_result_cache or not options.fork_loads:
+            return
+        value = model.param_values[parameter.name]
+        for neighbour in neighbour_values(parameter, value, previous):
+            # Not tracked like other jobs, as the loader sends no result for them
+            self._job_count += 1
+            model.submit_job(
+                self._job_count,
+                PrefetchJob(
+                    model.module_path,
+                    with_value(model.params, parameter, neighbour),
+                    options,
+                ),
             )
-            self.module_path = module_path
-        logger.info(f"Starting load of {module_path}")
-        self._command_queue.put(LoadMeshCommand(module_path))
 
-    def reload_mesh(self):
-        if self.module_path == "":
+    def add_model(self, module_path: str, use_cache: bool = True) -> int:
+        """Load the module as another model in the scene, returning its id."""
+        model = self._create_model()
+        self._load(model, module_path, use_cache)
+        self.on_models_change.notify()
+        return model.model_id
+
+    def remove_model(self, model_id: int):
+        model = self.model(model_id)
+        if model is self._primary:
+            raise ValueError("The primary model cannot be removed")
+        del self._models[model_id]
+        model.shut_down()
+        # Its jobs end with its loader
+        self._job_models = {
+            job_id: job_model_id
+            for job_id, job_model_id in self._job_models.items()
+            if job_model_id != model_id
+        }
+        self.on_models_change.notify()
+
+    def set_model_visible(self, model_id: int, visible: bool):
+        model = self.model(model_id)
+        if model.visible == visible:
+            return
+        model.visible = visible
+        self.on_models_change.notify()
+
+    def submit_job(self, job: Job, model_id: int = PRIMARY_MODEL_ID) -> int:
+        """
+        Run the job in the loader of the model, returning its id.
+        Its result is passed to the subscribers of on_job_result.
+        """
+        self._job_count += 1
+        self._job_models[self._job_count] = model_id
+        self.model(model_id).submit_job(self._job_count, job)
+        return self._job_count
+
+    def cancel_job(self, job_id: int):
+        model = self._models.get(self._job_models.get(job_id, -1))
+        if model is not None:
+            model.cancel_job(job_id)
+
+    def auto_reload(self, model_id: int = PRIMARY_MODEL_ID) -> bool:
+        """
+        Reload the model after the content of its watched files changed.
+        A load still running may have read the old content, so it is cancelled.
+        Returns True if a reload was started.
+        """
+        if model_id not in self._models:  # Removed after its files changed
+            return False
+        self.reload_mesh(model_id=model_id)
+        return True
+
+    def reload_mesh(self, use_cache: bool = True, model_id: int = PRIMARY_MODEL_ID):
+        model = self.model(model_id)
+        if model.module_path == "":
             raise ValueError("No previous load to reload")
-        self.load_mesh(self.module_path)
+        self._load(model, model.module_path, use_cache)
+
+    def start_listening(self):
+        """
+        Wait for load results in background threads and tell the subscribers
+        of on_load_result_pending about them, instead of polling check_load_queue.
+        """
+        self._listening = True
+        for model in self._models.values():
+            model.start_listening(self.on_load_result_pending.notify)
 
-    def check_load_queue(self) -> LoadResult:
+    def stop_listening(self):
+        self._listening = False
+        for model in self._models.values():
+            model.stop_listening()
+
+    def take_load_result(self, model_id: int) -> LoadResult | None:
+        """The latest result of the model not yet taken, if any"""
+        model = self._models.get(model_id)
+        return model.take_result() if model is not None else None
+
+    def check_load_queue(self, model_id: int = PRIMARY_MODEL_ID) -> LoadResult:
+        model = self.model(model_id)
         try:
-            load_result = self._load_queue.get_nowait()
-            if load_result.mesh is not None:
-                logger.debug("check_load_queue got mesh")
-                self.current_mesh = load_result.mesh
-            else:
-                logger.debug("check_load_queue got mesh == None")
-            self.load_status = load_result.status
+            load_result = model.load_queue.get_nowait()
+            model.pending_result.viewer_ready.set()
         except queue.Empty:
             logger.debug("check_load_queue empty")
-            load_result = LoadResult(0, 0, None, None, False)
+            return LoadResult(0, 0, None, None, False, model_id=model_id)
+        load_result.model_id = model_id
+        return self.handle_load_result(load_result)
+
+    def handle_load_result(self, load_result: LoadResult) -> LoadResult:
+        if load_result.job_id is not None:
+            self._job_models.pop(load_result.job_id, None)
+            self.on_job_result.notify(load_result)
+            return load_result
+        model = self._models.get(load_result.model_id)
+        if model is None:
+            logger.debug("Load result for a removed model; dropping it")
+            discard_result(load_result)
+            load_result.packed = None
+            load_result.mesh = None
+            load_result.deltas = None
+            return load_result
+        if load_result.packed is not None:
+            load_result.mesh = self._shared_mesh_reader.unpack(load_result.packed)
+            load_result.packed = None
+        if load_result.deltas is not None:
+            take_shared_vertices(load_result.deltas)
+            self._apply_deltas(model, load_result)
+        if load_result.load_number == model.load_count:
+            self._on_current_load_result(model, load_result)
+        if load_result.mesh is not None:
+            logger.debug("Load result has mesh")
+            model.current_mesh = load_result.mesh
+        else:
+            logger.debug("Load result has mesh == None")
+        self._set_load_status(model, load_result.status)
         return load_result
 
-    def export(self, file_path: str):
-        if not self.current_mesh:
+    def _apply_deltas(self, model: LoadedModel, load_result: LoadResult):
+        assert load_result.deltas is not None
+        carried = load_result.mesh is not None
+        base = load_result.mesh if carried else model.current_mesh
+        if not isinstance(base, Trimesh):
+            logger.warning("Load result changes a mesh that is not there; ignoring it")
+            load_result.deltas = None
+            return
+        for delta in load_result.deltas:
+            base = apply_mesh_delta(base, delta)
+        load_result.mesh = base
+        if carried:
+            # The viewer never saw the mesh the changes were made to
+            load_result.deltas = None
+
+    def _on_current_load_result(self, model: LoadedModel, load_result: LoadResult):
+        if load_result.module_files is not None:
+            model.module_files = load_result.module_files
+            model.file_watcher.watch([model.module_path, *model.module_files])
+
+    def export(self, file_path: str, model_id: int = PRIMARY_MODEL_ID):
+        model = self.model(model_id)
+        if not model.current_mesh:
             logger.info("No mesh to export")
             return
-        if isinstance(self.current_mesh, list):
-            export_mesh = self.current_mesh[-1]
+        if isinstance(model.current_mesh, list):
+            export_mesh = model.current_mesh[-1]
         else:
-            export_mesh = self.current_mesh
-        self._last_export_path = file_path
+            export_mesh = model.current_mesh
+        model.last_export_path = file_path
         export_mesh.export(file_path)
 
-    def default_export_path(self) -> str:
-        if self._last_export_path != "":
-            return self._last_export_path
-        if self.module_path != "":
+    def default_export_path(self, model_id: int = PRIMARY_MODEL_ID) -> str:
+        model = self.model(model_id)
+        if model.last_export_path != "":
+            return model.last_export_path
+        if model.module_path != "":
             return os.path.join(
-                os.path.dirname(self.module_path),
-                os.path.splitext(os.path.basename(self.module_path))[0],
+                os.path.dirname(model.module_path),
+                os.path.splitext(model.name)[0],
             )
         raise ValueError("No module loaded")
 
     def __del__(self):
-        self._command_queue.put(ShutDownCommand())
-        self._loader_process.terminate()
+        for model in getattr(self, "_models", {}).values():
+            model.shut_down()
@@ -0,0 +1,123 @@
+import hashlib
+import logging
+import os
+from threading import Event, Lock, Thread
+from time import monotonic
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.05
+# Editors often write a file several times per save
+DEBOUNCE_INTERVAL = 0.15
+
+FileStat = tuple[int, int] | None
+
+
+def _stat(path: str) -> FileStat:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _content_hash(path: str) -> str | None:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    """
+    Calls `on_change` from a background thread when the content of a watched
+    file changes.
+
+    Files are polled, which for the handful of files a model is made of
+    costs a few stat calls per interval and needs no extra dependencies.
+    A burst of writes is coalesced into one call once the files have been
+    quiet for `debounce` seconds, and saves that leave the content
+    as it was do not call `on_change` at all.
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[], None],
+        poll_interval: float = POLL_INTERVAL,
+        debounce: float = DEBOUNCE_INTERVAL,
+    ):
+        self._on_change = on_change
+        self._poll_interval = poll_interval
+        self._debounce = debounce
+        self._lock = Lock()
+        self._paths: list[str] = []
+        self._stats: dict[str, FileStat] = {}
+        self._hashes: dict[str, str | None] = {}
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    def watch(self, paths: list[str]):
+        """
+        Watch these files instead of the current ones.
+        Files already watched keep their baseline; for the others
+        it is their current content.
+        """
+        with self._lock:
+            self._paths = list(dict.fromkeys(paths))
+            self._stats = {
+                p: self._stats[p] if p in self._stats else _stat(p) for p in self._paths
+            }
+            self._hashes = {
+                p: self._hashes[p] if p in self._hashes else _content_hash(p)
+                for p in self._paths
+            }
+
+    def mark_current(self):
+        """Take the current content of the watched files as the baseline."""
+        with self._lock:
+            self._stats = {p: _stat(p) for p in self._paths}
+            self._hashes = {p: _content_hash(p) for p in self._paths}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = Thread(target=self._run, name="FileWatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def _run(self):
+        last_event: float | None = None
+        while not self._stopped.wait(self._poll_interval):
+            if self._poll_stats():
+                last_event = monotonic()
+            elif last_event is not None and monotonic() - last_event >= self._debounce:
+                last_event = None
+                if self._content_changed():
+                    logger.info("Watched files changed")
+                    self._on_change()
+
+    def _poll_stats(self) -> bool:
+        with self._lock:
+            stats = {p: _stat(p) for p in self._paths}
+            changed = stats != self._stats
+            self._stats = stats
+        return changed
+
+    def _content_changed(self) -> bool:
+        with self._lock:
+            hashes = {p: _content_hash(p) for p in self._paths}
+            changed = hashes != self._hashes
+            self._hashes = hashes
+        return changed
@@ -0,0 +1,192 @@
+"""
+Export the mesh of a module without the viewer.
+
+Only the loader is used, so neither wx nor moderngl is imported,
+and a module exports in about the time it takes to run.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import queue
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Generator
+
+from manifold3d import Manifold
+from trimesh import Trimesh
+
+from scadview.api.utils import manifold_to_trimesh
+from scadview.controller import export_formats
+from scadview.job_scheduler import CancelToken, Job
+from scadview.mesh_loader_process import (
+    CREATE_MESH_FUNCTION_NAME,
+    FrameDelivery,
+    LoaderOptions,
+    LoadResult,
+    LoadWorker,
+)
+from scadview.module_loader import ModuleLoader, yield_if_return
+
+logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    """The time taken by each phase of a run, in the order they ran."""
+
+    def __init__(self):
+        self.times: dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + perf_counter() - t0
+
+    def summary(self) -> str:
+        rows = [*self.times.items(), ("total", sum(self.times.values()))]
+        width = max(len(name) for name, _ in rows)
+        return "\n".join(
+            f"{name:<{width}} {seconds * 1000:>10.1f} ms" for name, seconds in rows
+        )
+
+
+def headless_options(use_result_cache: bool = False) -> LoaderOptions:
+    # Results stay in this process, so they are never packed for sending
+    return LoaderOptions(
+        shared_memory_min_faces=None,
+        compact_transfer=False,
+        send_mesh_deltas=False,
+        stream_min_faces=None,
+        use_result_cache=use_result_cache,
+        frame_delivery=FrameDelivery.LATEST,
+    )
+
+
+def load_final_mesh(module_path: str, options: LoaderOptions) -> Trimesh:
+    """
+    Run create_mesh in the module like the viewer does, on this thread,
+    and return its final mesh. Meshes yielded before it are not converted.
+    For a list, as from a debug run, the last mesh is returned.
+    """
+    load_queue: queue.Queue[LoadResult] = queue.Queue(maxsize=1)
+    LoadWorker(module_path, load_queue, options).run()
+    result = load_queue.get_nowait()
+    if result.error is not None:
+        raise result.error
+    return final_trimesh(result.mesh, module_path)
+
+
+def final_trimesh(mesh: Any, module_path: str) -> Trimesh:
+    """The mesh to export from what create_mesh produced last"""
+    if isinstance(mesh, list):
+        if not mesh:
+            raise ValueError(f"{module_path} produced an empty list")
+        logger.warning(f"{module_path} produced a list; using its last mesh")
+        mesh = mesh[-1]  # pyright: ignore[reportUnknownVariableType] - create_mesh is untyped
+    if isinstance(mesh, Manifold):
+        return manifold_to_trimesh(mesh)
+    if not isinstance(mesh, Trimesh):
+        raise TypeError(f"{module_path} produced {type(mesh)}, not a mesh")  # pyright: ignore[reportUnknownArgumentType] - create_mesh is untyped
+    return mesh
+
+
+def export_module(
+    module_path: str,
+    output_path: str,
+    file_type: str | None = None,
+    options: LoaderOptions | None = None,
+    timer: PhaseTimer | None = None,
+):
+    """
+    Export the final mesh of the module to the output path,
+    in the format of its extension unless file_type is given.
+    """
+    timer = timer or PhaseTimer()
+    with timer.phase("load"):
+        mesh = load_final_mesh(module_path, options or headless_options())
+    with timer.phase("export"):
+        write_mesh(mesh, output_path, file_type)
+
+
+def write_mesh(mesh: Trimesh, output_path: str, file_type: str | None = None):
+    # Exported before the file is opened, so a failure leaves no file behind
+    file_type = file_type or _extension(output_path)
+    data = mesh.export(file_type=file_type)  # pyright: ignore[reportUnknownVariableType] - dict for the dict formats
+    if isinstance(data, str):
+        data = data.encode()
+    if not isinstance(data, bytes):
+        raise TypeError(f"Format {file_type!r} cannot be written to a file")
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(data)
+
+
+class ExportJob(Job):
+    """
+    Export the final mesh of a module from the loader, beside the load.
+    Returns the path written.
+    """
+
+    def __init__(
+        self,
+        module_path: str,
+        output_path: str,
+        file_type: str | None = None,
+        project_root: str | None = None,
+    ):
+        self.module_path = module_path
+        self.output_path = output_path
+        self.file_type = file_type
+        self.project_root = project_root
+
+    def run(self, token: CancelToken) -> str:
+        # Not a LoadWorker, whose load numbers belong to the viewer's loads
+        create_mesh = ModuleLoader(
+            CREATE_MESH_FUNCTION_NAME, self.project_root
+        ).load_function(self.module_path)
+        mesh = None
+        for mesh in yield_if_return(create_mesh()):
+            token.raise_if_cancelled()
+        write_mesh(
+            final_trimesh(mesh, self.module_path), self.output_path, self.file_type
+        )
+        return self.output_path
+
+
+def _extension(path: str) -> str:
+    return os.path.splitext(path)[1].lstrip(".").lower()
+
+
+def run_export(args: argparse.Namespace, started: float) -> int:
+    """Run the export command, returning the exit status."""
+    timer = PhaseTimer()
+    timer.times["startup"] = perf_counter() - started
+    file_type = args.format or _extension(args.output)
+    if file_type not in export_formats():
+        print(
+            f"Unsupported format {file_type!r}; use one of {', '.join(export_formats())}",
+            file=sys.stderr,
+        )
+        return 2
+    try:
+        export_module(
+            args.module,
+            args.output,
+            file_type,
+            headless_options(use_result_cache=args.cache),
+            timer,
+        )
+    except Exception as e:
+        print(f"Export of {args.module} failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {args.module} to {args.output}")
+    print(timer.summary())
+    return 0
@@ -0,0 +1,275 @@
+"""
+Runs jobs other than loads, such as exports, in the loader process.
+
+Jobs wait in order of priority, then of submission, and run on a fixed
+number of threads. Each job gets a CancelToken to check as it works,
+or where forking is safe, runs in a child that is killed when cancelled.
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import multiprocessing
+import pickle
+from abc import ABC, abstractmethod
+from enum import IntEnum
+from multiprocessing.connection import Connection
+from threading import Condition, Event, Thread
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Bounds how long a cancelled job run in a child keeps its core
+CHILD_POLL_INTERVAL = 0.05
+
+
+class JobPriority(IntEnum):
+    # Lower runs first
+    INTERACTIVE = 0
+    BACKGROUND = 1
+    # Work the user may never ask for, cancelled when a load needs the cores
+    SPECULATIVE = 2
+
+
+class JobCancelled(Exception):
+    """The job was cancelled before it finished."""
+
+    # Jobs raise it without their id; the scheduler sets it
+    def __init__(self, job_id: int = 0):
+        super().__init__(job_id)
+        self.job_id = job_id
+
+    def __str__(self) -> str:
+        return f"Job {self.job_id} was cancelled"
+
+
+class CancelToken:
+    def __init__(self):
+        self._cancelled = Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+
+class Job(ABC):
+    """
+    Work for the loader. Jobs are pickled to reach the loader,
+    and what run returns is pickled to come back.
+    """
+
+    priority = JobPriority.BACKGROUND
+
+    @abstractmethod
+    def run(self, token: CancelToken) -> Any:
+        """Do the work, stopping with JobCancelled once the token is cancelled."""
+
+
+def _picklable(e: Exception) -> Exception:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(f"{type(e).__name__}: {e}")
+
+
+def _run_child(job: Job, sender: Connection):
+    try:
+        message = (True, job.run(CancelToken()))
+    except Exception as e:
+        message = (False, _picklable(e))
+    try:
+        sender.send(message)
+    except Exception as e:  # An unpicklable output; nothing was written
+        sender.send((False, _picklable(e)))
+
+
+def run_in_child(job: Job, token: CancelToken) -> Any:
+    """
+    Run the job in a child forked from this process, returning its output.
+    The child starts with what this process imported, and what the job
+    imports or changes dies with it. Cancelling kills it at once.
+    """
+    context = multiprocessing.get_context("fork")
+    receiver, sender = context.Pipe(duplex=False)
+    child = context.Process(target=_run_child, args=(job, sender), daemon=True)
+    child.start()
+    # Only the child may hold the sending end, so its death closes the pipe
+    sender.close()
+    try:
+        while not receiver.poll(CHILD_POLL_INTERVAL):
+            if token.cancelled:
+                child.kill()
+                raise JobCancelled()
+        try:
+            ok, value = receiver.recv()
+        except EOFError:
+            child.join()
+            raise ChildProcessError(
+                f"Job process exited with code {child.exitcode}"
+            ) from None
+    finally:
+        receiver.close()
+        child.join()
+    if not ok:
+        raise value
+    return value
+
+
+JobDone = Callable[[int, Any, Exception | None], None]
+
+
+class JobScheduler:
+    """
+    Runs submitted jobs on `workers` threads, calling
+    on_done(job_id, output, error) from the thread that ran each one.
+    A job waits while may_start returns False for it;
+    call wake when what it depends on changes.
+    With fork_jobs, each job runs in a child forked by its thread.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        on_done: JobDone,
+        may_start: Callable[[Job], bool] = lambda _: True,
+        fork_jobs: bool = False,
+    ):
+        if workers < 1:
+            raise ValueError("A job scheduler needs at least one worker")
+        self._on_done = on_done
+        self._may_start = may_start
+        self._fork_jobs = fork_jobs
+        self._condition = Condition()
+        # (priority, submission order, job id); cancelled jobs are skipped
+        self._queue: list[tuple[int, int, int]] = []
+        self._pending: dict[int, Job] = {}
+        self._running: dict[int, tuple[Job, CancelToken]] = {}
+        self._submitted = 0
+        self._stopped = False
+        self._threads = [
+            Thread(target=self._work, name=f"Job-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job_id: int, job: Job):
+        with self._condition:
+            if job_id in self._pending or job_id in self._running:
+                raise ValueError(f"Job {job_id} was already submitted")
+            self._submitted += 1
+            heapq.heappush(self._queue, (job.priority, self._submitted, job_id))
+            self._pending[job_id] = job
+            self._condition.notify()
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel the job, which if it has not started yet finishes at once
+        with JobCancelled. Returns False if it already finished.
+        """
+        with self._condition:
+            if self._pending.pop(job_id, None) is None:
+                running = self._running.get(job_id)
+                if running is not None:
+                    running[1].cancel()
+                return running is not None
+        self._on_done(job_id, None, JobCancelled(job_id))
+        return True
+
+    def cancel_priority(self, priority: JobPriority) -> int:
+        """Cancel every job of the priority, returning how many there were."""
+        with self._condition:
+            jobs = list(self._pending.items())
+            jobs += [(job_id, job) for job_id, (job, _) in self._running.items()]
+        return sum(
+            self.cancel(job_id) for job_id, job in jobs if job.priority == priority
+        )
+
+    def wait_for_priority(
+        self, priority: JobPriority, timeout: float | None = None
+    ) -> bool:
+        """
+        Wait until no job of the priority is running,
+        returning False if the timeout passed first.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: all(
+                    job.priority != priority for job, _ in self._running.values()
+                ),
+                timeout,
+            )
+
+    def wake(self):
+        """Let the jobs waiting on may_start check it again."""
+        with self._condition:
+            self._condition.notify_all()
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def shut_down(self):
+        """Cancel every job. Running jobs are not waited for."""
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._queue.clear()
+            for _, token in self._running.values():
+                token.cancel()
+            self._condition.notify_all()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                next_job = self._next_job()
+                while next_job is None and not self._stopped:
+                    self._condition.wait()
+                    next_job = self._next_job()
+                if next_job is None:
+                    return
+                job_id, job = next_job
+                token = CancelToken()
+                self._running[job_id] = (job, token)
+            self._run(job_id, job, token)
+            with self._condition:
+                del self._running[job_id]
+                self._condition.notify_all()
+
+    def _next_job(self) -> tuple[int, Job] | None:
+        # Called holding the condition
+        while self._queue:
+            _, _, job_id = self._queue[0]
+            job = self._pending.get(job_id)
+            if job is None:  # Cancelled
+                heapq.heappop(self._queue)
+                continue
+            # Those behind a job that may not start yet wait for it
+            if not self._may_start(job):
+                return None
+            heapq.heappop(self._queue)
+            del self._pending[job_id]
+            return job_id, job
+        return None
+
+    def _run(self, job_id: int, job: Job, token: CancelToken):
+        output = None
+        error: Exception | None = None
+        try:
+            output = run_in_child(job, token) if self._fork_jobs else job.run(token)
+        except JobCancelled:
+            error = JobCancelled(job_id)
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            error = e
+        self._on_done(job_id, output, error)
@@ -36,8 +36,7 @@ def configure_logging(log_level: int) -> logging.handlers.QueueListener:
     return listener
 
 
-def parse_logging_level():
-    parser = argparse.ArgumentParser()
+def add_logging_arguments(parser: argparse.ArgumentParser):
     parser.add_argument(
         "-v",
         "--verbose",
@@ -51,6 +50,17 @@ def parse_logging_level():
         help="Set the logging level directly",
     )
 
+
+def parse_logging_level(
+    parser: argparse.ArgumentParser | None = None,
+) -> argparse.Namespace:
+    """
+    Parse the command line, adding the logging options to `parser`,
+    and set the logging level from them.
+    """
+    parser = parser or argparse.ArgumentParser()
+    add_logging_arguments(parser)
+
     args = parser.parse_args()
 
     if args.log_level:
@@ -67,3 +77,4 @@ def parse_logging_level():
     logger.setLevel(level=level)
     for handler in logger.handlers:
         handler.setLevel(level=level)
+    return args
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from trimesh import Trimesh
+
+from scadview.mesh_transport import (
+    SharedArrays,
+    take_shared_arrays,
+    unlink_shared_arrays,
+)
+
+logger = logging.getLogger(__name__)
+
+# Vertices may be off by this fraction of the mesh size and still count as moved
+# by a rigid transform, to allow for rounding in the transform
+RIGID_TOLERANCE = 1e-6
+# The only metadata the viewer reads
+DELTA_METADATA_KEY = "scadview"
+
+
+@dataclass
+class MeshDelta:
+    """
+    How a mesh differs from the one sent before it.
+    Only what changed is set; anything else is as it was.
+    """
+
+    # 4 x 4 rigid transform of the previous vertices, for column vectors
+    transform: NDArray[np.float64] | None = None
+    # Vertices replacing the previous ones; the faces are unchanged.
+    # Large ones are sent through shared memory, and taken out before use
+    vertices: NDArray[Any] | SharedArrays | None = None
+    # Faces replacing the previous ones; the vertices are unchanged
+    faces: NDArray[Any] | None = None
+    # The scadview metadata, holding the color, if it changed
+    metadata: dict[str, Any] | None = None
+
+    @property
+    def geometry_replaced(self) -> bool:
+        return self.vertices is not None or self.faces is not None
+
+
+def _scadview_metadata(mesh: Trimesh) -> Any:
+    return mesh.metadata.get(DELTA_METADATA_KEY)  # pyright: ignore[reportUnknownVariableType] - trimesh metadata is untyped
+
+
+def _vertex_colors(mesh: Trimesh) -> NDArray[Any] | None:
+    if mesh.visual is None or mesh.visual.kind != "vertex":
+        return None
+    return np.asarray(
+        mesh.visual.vertex_colors,  # pyright: ignore[reportAttributeAccessIssue] - only ColorVisuals has vertex colors
+        dtype=np.uint8,
+    )
+
+
+def _same(a: NDArray[Any] | None, b: NDArray[Any] | None) -> bool:
+    if a is None or b is None:
+        return a is b
+    return a.shape == b.shape and bool(np.array_equal(a, b))
+
+
+def rigid_transform(
+    before: NDArray[np.float64], after: NDArray[np.float64]
+) -> NDArray[np.float64] | None:
+    """
+    The rotation and translation taking the points before to the points after,
+    as a 4 x 4 matrix, or None if no rigid transform does.
+    """
+    if len(before) == 0 or before.shape != after.shape:
+        return None
+    before_center = before.mean(axis=0)
+    after_center = after.mean(axis=0)
+    # Kabsch: the rotation best aligning the centered points
+    h = (before - before_center).T @ (after - after_center)
+    u, _, vt = np.linalg.svd(h)
+    d = np.sign(np.linalg.det(vt.T @ u.T))
+    rotation = vt.T @ np.diag([1.0, 1.0, d]) @ u.T
+    transform = np.eye(4)
+    transform[:3, :3] = rotation
+    transform[:3, 3] = after_center - rotation @ before_center
+    size = float(np.ptp(before, axis=0).max())
+    moved = before @ rotation.T + transform[:3, 3]
+    if not np.allclose(moved, after, rtol=0, atol=RIGID_TOLERANCE * max(size, 1.0)):
+        return None
+    return transform
+
+
+def take_shared_vertices(deltas: list[MeshDelta]):
+    """Copy vertices sent through shared memory out of it, removing their segments."""
+    for delta in deltas:
+        if isinstance(delta.vertices, SharedArrays):
+            (delta.vertices,) = take_shared_arrays(delta.vertices)
+
+
+def unlink_shared_vertices(deltas: list[MeshDelta] | None):
+    """Remove the segments of vertices that will never be taken."""
+    for delta in deltas or []:
+        if isinstance(delta.vertices, SharedArrays):
+            unlink_shared_arrays(delta.vertices)
+
+
+def apply_mesh_delta(mesh: Trimesh, delta: MeshDelta) -> Trimesh:
+    """A new mesh with the delta applied to the mesh"""
+    vertices = np.asarray(mesh.vertices)
+    if delta.transform is not None:
+        vertices = vertices @ delta.transform[:3, :3].T + delta.transform[:3, 3]
+    if delta.vertices is not None:
+        assert not isinstance(delta.vertices, SharedArrays), "Not taken yet"
+        vertices = delta.vertices
+    metadata: dict[str, Any] = dict(mesh.metadata)  # pyright: ignore[reportUnknownArgumentType] - trimesh metadata is untyped
+    if delta.metadata is not None:
+        metadata[DELTA_METADATA_KEY] = delta.metadata
+    return Trimesh(
+        vertices=vertices,
+        faces=mesh.faces if delta.faces is None else delta.faces,
+        vertex_colors=_vertex_colors(mesh),
+        metadata=metadata,
+        process=False,
+    )
+
+
+class MeshDeltaDetector:
+    """
+    Compares each mesh sent with the one sent before it,
+    to find a change that is cheaper to send and apply than the whole mesh.
+    Without copy, each mesh must not change once it is diffed.
+    """
+
+    def __init__(self, copy: bool = True):
+        self._copy = copy
+        self._vertices: NDArray[np.float64] | None = None
+        self._faces: NDArray[np.int64] | None = None
+        self._vertex_colors: NDArray[Any] | None = None
+        self._metadata: Any = None
+
+    def diff(self, mesh: Trimesh) -> MeshDelta | None:
+        """
+        The delta from the last mesh to this one, which becomes the last mesh.
+        None if there is no last mesh or the whole mesh should be sent.
+        """
+        delta = self._diff(mesh)
+        self._remember(mesh)
+        return delta
+
+    def reset(self):
+        self._vertices = None
+        self._faces = None
+
+    def _diff(self, mesh: Trimesh) -> MeshDelta | None:
+        if self._vertices is None or self._faces is None:
+            return None
+        if not _same(_vertex_colors(mesh), self._vertex_colors):
+            return None
+        vertices = np.asarray(mesh.vertices)
+        faces = np.asarray(mesh.faces)
+        delta = MeshDelta()
+        metadata = _scadview_metadata(mesh)
+        if metadata != self._metadata:
+            if not isinstance(metadata, dict):
+                return None
+            delta.metadata = dict(metadata)  # pyright: ignore[reportUnknownArgumentType] - trimesh metadata is untyped
+        same_faces = _same(faces, self._faces)
+        same_vertices = _same(vertices, self._vertices)
+        if same_faces and same_vertices:
+            return delta
+        if same_vertices:
+            delta.faces = faces
+            return delta
+        if not same_faces:
+            return None
+        delta.transform = rigid_transform(self._vertices, vertices)
+        if delta.transform is None:
+            delta.vertices = vertices
+        return delta
+
+    def _remember(self, mesh: Trimesh):
+        # Copies, as create_mesh may change the mesh in place before yielding it again
+        keep = np.array if self._copy else np.asarray
+        self._vertices = keep(mesh.vertices)
+        self._faces = keep(mesh.faces)
+        colors = _vertex_colors(mesh)
+        self._vertex_colors = None if colors is None else np.array(colors)
+        metadata = _scadview_metadata(mesh)
+        self._metadata = dict(metadata) if isinstance(metadata, dict) else metadata  # pyright: ignore[reportUnknownArgumentType] - trimesh metadata is untyped
@@ -1,23 +1,56 @@
 from __future__ import annotations
 
 import colorsys
+import importlib
 import logging
+import multiprocessing
+import os
 import queue
-from dataclasses import dataclass
-from multiprocessing import Process, Queue
+import signal
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from enum import Enum
+from multiprocessing import Process, Queue, synchronize
 from multiprocessing import queues as mp_queues
-from threading import Thread
-from time import time
-from typing import Any, Generator, Generic, Type, TypeVar
+from multiprocessing.connection import Connection
+from threading import Event, Lock, Thread
+from time import monotonic, time
+from types import FrameType
+from typing import Any, Callable, Generator, Generic, Iterator, Type, TypeVar
 
 from manifold3d import Manifold
 from trimesh import Trimesh
 
+from scadview.api import cache as memo_cache
 from scadview.api.colors import set_mesh_color
+from scadview.api.parallel import POOL_WORKERS, recover_pool, start_pool
 from scadview.api.utils import manifold_to_trimesh
+from scadview.job_scheduler import CancelToken, Job, JobPriority, JobScheduler
 from scadview.load_status import LoadStatus
 from scadview.logging_worker import configure_worker_logging
+from scadview.mesh_delta import MeshDelta, MeshDeltaDetector, unlink_shared_vertices
+from scadview.mesh_transport import (
+    SHARED_MEMORY_MIN_FACES,
+    STREAM_CHUNK_FACES,
+    STREAM_MIN_FACES,
+    MeshChunk,
+    PackedMeshType,
+    SharedArrays,
+    SharedMeshWriter,
+    is_opaque,
+    mesh_chunks,
+    unlink_packed_mesh,
+)
 from scadview.module_loader import ModuleLoader
+from scadview.parameters import ParamValue
+from scadview.process_memory import rss_bytes
+from scadview.result_cache import (
+    RESULT_CACHE_MAX_BYTES,
+    ResultCache,
+    ResultCacheEntry,
+    user_module_files,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +60,26 @@ COLOR_GOLDEN_ANGLE = (
     0.381966  # "golden angle"/360 to ensure good distribution of colors
 )
 DEBUG_COLOR_ALPHA = 0.5
+# Imported once by the loader process so every load starts with them warm
+PREWARM_MODULES = [
+    "manifold3d",
+    "trimesh",
+    "trimesh.creation",
+    "shapely",
+    "scipy.spatial",
+    "matplotlib.font_manager",
+    "scadview.api.cache",
+    "scadview.api.colors",
+    "scadview.api.linear_extrude",
+    "scadview.api.parallel",
+    "scadview.api.surface",
+    "scadview.api.text_builder",
+    "scadview.api.utils",
+]
+# Forking a process that has loaded native libraries is only safe on Linux
+FORK_LOADS_SUPPORTED = sys.platform == "linux"
+# Leaves a core for the load
+JOB_WORKERS = max((os.cpu_count() or 1) - 1, 1)
 
 T = TypeVar("T")
 
@@ -59,6 +112,9 @@ class MpQueue(Generic[T]):
             return item
         raise ValueError(f"The item is not of type {self._type}, it is a {type(item)}")
 
+    def full(self) -> bool:
+        return self._queue.full()
+
     def close(self):
         self._queue.close()
 
@@ -68,8 +124,16 @@ class Command:
 
 
 class LoadMeshCommand(Command):
-    def __init__(self, module_path: str):
+    def __init__(
+        self,
+        module_path: str,
+        use_cache: bool = True,
+        params: dict[str, ParamValue] | None = None,
+    ):
         self.module_path = module_path
+        self.use_cache = use_cache
+        # Keyword arguments for create_mesh
+        self.params = params
 
 
 class CancelLoadCommand(Command):
@@ -80,10 +144,151 @@ class ShutDownCommand(Command):
     pass
 
 
+class SubmitJobCommand(Command):
+    def __init__(self, job_id: int, job: Job):
+        self.job_id = job_id
+        self.job = job
+
+
+class CancelJobCommand(Command):
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+
+
 MeshType = Trimesh | list[Trimesh]
 CreateMeshResultType = Trimesh | Manifold | list[Trimesh | Manifold]
 
 
+class FrameDelivery(Enum):
+    """Which of the meshes a create_mesh generator yields are sent to the viewer"""
+
+    # After the first, skip frames while the viewer has not taken the last one
+    LATEST = "latest"
+    # Send every frame, pausing the load while the viewer catches up
+    EVERY = "every"
+    # Send at most max_frame_rate frames per second
+    RATE_LIMITED = "rate"
+
+
+@dataclass
+class LoaderOptions:
+    # Meshes with at least this many faces go through shared memory; None disables
+    shared_memory_min_faces: int | None = SHARED_MEMORY_MIN_FACES
+    # Send other meshes as WireMesh instead of pickling the Trimesh
+    compact_transfer: bool = True
+    # Compress WireMesh arrays of at least this many bytes; None never compresses
+    compress_min_bytes: int | None = None
+    # Send what changed from the last mesh, like a move, instead of the whole mesh
+    send_mesh_deltas: bool = True
+    # Run each load in a child forked from the loader so cancel can kill it
+    fork_loads: bool = FORK_LOADS_SUPPORTED
+    # Reuse the stored result of a module that has not changed since it was loaded.
+    # Off by default, as only the module and the user modules it imports are
+    # hashed, so a change to a file it reads would not be seen
+    use_result_cache: bool = False
+    # None uses the platform cache directory
+    result_cache_dir: str | None = None
+    result_cache_max_bytes: int = RESULT_CACHE_MAX_BYTES
+    # Also store the meshes yielded before the final one, to replay them on a hit
+    cache_intermediate_meshes: bool = False
+    # User modules under here, not just beside the loaded module, reload on change
+    project_root: str | None = None
+    frame_delivery: FrameDelivery = FrameDelivery.LATEST
+    # Frames per second for FrameDelivery.RATE_LIMITED
+    max_frame_rate: float = 30.0
+    # Abort a load running longer than this many seconds; None for no limit.
+    # Without fork_loads, budgets are only checked when create_mesh yields
+    load_time_budget: float | None = None
+    # Abort a load whose process holds more than this many bytes, including
+    # what a forked load shares with the loader; None for no limit
+    load_rss_budget: int | None = None
+    # Threads running jobs, like exports and prefetches, beside the load
+    job_workers: int = JOB_WORKERS
+    # A mesh with at least this many faces is first sent in chunks
+    # of stream_chunk_faces, drawn as they arrive; None disables
+    stream_min_faces: int | None = STREAM_MIN_FACES
+    stream_chunk_faces: int = STREAM_CHUNK_FACES
+    # Processes for parallel_map, forked once by the loader and kept across
+    # reloads; 0 leaves forked loads to call its function themselves
+    parallel_workers: int = POOL_WORKERS
+
+
+class LoadBudgetExceeded(Exception):
+    """A load ran longer, or used more memory, than LoaderOptions allows."""
+
+    def __init__(
+        self,
+        budget: str,
+        limit: float,
+        used: float,
+        elapsed: float,
+        last_sequence_number: int,
+    ):
+        # All passed on, so it is rebuilt the same when unpickled
+        super().__init__(budget, limit, used, elapsed, last_sequence_number)
+        self.budget = budget
+        self.limit = limit
+        self.used = used
+        self.elapsed = elapsed
+        self.last_sequence_number = last_sequence_number
+
+    def __str__(self) -> str:
+        if self.budget == "time":
+            exceeded = f"its time budget of {self.limit:g} s"
+        else:
+            exceeded = f"its memory budget of {self.limit / 2**20:.0f} MB with {self.used / 2**20:.0f} MB"
+        return (
+            f"Load aborted: exceeded {exceeded} after {self.elapsed:.1f} s;"
+            f" last mesh completed: #{self.last_sequence_number}"
+        )
+
+
+def exceeded_budget(
+    options: LoaderOptions,
+    start_time: float,
+    last_sequence_number: int,
+    pid: int | str = "self",
+) -> LoadBudgetExceeded | None:
+    """The budget of the load in the process that it has exceeded, if any"""
+    elapsed = monotonic() - start_time
+    time_budget = options.load_time_budget
+    if time_budget is not None and elapsed > time_budget:
+        return LoadBudgetExceeded(
+            "time", time_budget, elapsed, elapsed, last_sequence_number
+        )
+    rss_budget = options.load_rss_budget
+    if rss_budget is not None:
+        rss = rss_bytes(pid)
+        if rss is not None and rss > rss_budget:
+            return LoadBudgetExceeded(
+                "memory", rss_budget, rss, elapsed, last_sequence_number
+            )
+    return None
+
+
+@dataclass
+class FrameCounters:
+    """
+    What happened to the frames of one load.
+    Once it completes, every produced frame was either delivered or dropped.
+    """
+
+    produced: int = 0
+    # Converted to Trimesh to be sent; skipped frames are never converted
+    converted: int = 0
+    delivered: int = 0
+    dropped: int = 0
+
+    def displaced(self):
+        """A delivered frame was replaced in the queue before the viewer took it"""
+        self.delivered -= 1
+        self.dropped += 1
+
+
+# The model loaded by Load, which the viewer always has
+PRIMARY_MODEL_ID = 0
+
+
 @dataclass
 class LoadResult:
     load_number: int
@@ -91,20 +296,50 @@ class LoadResult:
     mesh: MeshType | None
     error: Exception | None
     complete: bool = False
+    # Set instead of mesh when the mesh was sent through shared memory
+    packed: PackedMeshType | None = None
+    # On the final result, the user modules the loaded module imported
+    module_files: list[str] | None = None
+    # On the final result, the counts for the frames of the load
+    frame_counters: FrameCounters | None = None
+    # Set while a list is converted: the parts converted so far are sent
+    # as (parts converted, parts), and the whole list follows
+    parts_progress: tuple[int, int] | None = None
+    # Instead of a whole mesh, the changes to make to the last one, in order.
+    # If mesh or packed is set too, the changes are made to that mesh instead.
+    deltas: list[MeshDelta] | None = None
+    # Set by the viewer to the model the result was loaded for
+    model_id: int = PRIMARY_MODEL_ID
+    # Set instead of a mesh on the result of a job, with what the job returned
+    job_id: int | None = None
+    job_output: Any = None
+    # Set instead of a mesh on a part of a mesh sent in chunks
+    chunk: MeshChunk | None = None
+    # On a result whose mesh was just sent in chunks, all of which arrived
+    streamed: bool = False
 
     @property
     def debug(self) -> bool:
-        return isinstance(self.mesh, list)
+        return isinstance(self.mesh, list) or isinstance(self.packed, list)
+
+    @property
+    def must_arrive(self) -> bool:
+        """Never dropped from the load queue to make room for a newer result"""
+        return self.job_id is not None or self.chunk is not None
 
     @property
     def status(self) -> LoadStatus:
+        if self.job_id is not None:
+            return LoadStatus.NONE
+        if self.chunk is not None:
+            return LoadStatus.START
         if self.error is not None:
             return LoadStatus.ERROR
         if self.debug:
             return LoadStatus.DEBUG
         if self.complete:
             return LoadStatus.COMPLETE
-        if self.mesh is not None:
+        if self.mesh is not None or self.packed is not None or self.deltas is not None:
             return LoadStatus.START
         return LoadStatus.NONE
 
@@ -123,58 +358,607 @@ def debug_color() -> Generator[tuple[float, float, float], None, None]:
         yield colorsys.hsv_to_rgb(hue, 1.0, 1.0)
 
 
+PUT_QUEUE_TIMEOUT = 0.1
+
+
+def put_replacing_oldest(
+    load_queue: LoadQueue,
+    result: LoadResult,
+    is_cancelled: Callable[[], bool],
+    on_drop: Callable[[LoadResult], None],
+    replace_oldest: bool = True,
+) -> bool:
+    """
+    Put the result, dropping the oldest queued result while the queue is full
+    so the consumer always gets the most recent mesh.
+    Unless replace_oldest is False, then wait for the consumer instead.
+    Results that must arrive are never dropped; they are waited on instead.
+    Returns False if the load was cancelled before the result was put.
+    """
+    while True:  # tends to be race conditions between full and empty
+        if is_cancelled():
+            logger.info("Load cancelled, not queuing result")
+            on_drop(result)
+            return False
+        try:
+            load_queue.put(result, timeout=PUT_QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            if not replace_oldest:
+                continue
+            try:
+                dropped = load_queue.get_nowait()
+            except queue.Empty:
+                continue
+            if not dropped.must_arrive:
+                on_drop(dropped)
+                continue
+            # Put it back, and wait for the consumer to take it
+            load_queue.put(dropped)
+            replace_oldest = False
+
+
+def discard_result(result: LoadResult):
+    """Remove the shared memory of a result that will never be read."""
+    unlink_packed_mesh(result.packed)
+    unlink_shared_vertices(result.deltas)
+
+
+def carry_over(result: LoadResult, dropped: LoadResult) -> bool:
+    """
+    If the result only holds changes to the dropped result, which now never
+    arrives, make it carry the mesh and changes of the dropped result too.
+    Returns True if it took over the mesh of the dropped result.
+    """
+    if (
+        result.deltas is None
+        or result.mesh is not None
+        or result.packed is not None
+        or dropped is result
+        or dropped.load_number != result.load_number
+    ):
+        return False
+    result.mesh = dropped.mesh
+    result.packed = dropped.packed
+    result.deltas = (dropped.deltas or []) + result.deltas
+    return True
+
+
+def _is_other_frame(dropped: LoadResult, result: LoadResult) -> bool:
+    return (
+        dropped.load_number == result.load_number
+        and dropped.sequence_number != result.sequence_number
+    )
+
+
+@dataclass
+class MemoizedKeys:
+    """Sent by a forked load for the results it memoized to disk."""
+
+    keys: list[str]
+
+
+class ResultPipe:
+    """
+    Stands in for the load queue in a forked load.
+    A pipe whose other end is only open in the loader process
+    reports EOF when the child dies, even part way through a send.
+    """
+
+    def __init__(self, conn: Connection, load_queue: MpLoadQueue | None = None):
+        self._conn = conn
+        # Inherited from the loader, only to see whether the viewer is keeping up
+        self._load_queue = load_queue
+
+    def put(self, item: LoadResult, block: bool = True, timeout: float | None = None):
+        self._conn.send(item)
+
+    def put_memoized_keys(self, keys: list[str]):
+        self._conn.send(MemoizedKeys(keys))
+
+    def get_nowait(self) -> LoadResult:
+        raise queue.Empty
+
+    def full(self) -> bool:
+        return self._load_queue is not None and self._load_queue.full()
+
+    def close(self):
+        self._conn.close()
+
+
+# Where a load sends its results: a plain queue when nothing else
+# takes them, as for a headless export
+LoadQueue = MpLoadQueue | ResultPipe | queue.Queue[LoadResult]
+
+
+def _part_to_trimesh(index: int, part: Any) -> Trimesh:
+    if isinstance(part, Trimesh):
+        return part
+    if isinstance(part, Manifold):
+        return manifold_to_trimesh(part)
+    raise TypeError(
+        f"Expected mesh[{index}] to be of type Trimesh or Manifold, got {type(part)}"
+    )
+
+
+def _snapshot(mesh: Any) -> Any:
+    # Frames wait between stages, and create_mesh may change a Trimesh
+    # in place once it has yielded it
+    if isinstance(mesh, Trimesh):
+        return mesh.copy()
+    if isinstance(mesh, list):
+        return [m.copy() if isinstance(m, Trimesh) else m for m in mesh]  # pyright: ignore[reportUnknownVariableType] - checked by _check_mesh_type
+    return mesh
+
+
+# Frames waiting between two stages of a load
+PIPELINE_DEPTH = 2
+# How often a forked load is checked against its budgets
+BUDGET_CHECK_INTERVAL = 0.05
+# Parts of a list converted so far are sent at most this often
+PARTS_PROGRESS_INTERVAL = 0.1
+
+
+@dataclass
+class _Frame:
+    sequence_number: int
+    mesh: CreateMeshResultType | MeshType | None
+
+
+@dataclass
+class _EndOfFrames:
+    sequence_number: int
+    error: Exception | None = None
+
+
+def _put_stage(q: queue.Queue[Any], item: Any, stopped: Callable[[], bool]) -> bool:
+    """Put the item for the next stage, unless stopped while waiting for room"""
+    while not stopped():
+        try:
+            q.put(item, timeout=PUT_QUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get_stage(q: queue.Queue[T], stopped: Callable[[], bool]) -> T | None:
+    """Get the next item from the previous stage, or None if stopped while waiting"""
+    while not stopped():
+        try:
+            return q.get(timeout=PUT_QUEUE_TIMEOUT)
+        except queue.Empty:
+            pass
+    return None
+
+
 class LoadWorker(Thread):
-    PUT_QUEUE_TIMEOUT = 0.1
+    """
+    Loads a module, sending each mesh it yields to the load queue.
+
+    A load runs as a pipeline of three stages, each on its own thread:
+    create_mesh generates frames, they are converted to Trimesh,
+    then they are transferred to the load queue.
+    The stages are joined by small queues, so create_mesh can work
+    on the next frame while the last one is converted and sent,
+    and a load streams at the speed of its slowest stage.
+    """
+
     load_number = 0
 
-    def __init__(self, module_path: str, load_queue: MpLoadQueue):
+    def __init__(
+        self,
+        module_path: str,
+        load_queue: LoadQueue,
+        options: LoaderOptions | None = None,
+        params: dict[str, ParamValue] | None = None,
+        viewer_ready: synchronize.Event | None = None,
+    ):
+        """
+        Args:
+            viewer_ready: Set by the viewer when it has taken the last result;
+                cleared here as each frame is sent. Without it, the viewer is
+                taken to be ready while the load queue has room.
+        """
         super().__init__()
         self.module_path = module_path
         self.load_queue = load_queue
+        self.options = options or LoaderOptions()
+        self.params = params
+        self.viewer_ready = viewer_ready
         self.cancelled = False
+        self._shared_mesh_writer = SharedMeshWriter(
+            self.options.shared_memory_min_faces,
+            self.options.compact_transfer,
+            self.options.compress_min_bytes,
+        )
+        self._cache_entry: ResultCacheEntry | None = None
+        self._cached_module_files: list[str] | None = None
+        self.frame_counters = FrameCounters()
+        self._converted_sequence_number = 0
+        self._delivered_sequence_number = 0
+        self._last_sent_time: float | None = None
+        # Only the first frame of a load is streamed; later ones replace it whole
+        self._streamed = False
+        # Frames are snapshots already, so the detector need not copy them
+        self._delta_detector = (
+            MeshDeltaDetector(copy=False) if self.options.send_mesh_deltas else None
+        )
+        # Stages run on their own threads, so skips and drops may be counted at once
+        self._counters_lock = Lock()
+        self._conversion_stopped = Event()
+        self._part_pool: ThreadPoolExecutor | None = None
 
     def run(self):
         LoadWorker.load_number += 1
         self.load()
 
     def load(self):
-        sequence_number = 0
+        try:
+            self._load()
+        finally:
+            if self._part_pool is not None:
+                self._part_pool.shutdown(wait=False, cancel_futures=True)
+            self._shared_mesh_writer.close()
+            if self._cache_entry is not None:
+                # Only has an effect if the load did not complete
+                self._cache_entry.abort()
+            c = self.frame_counters
+            logger.info(
+                f"Frames produced: {c.produced}, converted: {c.converted}, delivered: {c.delivered}, dropped: {c.dropped}"
+            )
+
+    def _load(self):
         self.load_start_time = time()
-        last_mesh = None
+        self._budget_start_time = monotonic()
+        cached = self._cached_meshes()
+        if cached is None:
+            self._cache_entry = self._begin_cache_entry()
+        frames = self.run_mesh_module() if cached is None else iter(cached)
+        to_convert: queue.Queue[_Frame | _EndOfFrames] = queue.Queue(PIPELINE_DEPTH)
+        to_transfer: queue.Queue[LoadResult] = queue.Queue(PIPELINE_DEPTH)
+        stages = [
+            Thread(
+                target=self._convert_stage,
+                args=(to_convert, to_transfer),
+                name=f"Convert-{self.load_number}",
+                daemon=True,
+            ),
+            Thread(
+                target=self._transfer_stage,
+                args=(to_transfer,),
+                name=f"Transfer-{self.load_number}",
+                daemon=True,
+            ),
+        ]
+        for stage in stages:
+            stage.start()
         try:
-            for mesh in self.run_mesh_module():
-                last_mesh = mesh
+            self._generate_stage(frames, to_convert)
+        finally:
+            for stage in stages:
+                stage.join()
+
+    def _generate_stage(
+        self,
+        frames: Iterator[CreateMeshResultType | MeshType],
+        to_convert: queue.Queue[_Frame | _EndOfFrames],
+    ):
+        sequence_number = 0
+
+        def stopped() -> bool:
+            return self.cancelled or self._conversion_stopped.is_set()
+
+        try:
+            for mesh in frames:
+                # Only seen as create_mesh yields again, so a load that finishes
+                # is never aborted; a forked load is also stopped mid-yield
+                exceeded = (
+                    exceeded_budget(
+                        self.options, self._budget_start_time, sequence_number
+                    )
+                    if sequence_number > 0
+                    else None
+                )
+                with self._counters_lock:
+                    self.frame_counters.produced += 1
+                if exceeded is not None:
+                    logger.warning(str(exceeded))
+                    with self._counters_lock:
+                        self.frame_counters.dropped += 1
+                    _put_stage(
+                        to_convert, _EndOfFrames(sequence_number, exceeded), stopped
+                    )
+                    return
                 sequence_number += 1
-                if self.cancelled:
-                    logger.info("LoadWorker cancelled, stopping load")
+                if stopped() or not _put_stage(
+                    to_convert, _Frame(sequence_number, mesh), stopped
+                ):
+                    logger.info("LoadWorker stopped, not running create_mesh further")
+                    with self._counters_lock:
+                        self.frame_counters.dropped += 1
                     return
-                self._update_mesh(sequence_number, mesh)
         except Exception as e:
-            self._update_mesh(sequence_number, last_mesh, final=True, error=e)
+            _put_stage(to_convert, _EndOfFrames(sequence_number, e), stopped)
             return
-        self._update_mesh(sequence_number, last_mesh, final=True)
+        _put_stage(to_convert, _EndOfFrames(sequence_number), stopped)
+
+    def _convert_stage(
+        self,
+        to_convert: queue.Queue[_Frame | _EndOfFrames],
+        to_transfer: queue.Queue[LoadResult],
+    ):
+        try:
+            self._convert_frames(to_convert, to_transfer)
+        finally:
+            self._conversion_stopped.set()
 
-    def _update_mesh(
+    def _convert_frames(
+        self,
+        to_convert: queue.Queue[_Frame | _EndOfFrames],
+        to_transfer: queue.Queue[LoadResult],
+    ):
+
+        def stopped() -> bool:
+            return self.cancelled
+
+        # The last frame, converted unless it was skipped
+        last = _Frame(0, None)
+        skipped = False
+        cache_all = self.options.cache_intermediate_meshes
+        item = _get_stage(to_convert, stopped)
+        while isinstance(item, _Frame):
+            # Look ahead, to skip a frame that is already superseded
+            try:
+                waiting = to_convert.get_nowait()
+            except queue.Empty:
+                waiting = None
+            if skipped:
+                # The skipped frame is superseded without being converted
+                with self._counters_lock:
+                    self.frame_counters.dropped += 1
+            try:
+                mesh = item.mesh
+                if self._cache_entry and cache_all:
+                    mesh = self._convert(item.sequence_number, mesh)
+                    self._cache_entry.add(mesh)
+                last = _Frame(item.sequence_number, mesh)
+                skipped = not self._wants_frame(isinstance(waiting, _Frame))
+                if not skipped:
+                    self._last_sent_time = monotonic()
+                    if self.viewer_ready is not None:
+                        # Before it is sent, so the viewer cannot take it first
+                        self.viewer_ready.clear()
+                    result = self._frame_result(
+                        item.sequence_number,
+                        mesh,
+                        on_parts=self._parts_sender(item.sequence_number, to_transfer),
+                    )
+                    last = _Frame(item.sequence_number, result.mesh)
+                    if not _put_stage(to_transfer, result, stopped):
+                        return
+            except Exception as e:
+                _put_stage(to_transfer, self._final_result(last, e), stopped)
+                return
+            item = waiting if waiting is not None else _get_stage(to_convert, stopped)
+        if item is None:
+            return
+        error = item.error
+        if error is None and self._cache_entry and last.mesh is not None:
+            try:
+                if not cache_all:
+                    self._cache_entry.add(
+                        self._convert(last.sequence_number, last.mesh)
+                    )
+                self._cache_entry.commit()
+            except Exception as e:
+                error = e
+        # Sent even if skipped, as the final result is the one that must arrive
+        _put_stage(to_transfer, self._final_result(last, error), stopped)
+
+    def _parts_sender(
+        self, sequence_number: int, to_transfer: queue.Queue[LoadResult]
+    ) -> Callable[[list[Trimesh], int], None]:
+        last_sent_time = monotonic()
+
+        def send_parts(parts: list[Trimesh], total: int):
+            # Only if the transfer stage is ready, so it never holds up the conversion
+            nonlocal last_sent_time
+            if len(parts) == total or to_transfer.full():
+                return
+            if monotonic() - last_sent_time < PARTS_PROGRESS_INTERVAL:
+                return
+            last_sent_time = monotonic()
+            tmesh: MeshType = list(parts)
+            self._color_if_debug(tmesh)
+            try:
+                to_transfer.put_nowait(
+                    LoadResult(
+                        self.load_number,
+                        sequence_number,
+                        tmesh,
+                        None,
+                        parts_progress=(len(parts), total),
+                    )
+                )
+            except queue.Full:
+                pass
+
+        return send_parts
+
+    def _transfer_stage(self, to_transfer: queue.Queue[LoadResult]):
+        while True:
+            result = _get_stage(to_transfer, lambda: self.cancelled)
+            if result is None:
+                return
+            self._send(result)
+            if result.complete:
+                return
+
+    def _wants_frame(self, superseded: bool) -> bool:
+        """
+        Whether to convert and send a frame, or skip it.
+        It is superseded if the next frame was produced before it was converted.
+        """
+        delivery = self.options.frame_delivery
+        if delivery == FrameDelivery.EVERY:
+            return True
+        if delivery == FrameDelivery.RATE_LIMITED:
+            return (
+                self._last_sent_time is None
+                or monotonic() - self._last_sent_time >= 1 / self.options.max_frame_rate
+            )
+        # The first frame is always sent, so the viewer has something to show
+        if self._last_sent_time is None:
+            return True
+        # If the viewer has not taken the last frame, this one would replace it
+        if superseded:
+            return False
+        if self.viewer_ready is not None:
+            return self.viewer_ready.is_set()
+        return not self.load_queue.full()
+
+    def _result_cache(self) -> ResultCache | None:
+        if not self.options.use_result_cache or not os.path.isfile(self.module_path):
+            return None
+        return ResultCache(
+            self.options.result_cache_dir,
+            self.options.result_cache_max_bytes,
+            self.options.project_root,
+        )
+
+    def _cached_meshes(self) -> list[MeshType] | None:
+        cache = self._result_cache()
+        if cache is None:
+            return None
+        meshes = cache.lookup(self.module_path, self.params)
+        if meshes is not None:
+            # The module did not run, so its imports are not in sys.modules
+            self._cached_module_files = cache.dependencies(self.module_path)
+        return meshes
+
+    def _module_files(self) -> list[str]:
+        if self._cached_module_files is not None:
+            return self._cached_module_files
+        return user_module_files(self.module_path, self.options.project_root)
+
+    def _begin_cache_entry(self) -> ResultCacheEntry | None:
+        cache = self._result_cache()
+        return cache.begin(self.module_path, self.params) if cache is not None else None
+
+    def _frame_result(
         self,
         sequence_number: int,
-        mesh: MeshType | None,
+        mesh: CreateMeshResultType | MeshType | None,
         final: bool = False,
         error: Exception | None = None,
-    ):
-        tmesh = self._ensure_trimesh(mesh) if mesh is not None else None
+        on_parts: Callable[[list[Trimesh], int], None] | None = None,
+    ) -> LoadResult:
+        tmesh = (
+            self._convert(sequence_number, mesh, on_parts) if mesh is not None else None
+        )
         self._color_if_debug(tmesh)
+        return LoadResult(
+            self.load_number,
+            sequence_number,
+            tmesh,
+            error=error,
+            complete=final,
+            module_files=self._module_files() if final else None,
+            frame_counters=self.frame_counters if final else None,
+        )
 
-        self.put_in_queue(
-            LoadResult(
-                self.load_number,
-                sequence_number,
-                tmesh,
-                error=error,
-                complete=final,
-            )
+    def _final_result(self, last: _Frame, error: Exception | None) -> LoadResult:
+        try:
+            return self._frame_result(last.sequence_number, last.mesh, True, error)
+        except Exception as e:
+            return self._frame_result(last.sequence_number, None, True, error or e)
+
+    def _send(self, result: LoadResult):
+        tmesh = result.mesh
+        if self._delta_detector is not None:
+            if isinstance(tmesh, Trimesh) and not result.complete:
+                delta = self._delta_detector.diff(tmesh)
+                if delta is not None:
+                    if delta.vertices is not None:
+                        assert not isinstance(delta.vertices, SharedArrays)
+                        delta.vertices = self._shared_mesh_writer.pack_vertices(
+                            delta.vertices, len(tmesh.faces)
+                        )
+                    result.mesh = None
+                    result.deltas = [delta]
+            else:
+                self._delta_detector.reset()
+        # The final result repeats the last frame, which may already be delivered
+        new_frame = (
+            tmesh is not None
+            and result.sequence_number != self._delivered_sequence_number
+        )
+        if new_frame and self._streams(result):
+            if not self._send_chunks(result):
+                return
+            result.streamed = True
+            self._streamed = True
+        packed = (
+            self._shared_mesh_writer.pack(result.mesh)
+            if result.mesh is not None
+            else None
         )
+        if packed is not None:
+            result.mesh = None
+            result.packed = packed
+        if new_frame:
+            # Counted before the put, so the final result carries the count
+            with self._counters_lock:
+                self.frame_counters.delivered += 1
+        if self.put_in_queue(result):
+            self._delivered_sequence_number = result.sequence_number
+        elif new_frame:
+            with self._counters_lock:
+                self.frame_counters.displaced()
 
-    def _ensure_trimesh(self, mesh: Any) -> MeshType | None:
+    def _streams(self, result: LoadResult) -> bool:
+        min_faces = self.options.stream_min_faces
+        return (
+            min_faces is not None
+            and not self._streamed
+            and result.deltas is None
+            and isinstance(result.mesh, Trimesh)
+            and len(result.mesh.faces) >= min_faces
+            and is_opaque(result.mesh)
+        )
+
+    def _send_chunks(self, result: LoadResult) -> bool:
+        """
+        Send the mesh of the result in chunks, ahead of the whole mesh.
+        Returns False if the load was cancelled first.
+        """
+        assert isinstance(result.mesh, Trimesh)
+        for chunk in mesh_chunks(result.mesh, self.options.stream_chunk_faces):
+            chunk_result = LoadResult(
+                self.load_number, result.sequence_number, None, None, chunk=chunk
+            )
+            if not self.put_in_queue(chunk_result):
+                return False
+        return True
+
+    def _convert(
+        self,
+        sequence_number: int,
+        mesh: CreateMeshResultType | MeshType | None,
+        on_parts: Callable[[list[Trimesh], int], None] | None = None,
+    ) -> MeshType | None:
+        if sequence_number != self._converted_sequence_number:
+            self.frame_counters.converted += 1
+        tmesh = self._ensure_trimesh(mesh, on_parts)
+        self._converted_sequence_number = sequence_number
+        return tmesh
+
+    def _ensure_trimesh(
+        self,
+        mesh: Any,
+        on_parts: Callable[[list[Trimesh], int], None] | None = None,
+    ) -> MeshType | None:
         if mesh is None:
             return None
         if isinstance(mesh, Trimesh):
@@ -182,49 +966,76 @@ class LoadWorker(Thread):
         if isinstance(mesh, Manifold):
             return manifold_to_trimesh(mesh)
         if isinstance(mesh, list):
-            result: list[Trimesh] = []
-            for m in mesh:  # type: ignore[reportUnknowVariableType] - can't resolve
-                if isinstance(m, Trimesh):
-                    result.append(m)
-                elif isinstance(m, Manifold):
-                    result.append(manifold_to_trimesh(m))
-                else:
-                    raise TypeError(
-                        f"Expected mesh item to be of type Trimesh or Manifold, got {type(m)}"  # type: ignore[reportUnknowArgumentType] - can't resolve
-                    )
-            return result
+            return self._convert_parts(mesh, on_parts)  # pyright: ignore[reportUnknownArgumentType] - can't resolve
         raise TypeError(
             f"Expected mesh to be of type Trimesh, list[Trimesh], Manifold, or list[Manifold], got {type(mesh)}"
         )
 
+    def _convert_parts(
+        self,
+        parts: list[Any],
+        on_parts: Callable[[list[Trimesh], int], None] | None,
+    ) -> list[Trimesh]:
+        """
+        Convert the parts of a list on a pool of threads, which manifold and numpy
+        let run at once, passing the parts converted so far, in order, to on_parts.
+        """
+        if all(isinstance(part, Trimesh) for part in parts):
+            return list(parts)
+        if self._part_pool is None:
+            self._part_pool = ThreadPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                thread_name_prefix=f"ConvertPart-{self.load_number}",
+            )
+        futures: list[Future[Trimesh]] = [
+            self._part_pool.submit(_part_to_trimesh, i, part)
+            for i, part in enumerate(parts)
+        ]
+        converted: list[Trimesh] = []
+        try:
+            for future in futures:
+                converted.append(future.result())
+                if on_parts is not None:
+                    on_parts(converted, len(parts))
+        finally:
+            for future in futures:
+                future.cancel()
+        return converted
+
     def _color_if_debug(self, tmesh: MeshType | None):
         if isinstance(tmesh, list):
             for tm, color in zip(tmesh, debug_color()):
                 if "scadview" not in tm.metadata:
                     set_mesh_color(tm, color, alpha=DEBUG_COLOR_ALPHA)
 
-    def put_in_queue(self, result: LoadResult):
-        result_put = False
-        while not result_put:  # tends to be race conditions between full and empty
-            if self.cancelled:
-                logger.info("LoadWorker cancelled, stopping load")
-                return
-            try:
-                self.load_queue.put(result, timeout=self.PUT_QUEUE_TIMEOUT)
-                result_put = True
-            except queue.Full:
-                try:
-                    _ = self.load_queue.get_nowait()
-                except queue.Empty:
-                    pass
+    def put_in_queue(self, result: LoadResult) -> bool:
+        def on_drop(dropped: LoadResult):
+            if not carry_over(result, dropped):
+                self._shared_mesh_writer.recycle(dropped.packed)
+                unlink_shared_vertices(dropped.deltas)
+            if _is_other_frame(dropped, result):
+                with self._counters_lock:
+                    self.frame_counters.displaced()
+
+        return put_replacing_oldest(
+            self.load_queue,
+            result,
+            lambda: self.cancelled,
+            on_drop,
+            self.options.frame_delivery != FrameDelivery.EVERY,
+        )
 
     def run_mesh_module(self) -> Generator[MeshType, None, None]:
-        module_loader = ModuleLoader(CREATE_MESH_FUNCTION_NAME)
+        module_loader = ModuleLoader(
+            CREATE_MESH_FUNCTION_NAME, self.options.project_root
+        )
         t0 = time()
-        for i, mesh in enumerate(module_loader.run_function(self.module_path)):
+        for i, mesh in enumerate(
+            module_loader.run_function(self.module_path, self.params)
+        ):
             logger.info(f"Loading mesh #{i + 1}")
             self._check_mesh_type(mesh)
-            yield mesh
+            yield _snapshot(mesh)
         t1 = time()
         logger.info(f"Load {self.module_path} took {(t1 - t0) * 1000:.1f}ms")
 
@@ -234,11 +1045,7 @@ class LoadWorker(Thread):
         if isinstance(mesh, Manifold):
             return
         if isinstance(mesh, list):
-            for i, m in enumerate(mesh):  # type: ignore[reportUnknowVariableType] - can't resolve
-                if not isinstance(m, Trimesh) and not isinstance(m, Manifold):
-                    raise TypeError(
-                        f"Expected mesh[{i}] to be of type Trimesh or Manifold, got {type(m)}"  # type: ignore[reportUnknowArgumentType] - can't resolve
-                    )
+            # The parts are checked as they are converted
             return
         raise TypeError(
             f"Expected mesh to be of type Trimesh, list[Trimesh], Manifold, or list[Manifold], got {type(mesh)}"
@@ -248,6 +1055,230 @@ class LoadWorker(Thread):
         self.cancelled = True
 
 
+class ForkedLoad:
+    """
+    Runs one load in a child forked from the loader process.
+
+    The child starts with every module the loader pre-imported
+    and its reloads die with it, so nothing piles up across loads.
+    Cancelling kills the child outright, even in the middle of a boolean.
+    Results come back over a private pipe and are relayed to the load queue,
+    so killing the child can never leave the load queue half written.
+    """
+
+    def __init__(
+        self,
+        module_path: str,
+        load_queue: MpLoadQueue,
+        options: LoaderOptions,
+        params: dict[str, ParamValue] | None = None,
+        viewer_ready: synchronize.Event | None = None,
+    ):
+        LoadWorker.load_number += 1
+        self.load_number = LoadWorker.load_number
+        self._load_queue = load_queue
+        self._receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._sender = ResultPipe(sender, load_queue)
+        # Budgets are enforced from here, where a load stuck in create_mesh can be killed
+        self._options = options
+        self._worker = LoadWorker(
+            module_path,
+            self._sender,
+            replace(options, load_time_budget=None, load_rss_budget=None),
+            params,
+            viewer_ready,
+        )
+        self._replace_oldest = options.frame_delivery != FrameDelivery.EVERY
+        # Frames the child delivered that the relay then dropped
+        self._frames_displaced = 0
+        self._process = multiprocessing.get_context("fork").Process(
+            target=self._run_child, name=f"MeshLoad-{self.load_number}", daemon=True
+        )
+        self._relay = Thread(target=self._relay_results, daemon=True)
+        self._last_sequence_number = 0
+        self.cancelled = False
+
+    def start(self):
+        self._start_time = monotonic()
+        self._process.start()
+        # Only the child may hold the sending end, so its death closes the pipe
+        self._sender.close()
+        self._relay.start()
+
+    def is_alive(self) -> bool:
+        return self._process.is_alive() or self._relay.is_alive()
+
+    def _run_child(self):
+        self._worker.load()
+        keys = memo_cache.take_new_keys()
+        if keys:
+            self._sender.put_memoized_keys(keys)
+
+    def cancel(self):
+        self.cancelled = True
+        if self._process.is_alive():
+            logger.info(f"Killing load process {self._process.pid}")
+            self._process.kill()
+        self._process.join()
+        self._relay.join()
+
+    def _relay_results(self):
+        completed = False
+        while True:
+            if not completed and self._abort_if_over_budget():
+                completed = True
+                break
+            try:
+                if not self._receiver.poll(BUDGET_CHECK_INTERVAL):
+                    continue
+                result: LoadResult | MemoizedKeys = self._receiver.recv()
+            except (EOFError, OSError):
+                break
+            if isinstance(result, MemoizedKeys):
+                # Forks inherit memory, so later loads start with these results
+                memo_cache.load_from_disk(result.keys)
+                continue
+            self._last_sequence_number = result.sequence_number
+            completed = completed or result.complete
+            self._relay_result(result)
+        self._receiver.close()
+        if not completed and not self.cancelled:
+            self._process.join()
+            self._report_exit()
+
+    def _relay_result(self, result: LoadResult):
+        counters = result.frame_counters
+        if counters is not None:
+            for _ in range(self._frames_displaced):
+                counters.displaced()
+
+        def on_drop(dropped: LoadResult):
+            if not carry_over(result, dropped):
+                discard_result(dropped)
+            if _is_other_frame(dropped, result):
+                self._frames_displaced += 1
+                if counters is not None:
+                    counters.displaced()
+
+        put_replacing_oldest(
+            self._load_queue,
+            result,
+            lambda: self.cancelled,
+            on_drop,
+            self._replace_oldest,
+        )
+
+    def _abort_if_over_budget(self) -> bool:
+        if not self._process.is_alive():
+            # Finished, or died and reported by _report_exit
+            return False
+        pid = self._process.pid
+        exceeded = exceeded_budget(
+            self._options,
+            self._start_time,
+            self._last_sequence_number,
+            pid or "self",
+        )
+        if exceeded is None:
+            return False
+        logger.warning(f"{exceeded}; killing load process {pid}")
+        self._process.kill()
+        self._process.join()
+        put_replacing_oldest(
+            self._load_queue,
+            LoadResult(
+                self.load_number,
+                self._last_sequence_number,
+                None,
+                exceeded,
+                complete=True,
+            ),
+            lambda: self.cancelled,
+            discard_result,
+        )
+        return True
+
+    def _report_exit(self):
+        logger.error(
+            f"Load process exited with code {self._process.exitcode} before completing"
+        )
+        put_replacing_oldest(
+            self._load_queue,
+            LoadResult(
+                self.load_number,
+                self._last_sequence_number,
+                None,
+                ChildProcessError(
+                    f"Load process exited with code {self._process.exitcode}"
+                ),
+                complete=True,
+            ),
+            lambda: self.cancelled,
+            discard_result,
+        )
+
+
+def _load_error(
+    worker: LoadWorker, results: queue.Queue[LoadResult]
+) -> Exception | None:
+    worker.load()
+    try:
+        return results.get_nowait().error
+    except queue.Empty:  # Cancelled before the final result
+        return None
+
+
+class PrefetchJob(Job):
+    """
+    Load the module with the parameters before the viewer asks for them,
+    storing the result in the result cache for the load that does.
+    Raises the error of the load if it fails.
+    Does nothing unless loads are forked: the loader then runs it in a child
+    it kills when cancelled, where on a thread it would reload the module
+    beside the load.
+    """
+
+    priority = JobPriority.SPECULATIVE
+
+    def __init__(
+        self,
+        module_path: str,
+        params: dict[str, ParamValue],
+        options: LoaderOptions | None = None,
+    ):
+        self.module_path = module_path
+        self.params = params
+        # Only the result cache sees the meshes, so they are never packed
+        self.options = replace(
+            options or LoaderOptions(),
+            shared_memory_min_faces=None,
+            compact_transfer=False,
+            send_mesh_deltas=False,
+            stream_min_faces=None,
+            frame_delivery=FrameDelivery.LATEST,
+        )
+
+    def run(self, token: CancelToken):
+        if not self.options.use_result_cache or not self.options.fork_loads:
+            return
+        results: queue.Queue[LoadResult] = queue.Queue(maxsize=1)
+        # Not run as a thread, which would count as one of the viewer's loads
+        worker = LoadWorker(self.module_path, results, self.options, self.params)
+        error = _load_error(worker, results)
+        if error is not None:
+            raise error
+
+
+def prewarm_modules():
+    t0 = time()
+    for module_name in PREWARM_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError as e:
+            logger.warning(f"Could not pre-import {module_name}: {e}")
+    logger.info(f"Pre-importing modules took {(time() - t0) * 1000:.1f}ms")
+
+
 class MeshLoaderProcess(Process):
     COMMAND_QUEUE_CHECK_TIMEOUT = 0.1
 
@@ -257,13 +1288,21 @@ class MeshLoaderProcess(Process):
         load_queue: MpLoadQueue,
         log_queue: mp_queues.Queue[logging.LogRecord],
         log_level: int,
+        options: LoaderOptions | None = None,
+        viewer_ready: synchronize.Event | None = None,
     ):
         super().__init__()
         self._command_queue = command_queue
         self._load_queue = load_queue
-        self._worker: LoadWorker | None = None
+        # Passed to each load, to see whether the viewer took the last frame
+        self._viewer_ready = viewer_ready
+        self._worker: LoadWorker | ForkedLoad | None = None
         self._log_queue = log_queue
         self._log_level = log_level
+        self._options = options or LoaderOptions()
+        self._scheduler: JobScheduler | None = None
+        # Their results only go to the result cache, so none are sent
+        self._speculative_job_ids: set[int] = set()
 
     def run(self) -> None:
         # Set logging level for the loaded module; it can be changed in that module
@@ -272,7 +1311,23 @@ class MeshLoaderProcess(Process):
         # Set the level for the logger in the function to the level passed
         logger.setLevel(self._log_level)
 
+        # Forked loads would outlive a terminated loader, so kill them first
+        signal.signal(signal.SIGTERM, self._on_terminate)
+
+        prewarm_modules()
+        # Forked before any thread starts, with the pre-imported modules
+        start_pool(self._options.parallel_workers, self._options.project_root)
+
+        # Forked like loads, so they are killed when cancelled and their imports
+        # never reach the loader
+        self._scheduler = JobScheduler(
+            self._options.job_workers,
+            self._send_job_result,
+            self._may_start_job,
+            fork_jobs=self._options.fork_loads,
+        )
         while True:
+            self._wake_jobs_after_load()
             try:
                 command = self._command_queue.get(
                     timeout=self.COMMAND_QUEUE_CHECK_TIMEOUT
@@ -280,14 +1335,27 @@ class MeshLoaderProcess(Process):
             except queue.Empty:
                 continue
             if isinstance(command, LoadMeshCommand):
+                # The load needs the cores that speculation was using
+                self._scheduler.cancel_priority(JobPriority.SPECULATIVE)
+                if self._options.fork_loads:
+                    # Killed prefetches may have been using the pool
+                    self._scheduler.wait_for_priority(JobPriority.SPECULATIVE)
                 self.cancel()
+                recover_pool()
                 logger.info(f"Loading mesh from {command.module_path}")
-                self._worker = LoadWorker(command.module_path, self._load_queue)
+                self._worker = self._create_worker(command)
                 self._worker.start()
             elif isinstance(command, CancelLoadCommand):
                 logger.info("Load cancelled")
                 self.cancel()
                 continue
+            elif isinstance(command, SubmitJobCommand):
+                logger.info(f"Job {command.job_id} submitted")
+                if command.job.priority == JobPriority.SPECULATIVE:
+                    self._speculative_job_ids.add(command.job_id)
+                self._scheduler.submit(command.job_id, command.job)
+            elif isinstance(command, CancelJobCommand):
+                self._scheduler.cancel(command.job_id)
             elif isinstance(command, ShutDownCommand):
                 logger.info("Shutting down loader process")
                 self.cancel(close_queues=True)
@@ -295,11 +1363,65 @@ class MeshLoaderProcess(Process):
             else:
                 logger.warning(f"Unknown command received: {command}")
 
+    def _on_terminate(self, signum: int, frame: FrameType | None):
+        self.cancel()
+        sys.exit(0)
+
+    def _create_worker(self, command: LoadMeshCommand) -> LoadWorker | ForkedLoad:
+        options = self._options
+        if not command.use_cache:
+            options = replace(options, use_result_cache=False)
+        if options.fork_loads:
+            return ForkedLoad(
+                command.module_path,
+                self._load_queue,
+                options,
+                command.params,
+                self._viewer_ready,
+            )
+        return LoadWorker(
+            command.module_path,
+            self._load_queue,
+            options,
+            command.params,
+            self._viewer_ready,
+        )
+
+    def _wake_jobs_after_load(self):
+        if self._worker is not None and not self._worker.is_alive():
+            self._worker = None
+            assert self._scheduler is not None
+            # Background jobs waiting for the load may start
+            self._scheduler.wake()
+
+    def _may_start_job(self, job: Job) -> bool:
+        # Background jobs wait for the load the viewer is waiting on
+        worker = self._worker
+        return job.priority <= JobPriority.INTERACTIVE or not (
+            worker is not None and worker.is_alive()
+        )
+
+    def _send_job_result(self, job_id: int, output: Any, error: Exception | None):
+        if job_id in self._speculative_job_ids:
+            self._speculative_job_ids.discard(job_id)
+            return
+        put_replacing_oldest(
+            self._load_queue,
+            LoadResult(
+                0, 0, None, error, complete=True, job_id=job_id, job_output=output
+            ),
+            lambda: False,
+            lambda _: None,
+            replace_oldest=False,
+        )
+
     def cancel(self, close_queues: bool = False):
         if self._worker is not None and self._worker.is_alive():
             logger.info("Cancelling in progress load")
             self._worker.cancel()
         if close_queues:
+            if self._scheduler is not None:
+                self._scheduler.shut_down()
             self._command_queue.close()
             self._load_queue.close()
         self._worker = None
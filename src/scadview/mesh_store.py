@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Any
+
+import numpy as np
+from manifold3d import Manifold, Mesh
+from numpy.typing import NDArray
+from trimesh import Trimesh
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FILE = "entry.json"
+PENDING_PREFIX = ".pending-"
+# Only the metadata the viewer uses is kept; the rest may not be JSON serializable
+STORED_METADATA_KEYS = ["scadview"]
+
+StoredValue = Any
+
+
+class MeshStore:
+    """
+    A directory of entries holding meshes as .npy files.
+    Besides Trimesh, entries can hold Manifolds, arrays, lists and tuples
+    of these, and plain JSON values.
+
+    Arrays are memory-mapped when an entry is read, so large meshes load
+    without being copied into memory up front.
+    Once the store grows past `max_bytes` the least recently read entries
+    are evicted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def get(self, key: str) -> list[StoredValue] | None:
+        entry_file = os.path.join(self._entry_dir(key), ENTRY_FILE)
+        try:
+            with open(entry_file) as f:
+                entry = json.load(f)
+            values = [_decode(node, self._entry_dir(key)) for node in entry["values"]]
+        except (OSError, ValueError, KeyError) as e:
+            if not isinstance(e, FileNotFoundError):
+                logger.warning(f"Discarding unreadable store entry {key}: {e}")
+                self.remove(key)
+            return None
+        os.utime(entry_file)  # Mark as recently used
+        return values
+
+    def begin(self) -> PendingEntry:
+        return PendingEntry(self)
+
+    def put(self, key: str, values: list[StoredValue]):
+        pending = self.begin()
+        for value in values:
+            pending.add(value)
+        pending.commit(key)
+
+    def remove(self, key: str):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            logger.debug(f"Evicting store entry {key}")
+            self.remove(key)
+            total -= size
+
+    def _entries(self) -> list[tuple[str, int, float]]:
+        """Return (key, bytes, last used) for each committed entry"""
+        result: list[tuple[str, int, float]] = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return result
+        for name in names:
+            if name.startswith(PENDING_PREFIX):
+                continue
+            entry_file = os.path.join(self.directory, name, ENTRY_FILE)
+            try:
+                with open(entry_file) as f:
+                    size = int(json.load(f)["bytes"])
+                result.append((name, size, os.path.getmtime(entry_file)))
+            except (OSError, ValueError, KeyError):
+                continue
+        return result
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+
+class PendingEntry:
+    """
+    An entry being written. Values are written to disk as they are added,
+    so later changes to a mesh do not affect what was stored.
+    The entry only becomes visible when committed.
+    """
+
+    def __init__(self, store: MeshStore):
+        self._store = store
+        self._dir = os.path.join(store.directory, PENDING_PREFIX + uuid.uuid4().hex)
+        self._nodes: list[dict[str, Any]] = []
+        self._array_count = 0
+        self._bytes = 0
+        self.closed = False
+
+    def add(self, value: StoredValue):
+        os.makedirs(self._dir, exist_ok=True)
+        self._nodes.append(self._encode(value))
+
+    def commit(self, key: str):
+        os.makedirs(self._dir, exist_ok=True)
+        with open(os.path.join(self._dir, ENTRY_FILE), "w") as f:
+            json.dump({"values": self._nodes, "bytes": self._bytes}, f)
+        entry_dir = self._store._entry_dir(key)  # pyright: ignore[reportPrivateUsage] - PendingEntry is part of MeshStore
+        self._store.remove(key)
+        try:
+            os.replace(self._dir, entry_dir)
+        except OSError as e:
+            logger.warning(f"Could not store entry {key}: {e}")
+            self.abort()
+            return
+        self.closed = True
+        self._store.evict()
+
+    def abort(self):
+        shutil.rmtree(self._dir, ignore_errors=True)
+        self.closed = True
+
+    def _encode(self, value: StoredValue) -> dict[str, Any]:
+        if isinstance(value, Trimesh):
+            return {
+                "type": "trimesh",
+                "vertices": self._write_array(value.vertices),
+                "faces": self._write_array(value.faces),
+                "vertex_colors": (
+                    self._write_array(
+                        np.asarray(
+                            value.visual.vertex_colors,  # pyright: ignore[reportAttributeAccessIssue] - only ColorVisuals has vertex colors
+                            dtype=np.uint8,
+                        )
+                    )
+                    if value.visual is not None and value.visual.kind == "vertex"
+                    else None
+                ),
+                "metadata": {
+                    k: v
+                    for k, v in value.metadata.items()  # pyright: ignore[reportUnknownVariableType] - trimesh metadata is untyped
+                    if k in STORED_METADATA_KEYS
+                },
+            }
+        if isinstance(value, Manifold):
+            mesh = value.to_mesh()
+            return {
+                "type": "manifold",
+                "vert_properties": self._write_array(
+                    np.asarray(mesh.vert_properties, dtype=np.float32)
+                ),
+                "tri_verts": self._write_array(
+                    np.asarray(mesh.tri_verts, dtype=np.uint32)
+                ),
+            }
+        if isinstance(value, np.ndarray):
+            return {"type": "array", "array": self._write_array(value)}  # pyright: ignore[reportUnknownArgumentType] - any array can be stored
+        if isinstance(value, (list, tuple)):
+            return {
+                "type": "list" if isinstance(value, list) else "tuple",
+                "items": [self._encode(v) for v in value],  # pyright: ignore[reportUnknownVariableType] - items are untyped
+            }
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return {"type": "json", "value": value}
+        raise TypeError(f"Cannot store a value of type {type(value)}")
+
+    def _write_array(self, arr: NDArray[Any]) -> str:
+        name = f"{self._array_count}.npy"
+        self._array_count += 1
+        data = np.ascontiguousarray(arr)
+        np.save(os.path.join(self._dir, name), data)
+        self._bytes += data.nbytes
+        return name
+
+
+def _decode(node: dict[str, Any], entry_dir: str) -> StoredValue:
+    if node["type"] == "trimesh":
+        colors = node["vertex_colors"]
+        return Trimesh(
+            vertices=_read_array(entry_dir, node["vertices"]),
+            faces=_read_array(entry_dir, node["faces"]),
+            vertex_colors=None if colors is None else _read_array(entry_dir, colors),
+            metadata=node["metadata"],
+            process=False,
+        )
+    if node["type"] == "manifold":
+        # Manifold copies the mesh, and only accepts writable arrays
+        return Manifold(
+            Mesh(
+                vert_properties=np.array(
+                    _read_array(entry_dir, node["vert_properties"]), dtype=np.float32
+                ),
+                tri_verts=np.array(
+                    _read_array(entry_dir, node["tri_verts"]), dtype=np.uint32
+                ),
+            )
+        )
+    if node["type"] == "array":
+        return _read_array(entry_dir, node["array"])
+    if node["type"] == "list":
+        return [_decode(item, entry_dir) for item in node["items"]]
+    if node["type"] == "tuple":
+        return tuple(_decode(item, entry_dir) for item in node["items"])
+    if node["type"] == "json":
+        return node["value"]
+    raise ValueError(f"Unknown stored value type {node['type']!r}")
+
+
+def _read_array(entry_dir: str, name: str) -> NDArray[Any]:
+    return np.load(os.path.join(entry_dir, name), mmap_mode="r")
@@ -0,0 +1,454 @@
+from __future__ import annotations
+
+import logging
+import os
+import weakref
+import zlib
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Iterator
+
+import numpy as np
+from numpy.typing import NDArray
+from trimesh import Trimesh
+
+logger = logging.getLogger(__name__)
+
+# Below this many faces pickling the whole Trimesh is cheap enough.
+SHARED_MEMORY_MIN_FACES = 100_000
+# Windows destroys a segment as soon as the last handle closes,
+# so the worker cannot hand one over to the UI process.
+SHARED_MEMORY_SUPPORTED = os.name != "nt"
+ARRAY_ALIGNMENT = 64
+# Vertex indices of meshes with at most this many vertices fit in 16 bits
+UINT16_MAX_VERTICES = 2**16
+# Mesh arrays compress poorly and a local pipe is fast, so speed over size
+COMPRESSION_LEVEL = 1
+# The only metadata the viewer reads
+WIRE_METADATA_KEYS = ["scadview"]
+# Meshes with at least this many faces are sent in chunks before the whole mesh
+STREAM_MIN_FACES = 2_000_000
+STREAM_CHUNK_FACES = 500_000
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    offset: int
+    shape: tuple[int, ...]
+    dtype: str
+
+    @property
+    def nbytes(self) -> int:
+        return int(np.prod(self.shape)) * np.dtype(self.dtype).itemsize
+
+
+@dataclass
+class SharedMesh:
+    """
+    Descriptor for a mesh whose arrays live in a shared memory segment.
+    Only this descriptor is pickled through the load queue.
+    """
+
+    segment_name: str
+    vertices: SharedArray
+    faces: SharedArray
+    vertex_colors: SharedArray | None
+    metadata: dict[str, Any]
+
+
+@dataclass
+class SharedArrays:
+    """Arrays in a shared memory segment, copied out once by whoever takes them"""
+
+    segment_name: str
+    arrays: list[SharedArray]
+
+
+@dataclass
+class CompressedArray:
+    data: bytes
+    shape: tuple[int, ...]
+    dtype: str
+
+    @classmethod
+    def compress(cls, arr: NDArray[Any]) -> CompressedArray:
+        return cls(
+            zlib.compress(np.ascontiguousarray(arr).data, COMPRESSION_LEVEL),
+            tuple(arr.shape),
+            arr.dtype.str,
+        )
+
+    def decompress(self) -> NDArray[Any]:
+        # Arrays over bytes are read-only, and trimesh may write to them
+        data = bytearray(zlib.decompress(self.data))
+        return np.frombuffer(data, dtype=self.dtype).reshape(self.shape)
+
+
+WireArray = NDArray[Any] | CompressedArray
+
+
+@dataclass
+class WireMesh:
+    """
+    A mesh in a compact form for pickling through the load queue.
+
+    A pickled Trimesh carries its cache, float64 vertices and int64 faces.
+    This carries only the arrays the viewer needs, in the smallest dtypes
+    that hold them exactly, and only the scadview metadata.
+    """
+
+    vertices: WireArray
+    faces: WireArray
+    vertex_colors: WireArray | None
+    metadata: dict[str, Any]
+
+
+PackedMeshType = SharedMesh | WireMesh | list[Trimesh | SharedMesh | WireMesh]
+
+
+def _compact_vertices(vertices: NDArray[np.float64]) -> NDArray[Any]:
+    # Meshes from Manifold are float32 already, so usually nothing is lost
+    narrow = vertices.astype(np.float32)
+    if np.array_equal(narrow, vertices):
+        return narrow
+    return np.ascontiguousarray(vertices)
+
+
+def _compact_faces(faces: NDArray[np.int64], vertex_count: int) -> NDArray[Any]:
+    if vertex_count <= UINT16_MAX_VERTICES:
+        return faces.astype(np.uint16)
+    return faces.astype(np.uint32)
+
+
+def _wire_metadata(mesh: Trimesh) -> dict[str, Any]:
+    return {
+        key: mesh.metadata[key] for key in WIRE_METADATA_KEYS if key in mesh.metadata
+    }
+
+
+def encode_wire_mesh(mesh: Trimesh, compress_min_bytes: int | None = None) -> WireMesh:
+    """
+    Encode the mesh for the load queue,
+    compressing arrays of at least compress_min_bytes; None never compresses.
+    """
+
+    def wire(arr: NDArray[Any]) -> WireArray:
+        if compress_min_bytes is not None and arr.nbytes >= compress_min_bytes:
+            return CompressedArray.compress(arr)
+        return arr
+
+    colors = _vertex_colors(mesh)
+    return WireMesh(
+        wire(_compact_vertices(np.asarray(mesh.vertices))),
+        wire(_compact_faces(np.asarray(mesh.faces), len(mesh.vertices))),
+        None if colors is None else wire(colors),
+        _wire_metadata(mesh),
+    )
+
+
+def decode_wire_mesh(wire: WireMesh) -> Trimesh:
+    def array(arr: WireArray) -> NDArray[Any]:
+        return arr.decompress() if isinstance(arr, CompressedArray) else arr
+
+    return Trimesh(
+        vertices=array(wire.vertices),
+        faces=array(wire.faces),
+        vertex_colors=(
+            None if wire.vertex_colors is None else array(wire.vertex_colors)
+        ),
+        metadata=wire.metadata,
+        process=False,
+    )
+
+
+@dataclass
+class MeshChunk:
+    """
+    A range of the faces of a mesh sent in chunks, as the corners of each face,
+    so the viewer can draw the faces that have arrived.
+    """
+
+    first_face: int
+    # Of the whole mesh
+    face_count: int
+    # face x corner x xyz
+    triangles: NDArray[np.float32]
+    # Set on the first chunk, so the mesh can be framed before it all arrives
+    bounds: NDArray[np.float64] | None = None
+    metadata: dict[str, Any] | None = None
+
+    @property
+    def last(self) -> bool:
+        return self.first_face + len(self.triangles) >= self.face_count
+
+
+def is_opaque(mesh: Trimesh) -> bool:
+    metadata: Any = _wire_metadata(mesh).get("scadview")
+    if not isinstance(metadata, dict):
+        return True
+    color = metadata.get("color")  # pyright: ignore[reportUnknownVariableType] - trimesh metadata is untyped
+    return not isinstance(color, list) or len(color) != 4 or bool(color[3] >= 1.0)  # pyright: ignore[reportUnknownArgumentType] - trimesh metadata is untyped
+
+
+def mesh_chunks(mesh: Trimesh, chunk_faces: int) -> Iterator[MeshChunk]:
+    """The faces of the mesh in chunks of chunk_faces, in order"""
+    vertices = np.asarray(mesh.vertices, dtype=np.float32)
+    faces = np.asarray(mesh.faces)
+    for first in range(0, len(faces), chunk_faces):
+        yield MeshChunk(
+            first,
+            len(faces),
+            vertices[faces[first : first + chunk_faces]],
+            np.array(mesh.bounds) if first == 0 else None,
+            _wire_metadata(mesh) if first == 0 else None,
+        )
+
+
+def _layout(arrays: list[NDArray[Any]]) -> tuple[list[SharedArray], int]:
+    specs: list[SharedArray] = []
+    offset = 0
+    for arr in arrays:
+        offset = -(-offset // ARRAY_ALIGNMENT) * ARRAY_ALIGNMENT
+        specs.append(SharedArray(offset, tuple(arr.shape), arr.dtype.str))
+        offset += arr.nbytes
+    return specs, offset
+
+
+def _view(shm: shared_memory.SharedMemory, spec: SharedArray) -> NDArray[Any]:
+    if shm.buf is None:
+        raise ValueError(f"Shared memory {shm.name} is closed")
+    return np.ndarray(spec.shape, dtype=spec.dtype, buffer=shm.buf, offset=spec.offset)
+
+
+def _copy_into(shm: shared_memory.SharedMemory, spec: SharedArray, arr: NDArray[Any]):
+    target = _view(shm, spec)
+    target[...] = arr
+
+
+def share_arrays(arrays: list[NDArray[Any]]) -> SharedArrays:
+    """Copy the arrays into a new segment, owned by whoever takes them."""
+    arrays = [np.ascontiguousarray(arr) for arr in arrays]
+    specs, size = _layout(arrays)
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    try:
+        for arr, spec in zip(arrays, specs):
+            _copy_into(shm, spec, arr)
+    finally:
+        shm.close()
+    return SharedArrays(shm.name, specs)
+
+
+def take_shared_arrays(shared: SharedArrays) -> list[NDArray[Any]]:
+    """Copy the arrays out of their segment, which is then removed."""
+    shm = shared_memory.SharedMemory(name=shared.segment_name)
+    try:
+        return [np.array(_view(shm, spec)) for spec in shared.arrays]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def unlink_shared_arrays(shared: SharedArrays):
+    """Remove the segment of arrays that will never be taken."""
+    try:
+        shm = shared_memory.SharedMemory(name=shared.segment_name)
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+def _vertex_colors(mesh: Trimesh) -> NDArray[np.uint8] | None:
+    if mesh.visual is None or mesh.visual.kind != "vertex":
+        return None
+    return np.ascontiguousarray(
+        mesh.visual.vertex_colors,  # pyright: ignore[reportAttributeAccessIssue] - only ColorVisuals has vertex colors
+        dtype=np.uint8,
+    )
+
+
+class SharedMeshWriter:
+    """
+    Packs meshes into shared memory segments in the loader process.
+
+    Ownership of a segment passes to the UI process once its descriptor is
+    delivered. Segments of results that were dropped before delivery
+    come back through `recycle` and are reused for later frames of the load.
+
+    With `compact`, meshes too small to share are packed as WireMesh
+    rather than pickled whole.
+    """
+
+    def __init__(
+        self,
+        min_faces: int | None,
+        compact: bool = False,
+        compress_min_bytes: int | None = None,
+    ):
+        self._min_faces = min_faces if SHARED_MEMORY_SUPPORTED else None
+        self._compact = compact
+        self._compress_min_bytes = compress_min_bytes
+        self._spares: list[shared_memory.SharedMemory] = []
+
+    def pack(self, mesh: Trimesh | list[Trimesh]) -> PackedMeshType | None:
+        if isinstance(mesh, list):
+            if not self._compact and not any(self._should_share(m) for m in mesh):
+                return None
+            return [self._pack_any(m) for m in mesh]
+        packed = self._pack_any(mesh)
+        return None if isinstance(packed, Trimesh) else packed
+
+    def _pack_any(self, mesh: Trimesh) -> Trimesh | SharedMesh | WireMesh:
+        if self._should_share(mesh):
+            return self._pack_one(mesh)
+        if self._compact:
+            return encode_wire_mesh(mesh, self._compress_min_bytes)
+        return mesh
+
+    def pack_vertices(
+        self, vertices: NDArray[np.float64], face_count: int
+    ) -> NDArray[Any] | SharedArrays:
+        """
+        Vertices replacing those of a mesh with face_count faces,
+        in shared memory where the whole mesh would be, taken by the viewer.
+        """
+        if self._min_faces is not None and face_count >= self._min_faces:
+            return share_arrays([_compact_vertices(vertices)])
+        if self._compact:
+            return _compact_vertices(vertices)
+        return vertices
+
+    def _should_share(self, mesh: Trimesh) -> bool:
+        return self._min_faces is not None and len(mesh.faces) >= self._min_faces
+
+    def _pack_one(self, mesh: Trimesh) -> SharedMesh:
+        arrays = [np.ascontiguousarray(mesh.vertices), np.ascontiguousarray(mesh.faces)]
+        colors = _vertex_colors(mesh)
+        if colors is not None:
+            arrays.append(colors)
+        specs, size = _layout(arrays)
+        shm = self._segment(size)
+        try:
+            for arr, spec in zip(arrays, specs):
+                _copy_into(shm, spec, arr)
+        finally:
+            shm.close()
+        return SharedMesh(
+            shm.name,
+            specs[0],
+            specs[1],
+            specs[2] if colors is not None else None,
+            dict(mesh.metadata),  # pyright: ignore[reportUnknownArgumentType] - trimesh metadata is untyped
+        )
+
+    def _segment(self, size: int) -> shared_memory.SharedMemory:
+        fits = [s for s in self._spares if s.size >= size]
+        if fits:
+            shm = min(fits, key=lambda s: s.size)
+            self._spares.remove(shm)
+            logger.debug(f"Reusing shared memory segment {shm.name}")
+            return shm
+        return shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+    def recycle(self, packed: PackedMeshType | None):
+        """Take back the segments of a result that was never delivered."""
+        for shared in _shared_meshes(packed):
+            try:
+                self._spares.append(
+                    shared_memory.SharedMemory(name=shared.segment_name)
+                )
+            except FileNotFoundError:
+                logger.debug(f"Shared memory {shared.segment_name} already gone")
+
+    def close(self):
+        for shm in self._spares:
+            shm.close()
+            shm.unlink()
+        self._spares = []
+
+
+class SharedMeshReader:
+    """
+    Maps shared meshes into the UI process as zero-copy Trimesh objects.
+
+    Segment names are unlinked as soon as they are mapped.
+    NumPy does not stop a mapping from being closed under its arrays,
+    so a segment is only closed once a newer mesh has replaced it
+    and every array viewing it has been garbage collected.
+    """
+
+    def __init__(self):
+        self._current: list[_MappedSegment] = []
+        self._retired: list[_MappedSegment] = []
+
+    def unpack(self, packed: PackedMeshType) -> Trimesh | list[Trimesh]:
+        self.release()
+        if isinstance(packed, list):
+            return [self._unpack_one(m) for m in packed]
+        return self._unpack_one(packed)
+
+    def _unpack_one(self, packed: Trimesh | SharedMesh | WireMesh) -> Trimesh:
+        if isinstance(packed, Trimesh):
+            return packed
+        if isinstance(packed, WireMesh):
+            return decode_wire_mesh(packed)
+        return self._attach(packed)
+
+    def _attach(self, shared: SharedMesh) -> Trimesh:
+        shm = shared_memory.SharedMemory(name=shared.segment_name)
+        shm.unlink()
+        segment = _MappedSegment(shm)
+        self._current.append(segment)
+        return Trimesh(
+            vertices=segment.view(shared.vertices),
+            faces=segment.view(shared.faces),
+            vertex_colors=(
+                None
+                if shared.vertex_colors is None
+                else segment.view(shared.vertex_colors)
+            ),
+            metadata=shared.metadata,
+            process=False,
+        )
+
+    def release(self):
+        """Retire the segments of the current mesh and close any no longer viewed."""
+        self._retired.extend(self._current)
+        self._current = []
+        self._retired = [s for s in self._retired if not s.close_if_unused()]
+
+
+class _MappedSegment:
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self._shm = shm
+        self._views: list[weakref.ref[NDArray[Any]]] = []
+
+    def view(self, spec: SharedArray) -> NDArray[Any]:
+        arr = _view(self._shm, spec)
+        self._views.append(weakref.ref(arr))
+        return arr
+
+    def close_if_unused(self) -> bool:
+        if any(ref() is not None for ref in self._views):
+            return False
+        self._shm.close()
+        return True
+
+
+def unlink_packed_mesh(packed: PackedMeshType | None):
+    """Remove segments of a result that will never be read."""
+    for shared in _shared_meshes(packed):
+        try:
+            shm = shared_memory.SharedMemory(name=shared.segment_name)
+        except FileNotFoundError:
+            continue
+        shm.close()
+        shm.unlink()
+
+
+def _shared_meshes(packed: PackedMeshType | None) -> list[SharedMesh]:
+    if packed is None:
+        return []
+    if isinstance(packed, list):
+        return [m for m in packed if isinstance(m, SharedMesh)]
+    return [packed] if isinstance(packed, SharedMesh) else []
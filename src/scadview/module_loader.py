@@ -1,12 +1,19 @@
+import ast
+import hashlib
 import importlib
 import logging
 import os
 import sys
-from types import GeneratorType
-from typing import Any, Generator
+from dataclasses import dataclass
+from time import time
+from types import GeneratorType, ModuleType
+from typing import Any, Callable, Generator, Iterable
 
 logger = logging.getLogger(__name__)
 
+# Installed packages can live under a project root in a virtual environment
+INSTALLED_PACKAGE_DIRS = ["site-packages", "dist-packages"]
+
 
 def yield_if_return(result: Any) -> Generator[Any, None, None]:
     """
@@ -21,13 +28,187 @@ def yield_if_return(result: Any) -> Generator[Any, None, None]:
         yield result
 
 
+def user_modules(roots: list[str]) -> dict[str, str]:
+    """
+    Map the names of imported modules whose source is under one of `roots`
+    to their files, skipping installed packages.
+    """
+    abs_roots = [os.path.abspath(root) + os.sep for root in roots]
+    result: dict[str, str] = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, "__file__", None)
+        if not isinstance(path, str) or not path.endswith(".py"):
+            continue
+        path = os.path.abspath(path)
+        if not any(path.startswith(root) for root in abs_roots):
+            continue
+        if any(d in path.split(os.sep) for d in INSTALLED_PACKAGE_DIRS):
+            continue
+        result[name] = path
+    return result
+
+
+@dataclass(frozen=True)
+class FileState:
+    mtime_ns: int
+    size: int
+    digest: str
+
+    @classmethod
+    def read(cls, path: str, previous: "FileState | None" = None) -> "FileState | None":
+        """Return the state of the file, or None if it is gone."""
+        try:
+            stat = os.stat(path)
+            if (
+                previous is not None
+                and previous.mtime_ns == stat.st_mtime_ns
+                and previous.size == stat.st_size
+            ):
+                return previous
+            with open(path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+        return cls(stat.st_mtime_ns, stat.st_size, digest)
+
+
+def imported_names(path: str, package: str | None) -> set[str]:
+    """Names of the modules a source file imports, and of their parent packages."""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), path)
+    names: set[str] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                names.add(alias.name)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parts = (package or "").split(".")
+                parent = ".".join(parts[: len(parts) - node.level + 1])
+                base = f"{parent}.{base}" if base else parent
+            names.add(base)
+            # "from package import name" may import a submodule
+            names.update(f"{base}.{alias.name}" for alias in node.names)
+    with_parents = set(names)
+    for name in names:
+        parts = name.split(".")
+        with_parents.update(".".join(parts[:i]) for i in range(1, len(parts)))
+    return with_parents
+
+
+class UserModuleTracker:
+    """
+    Tracks the state of the user's own modules between loads,
+    so a load reloads only the modules that changed and those that import them.
+    Other modules stay as they are, however slow they were to import.
+    """
+
+    def __init__(self):
+        self._states: dict[str, FileState] = {}
+        self._imports: dict[tuple[str, str | None], set[str]] = {}
+
+    def stale_modules(self, roots: list[str], exclude: str) -> list[str]:
+        """
+        Return the user modules to reload in dependency order.
+        Modules whose files were deleted are dropped, so importing them fails.
+        """
+        modules = user_modules(roots)
+        modules.pop(exclude, None)
+        changed: set[str] = set()
+        digests: dict[str, str] = {}
+        for name, path in modules.items():
+            previous = self._states.get(name)
+            state = FileState.read(path, previous)
+            if state is None:
+                logger.info(f"Module {name} was deleted")
+                del sys.modules[name]
+                self._states.pop(name, None)
+                changed.add(name)
+                continue
+            digests[name] = state.digest
+            if previous is not None and state.digest != previous.digest:
+                changed.add(name)
+            else:
+                # Modules first seen here were imported as they are now
+                self._states[name] = state
+        dependencies = {
+            name: self._dependencies(name, path, digests[name], modules.keys())
+            for name, path in modules.items()
+            if name in digests
+        }
+        stale = set(changed)
+        while True:
+            dependents = {
+                name for name, deps in dependencies.items() if deps & stale
+            } - stale
+            if not dependents:
+                break
+            stale |= dependents
+        return _dependency_order(stale & dependencies.keys(), dependencies)
+
+    def record(self, roots: list[str]):
+        """Record the state of every user module, once they have been (re)loaded."""
+        for name, path in user_modules(roots).items():
+            state = FileState.read(path, self._states.get(name))
+            if state is not None:
+                self._states[name] = state
+
+    def _dependencies(
+        self, name: str, path: str, digest: str, names: Iterable[str]
+    ) -> set[str]:
+        package = getattr(sys.modules[name], "__package__", None)
+        key = (digest, package)
+        if key not in self._imports:
+            try:
+                self._imports[key] = imported_names(path, package)
+            except (OSError, SyntaxError, ValueError):
+                self._imports[key] = set()
+        return (self._imports[key] & set(names)) - {name}
+
+
+def _dependency_order(names: set[str], dependencies: dict[str, set[str]]) -> list[str]:
+    order: list[str] = []
+    remaining = set(names)
+    while remaining:
+        ready = sorted(n for n in remaining if not (dependencies[n] & remaining))
+        if not ready:
+            # An import cycle; any order is as good as another
+            ready = sorted(remaining)
+        order.extend(ready)
+        remaining -= set(ready)
+    return order
+
+
 class ModuleLoader:
     last_loaded_module_path: str = ""
+    # Shared by every loader in the process, as loaded modules are
+    user_module_tracker = UserModuleTracker()
 
-    def __init__(self, function_name: str):
+    def __init__(self, function_name: str, project_root: str | None = None):
+        """
+        Args:
+            function_name: The function to run in the loaded module.
+            project_root: Modules under this directory, as well as those beside
+                the loaded module, are reloaded when they change.
+        """
         self._function_name = function_name
+        self._project_root = project_root
 
-    def run_function(self, file_path: str) -> Generator[Any, None, None]:
+    def run_function(
+        self, file_path: str, kwargs: dict[str, Any] | None = None
+    ) -> Generator[Any, None, None]:
+        func = self.load_function(file_path)
+        try:
+            yield from yield_if_return(func(**(kwargs or {})))
+        except Exception as e:
+            logger.exception(
+                f"Error while running {self._function_name} in {file_path}: {e}"
+            )
+            raise e
+
+    def load_function(self, file_path: str) -> Callable[..., Any]:
+        """Import or reload the module and return the function, without running it."""
         # Reload or import the module
         module_name = os.path.splitext(os.path.basename(file_path))[0]
         module_path = os.path.dirname(file_path)
@@ -39,27 +220,52 @@ class ModuleLoader:
         if self.last_loaded_module_path and self.last_loaded_module_path in sys.path:
             sys.path.remove(self.last_loaded_module_path)
 
-        self.last_loaded_module_path = module_path
+        # Loaders are created per load, so this must outlive the instance
+        ModuleLoader.last_loaded_module_path = module_path
         if module_path in sys.path:
             sys.path.remove(module_path)
         sys.path.insert(0, module_path)
 
-        module = sys.modules.get(module_name)
-        if module:
-            importlib.reload(module)
-        else:
-            module = importlib.import_module(module_name)
+        roots = [module_path or os.curdir]
+        if self._project_root:
+            roots.append(self._project_root)
+        tracker = self.user_module_tracker
+        # Finders cache directory listings, which may miss new or deleted files
+        importlib.invalidate_caches()
+        try:
+            for name in tracker.stale_modules(roots, exclude=module_name):
+                self._load_module(name, reload=True)
+
+            module = sys.modules.get(module_name)
+            if module and not _same_file(getattr(module, "__file__", None), file_path):
+                # A module with the same name from another directory
+                del sys.modules[module_name]
+                module = None
+            module = self._load_module(module_name, reload=module is not None)
+        finally:
+            # Whatever was imported, even by a failed load, is now current
+            tracker.record(roots)
 
         # Get the function from the module
         if not hasattr(module, self._function_name):
             raise AttributeError(
                 f"Function '{self._function_name}' not found in '{file_path}'"
             )
-        func = getattr(module, self._function_name)
-        try:
-            yield from yield_if_return(func())
-        except Exception as e:
-            logger.exception(
-                f"Error while running {self._function_name} in {file_path}: {e}"
-            )
-            raise e
+        return getattr(module, self._function_name)
+
+    def _load_module(self, module_name: str, reload: bool) -> ModuleType:
+        t0 = time()
+        if reload:
+            module = importlib.reload(sys.modules[module_name])
+        else:
+            module = importlib.import_module(module_name)
+        logger.info(
+            f"{'Reloading' if reload else 'Importing'} {module_name} took {(time() - t0) * 1000:.1f}ms"
+        )
+        return module
+
+
+def _same_file(path: str | None, other: str | os.PathLike[str]) -> bool:
+    if path is None:
+        return False
+    return os.path.abspath(path) == os.path.abspath(other)
@@ -24,8 +24,9 @@ class Observable:
 
     def unsubscribe(self, callback: Callable[..., Any]):
         """Remove a previously registered callback."""
-        # compare original to dereferenced weakrefs
-        self._subscribers[:] = [r for r in self._subscribers if r() is not callback]
+        # compare original to dereferenced weakrefs; by equality, as each access
+        # to a bound method makes a new one
+        self._subscribers[:] = [r for r in self._subscribers if r() != callback]
 
     def notify(self, *args: Any, **kwargs: Any):
         """Call every subscriber, pass along any arguments."""
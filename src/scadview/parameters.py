@@ -0,0 +1,114 @@
+"""
+The keyword parameters of create_mesh, edited from the viewer.
+
+Parameters are read from the source, so the module need not be imported,
+and only those whose defaults are literal numbers, booleans or strings are shown.
+"""
+
+from __future__ import annotations
+
+import ast
+import math
+from dataclasses import dataclass
+
+ParamValue = int | float | bool | str
+
+# Neighbouring values evaluated ahead of the user on each side of an edited value
+PREFETCH_STEPS = 2
+# Floats are stepped by about this fraction of their default
+FLOAT_STEP_FRACTION = 0.1
+DEFAULT_FLOAT_STEP = 0.1
+
+
+@dataclass(frozen=True)
+class Parameter:
+    name: str
+    default: ParamValue
+
+    @property
+    def step(self) -> int | float:
+        """How far one step of the control moves a number"""
+        if not isinstance(self.default, float):
+            return 1
+        if self.default == 0.0:
+            return DEFAULT_FLOAT_STEP
+        # A power of ten, so stepping keeps round values round
+        return 10 ** math.floor(math.log10(abs(self.default) * FLOAT_STEP_FRACTION))
+
+
+def create_mesh_parameters(
+    module_path: str, function_name: str = "create_mesh"
+) -> list[Parameter]:
+    """
+    The parameters of the function with literal defaults, in order.
+    Empty if the module cannot be read or parsed, as loading it will report why.
+    """
+    try:
+        with open(module_path, "rb") as f:
+            tree = ast.parse(f.read(), module_path)
+    except (OSError, SyntaxError, ValueError):
+        return []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == function_name:
+            return _parameters(node.args)
+    return []
+
+
+def _parameters(args: ast.arguments) -> list[Parameter]:
+    positional = [*args.posonlyargs, *args.args]
+    # Defaults belong to the last positional parameters
+    with_defaults = list(
+        zip(positional[len(positional) - len(args.defaults) :], args.defaults)
+    )
+    with_defaults += [
+        (arg, default)
+        for arg, default in zip(args.kwonlyargs, args.kw_defaults)
+        if default is not None
+    ]
+    parameters: list[Parameter] = []
+    for arg, default in with_defaults:
+        try:
+            value = ast.literal_eval(default)
+        except ValueError:
+            continue
+        if isinstance(value, ParamValue):
+            parameters.append(Parameter(arg.arg, value))
+    return parameters
+
+
+def with_value(
+    params: dict[str, ParamValue], parameter: Parameter, value: ParamValue
+) -> dict[str, ParamValue]:
+    """
+    The parameters with the one set to the value.
+    Defaults are left out, so the same values always give the same parameters.
+    """
+    changed = {name: v for name, v in params.items() if name != parameter.name}
+    if value != parameter.default:
+        changed[parameter.name] = value
+    return changed
+
+
+def neighbour_values(
+    parameter: Parameter,
+    value: ParamValue,
+    previous: ParamValue | None = None,
+    steps: int = PREFETCH_STEPS,
+) -> list[ParamValue]:
+    """
+    The values the user is likely to step to next, most likely first:
+    those continuing the way they last stepped come before the others.
+    """
+    if isinstance(value, bool):
+        return [not value]
+    if isinstance(value, str):
+        return []
+    step = parameter.step
+    direction = -1 if isinstance(previous, int | float) and previous > value else 1
+    values: list[ParamValue] = []
+    for i in range(1, steps + 1):
+        for sign in (direction, -direction):
+            moved = value + sign * i * step
+            # Rounded, so 0.1 + 0.2 gives 0.3 rather than 0.30000000000000004
+            values.append(moved if isinstance(moved, int) else round(moved, 12))
+    return values
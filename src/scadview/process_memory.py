@@ -0,0 +1,53 @@
+"""How much memory a process uses, where the platform tells."""
+
+from __future__ import annotations
+
+import sys
+
+# Writing this resets the peak resident set size of the process on Linux
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+RESET_PEAK_RSS = "5"
+
+
+def _proc_status_bytes(field: str, pid: int | str = "self") -> int | None:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    # In kB
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def rss_bytes(pid: int | str = "self") -> int | None:
+    """The resident set size of the process, or None if it cannot be read."""
+    return _proc_status_bytes("VmRSS", pid)
+
+
+def reset_peak_rss() -> bool:
+    """Start measuring the peak from now; False if the platform cannot."""
+    try:
+        with open(PROC_CLEAR_REFS, "w") as f:
+            f.write(RESET_PEAK_RSS)
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> int | None:
+    """
+    The peak resident set size of this process since it started,
+    or since reset_peak_rss, or None if it cannot be read.
+    """
+    peak = _proc_status_bytes("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes, except on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
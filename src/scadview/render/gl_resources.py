@@ -0,0 +1,120 @@
+"""
+The GL objects of a renderee, released together once it is no longer drawn,
+and a pool of the buffers released, so a mesh of the same size,
+like the next frame of an animation, reuses them rather than allocating more.
+"""
+
+import logging
+
+import moderngl
+
+logger = logging.getLogger(__name__)
+
+# Bytes of released buffers kept for reuse; the oldest beyond this are released
+POOL_MAX_BYTES = 256 * 1024 * 1024
+
+
+class BufferPool:
+    """
+    Released buffers, kept by size until a buffer of that size is needed.
+    A buffer reused has its storage orphaned before it is written,
+    so the driver need not wait for draws still reading it.
+    """
+
+    def __init__(self, ctx: moderngl.Context, max_bytes: int = POOL_MAX_BYTES):
+        self._ctx = ctx
+        self._max_bytes = max_bytes
+        # (size, buffer), oldest first
+        self._free: list[tuple[int, moderngl.Buffer]] = []
+        self._held_bytes = 0
+
+    @property
+    def held_bytes(self) -> int:
+        return self._held_bytes
+
+    def buffer(self, data: bytes | None = None, reserve: int = 0) -> moderngl.Buffer:
+        """A buffer of the data, or of reserve bytes, reused if one that size is free"""
+        size = len(data) if data is not None else reserve
+        for i in range(len(self._free) - 1, -1, -1):
+            if self._free[i][0] == size:
+                _, buffer = self._free.pop(i)
+                self._held_bytes -= size
+                buffer.orphan()
+                if data is not None:
+                    buffer.write(data)
+                return buffer
+        if data is not None:
+            return self._ctx.buffer(data=data)
+        return self._ctx.buffer(reserve=reserve)
+
+    def give_back(self, buffer: moderngl.Buffer, size: int):
+        """Keep the buffer of the size for reuse; nothing may draw from it after"""
+        if size > self._max_bytes:
+            buffer.release()
+            return
+        self._free.append((size, buffer))
+        self._held_bytes += size
+        while self._held_bytes > self._max_bytes:
+            oldest_size, oldest = self._free.pop(0)
+            oldest.release()
+            self._held_bytes -= oldest_size
+
+    def release(self):
+        for _, buffer in self._free:
+            buffer.release()
+        self._free = []
+        self._held_bytes = 0
+
+
+class GLResources:
+    """
+    Makes GL objects as the context does, keeping them so that
+    release frees them all at once. Buffers come from the pool and go back to it;
+    without a pool they are released.
+    """
+
+    def __init__(self, ctx: moderngl.Context, pool: BufferPool | None = None):
+        self.ctx = ctx
+        self._pool = pool if pool is not None else BufferPool(ctx, max_bytes=0)
+        self._buffers: list[tuple[moderngl.Buffer, int]] = []
+        self._others: list[moderngl.VertexArray | moderngl.Texture] = []
+
+    def buffer(self, data: bytes | None = None, reserve: int = 0) -> moderngl.Buffer:
+        buffer = self._pool.buffer(data, reserve)
+        self._buffers.append((buffer, len(data) if data is not None else reserve))
+        return buffer
+
+    def vertex_array(
+        self,
+        program: moderngl.Program,
+        content: list[tuple[moderngl.Buffer, str, str]],
+        index_buffer: moderngl.Buffer | None = None,
+        index_element_size: int = 4,
+        mode: int = moderngl.TRIANGLES,
+    ) -> moderngl.VertexArray:
+        if index_buffer is None:
+            vao = self.ctx.vertex_array(program, content, mode=mode)
+        else:
+            vao = self.ctx.vertex_array(
+                program,
+                content,
+                index_buffer=index_buffer,
+                index_element_size=index_element_size,
+                mode=mode,
+            )
+        self._others.append(vao)
+        return vao
+
+    def texture(self, size: tuple[int, int], components: int) -> moderngl.Texture:
+        texture = self.ctx.texture(size, components)
+        self._others.append(texture)
+        return texture
+
+    def release(self):
+        """Free every object made so far; none may be used after"""
+        for obj in self._others:
+            obj.release()
+        for buffer, size in self._buffers:
+            self._pool.give_back(buffer, size)
+        self._others = []
+        self._buffers = []
@@ -5,6 +5,9 @@ from numpy.typing import NDArray
 from trimesh import Trimesh
 
 from scadview.load_status import LoadStatus
+from scadview.mesh_delta import MeshDelta
+from scadview.mesh_loader_process import PRIMARY_MODEL_ID
+from scadview.mesh_transport import MeshChunk
 from scadview.observable import Observable
 from scadview.render.camera import CameraOrthogonal, CameraPerspective
 from scadview.render.renderer import RendererFactory
@@ -184,8 +187,38 @@ class GlWidgetAdapter:
     def indicate_load_status(self, status: LoadStatus):
         self._renderer.indicate_load_status(status)
 
-    def load_mesh(self, mesh: Trimesh | list[Trimesh], name: str):
-        self._renderer.load_mesh(mesh, name)
+    def load_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        name: str,
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        self._renderer.load_mesh(mesh, name, model_id)
+
+    def update_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        deltas: list[MeshDelta],
+        name: str,
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        self._renderer.update_mesh(mesh, deltas, name, model_id)
+
+    def add_mesh_chunk(
+        self, chunk: MeshChunk, name: str, model_id: int = PRIMARY_MODEL_ID
+    ):
+        self._renderer.add_mesh_chunk(chunk, name, model_id)
+
+    def finish_streamed_mesh(
+        self, mesh: Trimesh, name: str, model_id: int = PRIMARY_MODEL_ID
+    ):
+        self._renderer.finish_streamed_mesh(mesh, name, model_id)
+
+    def set_model_visible(self, model_id: int, visible: bool):
+        self._renderer.set_model_visible(model_id, visible)
+
+    def remove_model(self, model_id: int):
+        self._renderer.remove_model(model_id)
 
     def frame(
         self,
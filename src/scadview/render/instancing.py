@@ -0,0 +1,67 @@
+"""
+Finds the meshes of a list that are copies of one shape moved about,
+like the studs of a brick, so the shape is uploaded once
+and each copy drawn as an instance of it.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+from trimesh import Trimesh
+
+from scadview.mesh_delta import rigid_transform
+
+# Distances from the center are compared to this fraction of the largest,
+# so copies that differ only by rounding in their transforms match
+SIGNATURE_RESOLUTION = 1e-6
+
+
+@dataclass
+class Instances:
+    """Meshes that are copies of the first of them, by their place in the list"""
+
+    meshes: list[int]
+    # 4 x 4 rigid transforms taking the first mesh to each, for column vectors
+    transforms: list[NDArray[np.float64]]
+
+
+def find_instances(meshes: list[Trimesh]) -> list[Instances]:
+    """
+    The meshes grouped with those they are rigidly moved copies of,
+    in the order of the first of each group.
+    A copy has the same faces as the mesh it copies, and its vertices in the same order.
+    """
+    found: list[Instances] = []
+    by_signature: dict[tuple[int, int, int], list[Instances]] = {}
+    for i, mesh in enumerate(meshes):
+        candidates = by_signature.setdefault(_signature(mesh), [])
+        for instances in candidates:
+            transform = rigid_transform(
+                np.asarray(meshes[instances.meshes[0]].vertices),
+                np.asarray(mesh.vertices),
+            )
+            if transform is not None:
+                instances.meshes.append(i)
+                instances.transforms.append(transform)
+                break
+        else:
+            instances = Instances([i], [np.eye(4)])
+            candidates.append(instances)
+            found.append(instances)
+    return found
+
+
+def _signature(mesh: Trimesh) -> tuple[int, int, int]:
+    # The same for a mesh in any pose: its faces, and how far each vertex
+    # is from its center, which no rotation or translation changes
+    vertices = np.asarray(mesh.vertices)
+    faces = np.asarray(mesh.faces)
+    if len(vertices) == 0:
+        return 0, hash(faces.tobytes()), 0
+    distances = np.linalg.norm(vertices - vertices.mean(axis=0), axis=1)
+    resolution = max(float(distances.max()), 1.0) * SIGNATURE_RESOLUTION
+    rounded = np.rint(distances / resolution).astype(np.int64)
+    return len(vertices), hash(faces.tobytes()), hash(rounded.tobytes())
@@ -21,6 +21,12 @@ class Renderee(ABC):
         """Render the object."""
         ...
 
+    def release(self) -> None:
+        """
+        Free the GL objects of one no longer drawn, and stop its updates.
+        Call it while the context is current.
+        """
+
 
 class GnomonRenderee(Renderee):
     WINDOW_DIM_FRAC = 0.2
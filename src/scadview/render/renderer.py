@@ -11,15 +11,25 @@ from trimesh.creation import (
 )
 
 from scadview.load_status import LoadStatus
+from scadview.mesh_delta import MeshDelta
+from scadview.mesh_loader_process import PRIMARY_MODEL_ID
+from scadview.mesh_transport import MeshChunk
 from scadview.observable import Observable
 from scadview.render.camera import Camera, copy_camera_state
+from scadview.render.gl_resources import BufferPool
 from scadview.render.label_atlas import LabelAtlas
 from scadview.render.label_renderee import LabelSetRenderee
-from scadview.render.renderee import GnomonRenderee
+from scadview.render.renderee import GnomonRenderee, Renderee
 from scadview.render.shader_program import ShaderProgram, ShaderVar
 from scadview.render.trimesh_renderee import (
+    StreamedMeshRenderee,
+    TrimeshAlphaRenderee,
+    TrimeshListAlphaRenderee,
+    TrimeshListRenderee,
     TrimeshOpaqueRenderee,
+    TrimeshRenderee,
     create_trimesh_renderee,
+    is_alpha,
 )
 from scadview.resources.xyz_cube import create_mesh
 
@@ -54,6 +64,12 @@ def _make_base_axes() -> Trimesh:
     )
 
 
+def _has_alpha(renderee: TrimeshRenderee) -> bool:
+    return isinstance(
+        renderee, (TrimeshAlphaRenderee, TrimeshListAlphaRenderee, TrimeshListRenderee)
+    )
+
+
 def _scale_axes(base_axes: Trimesh, scale: float) -> Trimesh:
     """
     Scale the axes by the given scale factor.
@@ -79,11 +95,23 @@ class Renderer:
         self._window_size = window_size
         # self._aspect_ratio = aspect_rati
         self._ctx = context
+        # Buffers of meshes no longer shown, reused by new meshes of the same size
+        self._buffer_pool = BufferPool(context)
+        # Renderees no longer drawn, released when next rendering,
+        # as the context is current then
+        self._to_release: list[Renderee] = []
         self._create_shaders()
         self.camera = camera
         self._init_shaders()
         self._scale = 1.0
         self._create_renderees()
+        # The renderee shown for each model, which for the primary model
+        # is a placeholder while it loads
+        self._renderees: dict[int, TrimeshRenderee] = {}
+        # The renderee of the last mesh of each model
+        self._mesh_renderees: dict[int, TrimeshRenderee] = {}
+        self._scales: dict[int, float] = {}
+        self._hidden_models: set[int] = set()
         self._clear_background = True
         self._last_background_color = self.ERROR_BACKGROUND_COLOR
         self.background_color = self.DEFAULT_BACKGROUND_COLOR
@@ -97,6 +125,9 @@ class Renderer:
     def _create_shaders(self):
         self.on_program_value_change = Observable()
         self._main_prog = self._create_main_shader_program(self.on_program_value_change)
+        self._indexed_prog = self._create_indexed_shader_program(
+            self.on_program_value_change
+        )
         self._num_prog = self._create_num_shader_program(self.on_program_value_change)
         self._axis_prog = self._create_axis_shader_program(self.on_program_value_change)
         self._gnomon_prog = self._create_gnomon_shader_program(
@@ -123,7 +154,12 @@ class Renderer:
     def _create_axes_renderee(self) -> TrimeshOpaqueRenderee:
         axes = _scale_axes(self._base_axes, self._scale * AXIS_SCALE_FACTOR)
         axes_renderee = TrimeshOpaqueRenderee(
-            self._ctx, self._axis_prog.program, axes, cull_back_face=True, name="axes"
+            self._ctx,
+            self._axis_prog.program,
+            axes,
+            cull_back_face=True,
+            name="axes",
+            pool=self._buffer_pool,
         )
         axes_renderee.subscribe_to_updates(self.on_program_value_change)
         return axes_renderee
@@ -136,6 +172,7 @@ class Renderer:
     def scale(self, value: float):
         if self.scale != value:
             self._scale = value
+            self._to_release.append(self._axes_renderee)
             self._axes_renderee = self._create_axes_renderee()
             self._label_set_renderee.shift_up = value * AXIS_SCALE_FACTOR / 2.0
 
@@ -224,6 +261,23 @@ class Renderer:
             "main_vertex.glsl", "main_fragment.glsl", program_vars, observable
         )
 
+    def _create_indexed_shader_program(self, observable: Observable) -> ShaderProgram:
+        # Draws opaque meshes from their positions alone, with or without indices
+        program_vars = {
+            ShaderVar.MODEL_MATRIX: "m_model",
+            ShaderVar.VIEW_MATRIX: "m_camera",
+            ShaderVar.PROJECTION_MATRIX: "m_proj",
+            ShaderVar.SHOW_GRID: "show_grid",
+            ShaderVar.SHOW_EDGES: "show_edges",
+        }
+        return self._create_shader_program(
+            "indexed_vertex.glsl",
+            "main_fragment.glsl",
+            program_vars,
+            observable,
+            "indexed_geometry.glsl",
+        )
+
     def _create_axis_shader_program(self, observable: Observable) -> ShaderProgram:
         program_vars = {
             ShaderVar.MODEL_MATRIX: "m_model",
@@ -252,9 +306,14 @@ class Renderer:
         fragment_shader_loc: str,
         register: dict[ShaderVar, str],
         observable: Observable,
+        geometry_shader_loc: str | None = None,
     ) -> ShaderProgram:
         prog = ShaderProgram(
-            self._ctx, vertex_shader_loc, fragment_shader_loc, register
+            self._ctx,
+            vertex_shader_loc,
+            fragment_shader_loc,
+            register,
+            geometry_shader_loc,
         )
         prog.subscribe_to_updates(observable)
         return prog
@@ -272,13 +331,19 @@ class Renderer:
     def indicate_load_status(self, status: LoadStatus):
         if status == LoadStatus.START:
             self.background_color = self.LOADING_BACKGROUND_COLOR
-            self._main_renderee = create_trimesh_renderee(
-                self._ctx,
-                self._main_prog.program,
-                _make_default_mesh(),
-                self._m_model,
-                self._camera.view_matrix,
-                name="loading",
+            self._show(
+                PRIMARY_MODEL_ID,
+                create_trimesh_renderee(
+                    self._ctx,
+                    self._main_prog.program,
+                    _make_default_mesh(),
+                    self._m_model,
+                    self._camera.view_matrix,
+                    name="loading",
+                    indexed_program=self._indexed_prog.program,
+                    pool=self._buffer_pool,
+                ),
+                is_mesh=False,
             )
         elif status == LoadStatus.COMPLETE:
             self.background_color = self.SUCCESS_BACKGROUND_COLOR
@@ -289,24 +354,152 @@ class Renderer:
         else:
             self.background_color = self.DEFAULT_BACKGROUND_COLOR
 
-    def load_mesh(self, mesh: Trimesh | list[Trimesh], name: str = "Unknown load_mesh"):
+    def load_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        name: str = "Unknown load_mesh",
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
         logger.debug("load_mesh started")
-        self._main_renderee = create_trimesh_renderee(
+        renderee = create_trimesh_renderee(
             self._ctx,
             self._main_prog.program,
             mesh,
             self._m_model,
             self._camera.view_matrix,
             name=name,
+            indexed_program=self._indexed_prog.program,
+            pool=self._buffer_pool,
         )
+        renderee.subscribe_to_updates(self.on_program_value_change)
+        self._show(model_id, renderee)
         if isinstance(mesh, list):
-            self.scale = max([m.scale for m in mesh])
+            self._scales[model_id] = max([m.scale for m in mesh])
         else:
-            self.scale = mesh.scale
-        self._main_renderee.subscribe_to_updates(self.on_program_value_change)
-        self._framing_points = self._main_renderee.points
+            self._scales[model_id] = mesh.scale
+        self._update_scene_bounds()
         logger.debug("load_mesh_finished")
 
+    def update_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        deltas: list[MeshDelta],
+        name: str = "Unknown update_mesh",
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        """
+        Show the mesh that the deltas make from the one shown,
+        changing the shown one in place where its renderee allows it.
+        """
+        renderee = self._renderees.get(model_id)
+        if (
+            renderee is None
+            or renderee is not self._mesh_renderees.get(model_id)
+            or not isinstance(renderee, TrimeshOpaqueRenderee)
+            or not isinstance(mesh, Trimesh)
+            or is_alpha(mesh)
+        ):
+            self.load_mesh(mesh, name, model_id)
+            return
+        renderee.apply_deltas(mesh, deltas)
+        self._scales[model_id] = mesh.scale
+        self._update_scene_bounds()
+
+    def add_mesh_chunk(
+        self,
+        chunk: MeshChunk,
+        name: str = "Unknown add_mesh_chunk",
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        """
+        Draw the chunk with those of its mesh that arrived before it.
+        The first chunk replaces the mesh shown, and sets the framing.
+        """
+        if chunk.first_face == 0:
+            renderee = StreamedMeshRenderee(
+                self._ctx,
+                self._indexed_prog.program,
+                chunk,
+                name,
+                compact=True,
+                pool=self._buffer_pool,
+            )
+            self._show(model_id, renderee)
+            assert chunk.bounds is not None
+            self._scales[model_id] = float(np.linalg.norm(np.ptp(chunk.bounds, axis=0)))
+            self._update_scene_bounds()
+            return
+        renderee = self._renderees.get(model_id)
+        if not isinstance(renderee, StreamedMeshRenderee):
+            logger.warning("Mesh chunk without the chunks before it; ignoring it")
+            return
+        renderee.add_chunk(chunk)
+
+    def finish_streamed_mesh(
+        self,
+        mesh: Trimesh,
+        name: str = "Unknown finish_streamed_mesh",
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        """
+        Show the whole mesh whose chunks were drawn as they arrived,
+        keeping what was uploaded if all of them did.
+        """
+        renderee = self._renderees.get(model_id)
+        if not isinstance(renderee, StreamedMeshRenderee) or not renderee.holds(mesh):
+            self.load_mesh(mesh, name, model_id)
+
+    def set_model_visible(self, model_id: int, visible: bool):
+        if visible:
+            self._hidden_models.discard(model_id)
+        else:
+            self._hidden_models.add(model_id)
+        self._update_scene_bounds()
+
+    def remove_model(self, model_id: int):
+        self._show(model_id, None)
+        self._scales.pop(model_id, None)
+        self._hidden_models.discard(model_id)
+        self._update_scene_bounds()
+
+    def _show(
+        self, model_id: int, renderee: TrimeshRenderee | None, is_mesh: bool = True
+    ):
+        """
+        Draw the renderee for the model, or nothing, releasing the one replaced,
+        which is never drawn again, though while a load runs it is still framed.
+        A mesh renderee is also the one framed, and the one updated in place.
+        """
+        old = self._renderees.pop(model_id, None)
+        if renderee is None:
+            self._mesh_renderees.pop(model_id, None)
+        else:
+            self._renderees[model_id] = renderee
+            if is_mesh:
+                self._mesh_renderees[model_id] = renderee
+        if old is not None and old is not renderee:
+            self._to_release.append(old)
+
+    def _visible_model_ids(self) -> list[int]:
+        return [i for i in self._renderees if i not in self._hidden_models]
+
+    def _update_scene_bounds(self):
+        # Framing and the axes follow the meshes of the visible models;
+        # with none visible, they stay as they were
+        visible = [i for i in self._visible_model_ids() if i in self._mesh_renderees]
+        if not visible:
+            return
+        self.scale = max(self._scales[i] for i in visible)
+        self._framing_points = np.concatenate(
+            [self._mesh_renderees[i].points for i in visible], axis=0
+        )
+
+    def _scene_renderees(self) -> list[TrimeshRenderee]:
+        # Opaque models first, so that they show through transparent ones
+        return sorted(
+            (self._renderees[i] for i in self._visible_model_ids()), key=_has_alpha
+        )
+
     def frame(
         self,
         direction: NDArray[np.float32] | None = None,
@@ -335,7 +528,11 @@ class Renderer:
     def render(
         self, show_grid: bool, show_edges: bool, show_gnomon: bool, show_axes: bool
     ):  # override
+        for renderee in self._to_release:
+            renderee.release()
+        self._to_release = []
         self._main_prog.update_all_program_vars()
+        self._indexed_prog.update_all_program_vars()
         self._axis_prog.update_all_program_vars()
         self._num_prog.update_all_program_vars()
         self._gnomon_prog.update_all_program_vars()
@@ -347,7 +544,8 @@ class Renderer:
 
         self.show_grid = show_grid
         self.show_edges = show_edges
-        self._main_renderee.render()
+        for renderee in self._scene_renderees():
+            renderee.render()
 
         if show_axes:
             self.show_grid = True
@@ -32,27 +32,23 @@ class ShaderProgram:
         vertex_shader_loc: str,
         fragment_shader_loc: str,
         register: dict[ShaderVar, str],
+        geometry_shader_loc: str | None = None,
     ):
         self._ctx = ctx
         self._current_values: dict[ShaderVar, Any] = {}
         self.register = register
-        vertex_shader_source = files(scadview.resources.shaders).joinpath(
-            vertex_shader_loc
-        )
-        fragment_shader_source = files(scadview.resources.shaders).joinpath(
-            fragment_shader_loc
-        )
-        with (
-            as_file(vertex_shader_source) as vs_f,
-            as_file(fragment_shader_source) as fs_f,
-        ):
-            try:
-                self.program = self._ctx.program(
-                    vertex_shader=vs_f.read_text(),
-                    fragment_shader=fs_f.read_text(),
-                )
-            except Exception as e:
-                logger.exception(f"Error creating shader program: {e}")
+        try:
+            self.program = self._ctx.program(
+                vertex_shader=_read_shader(vertex_shader_loc),
+                fragment_shader=_read_shader(fragment_shader_loc),
+                geometry_shader=(
+                    None
+                    if geometry_shader_loc is None
+                    else _read_shader(geometry_shader_loc)
+                ),
+            )
+        except Exception as e:
+            logger.exception(f"Error creating shader program: {e}")
 
     def update_program_var(self, var: ShaderVar, value: Any):
         self._current_values[var] = value
@@ -73,3 +69,8 @@ class ShaderProgram:
 
     def subscribe_to_updates(self, updates: Observable):
         updates.subscribe(self.update_program_var)
+
+
+def _read_shader(shader_loc: str) -> str:
+    with as_file(files(scadview.resources.shaders).joinpath(shader_loc)) as f:
+        return f.read_text()
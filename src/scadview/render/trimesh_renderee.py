@@ -9,20 +9,38 @@ from trimesh.bounds import (
     corners,  # pyright: ignore[reportUnknownVariableType] can't resolve
 )
 
+from scadview.mesh_delta import MeshDelta
+from scadview.mesh_transport import MeshChunk
 from scadview.observable import Observable
+from scadview.render.gl_resources import BufferPool, GLResources
+from scadview.render.instancing import find_instances
 from scadview.render.label_renderee import Renderee
 from scadview.render.shader_program import ShaderVar
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_COLOR = [0.5, 0.5, 0.5, 1.0]
+MODEL_MATRIX_UNIFORM = "m_model"
+# The colors of the meshes drawn by the indexed program, by mesh id
+MESH_COLORS_UNIFORM = "mesh_colors"
+# The texture unit of the mesh colors; the label atlas uses 0
+MESH_COLORS_LOCATION = 1
+# Texels in a row of the mesh colors
+MESH_COLORS_WIDTH = 1024
+# Bytes per face in each vertex buffer, which hold each corner of each face
+FACE_POSITION_BYTES = 3 * 3 * 4  # xyz as f4
+FACE_COLOR_BYTES = 3 * 4  # rgba as u1
+FACE_EDGE_DETECT_BYTES = 3 * 3  # 3 u1
+VERTEX_POSITION_BYTES = 3 * 4  # xyz as f4
+# More vertices, or meshes, than this need 4 byte indices, or ids
+MAX_SHORT_INDEX_VERTICES = 2**16
 
 
 def create_vao_from_mesh(
-    ctx: moderngl.Context, program: moderngl.Program, mesh: Trimesh
+    gl: GLResources, program: moderngl.Program, mesh: Trimesh
 ) -> moderngl.VertexArray:
     return create_vao_from_arrays(
-        ctx,
+        gl,
         program,
         mesh.triangles,
         mesh.triangles_cross,
@@ -73,24 +91,38 @@ def create_edge_detect_array(triangle_count: int) -> NDArray[np.uint8]:
 
 
 def create_vao_from_arrays(
-    ctx: moderngl.Context,
+    gl: GLResources,
     program: moderngl.Program,
     triangles: NDArray[np.float32],
     triangles_cross: NDArray[np.float32],
     colors_arr: NDArray[np.uint8],
     edge_detect_arr: NDArray[np.uint8],
 ) -> moderngl.VertexArray:
-    vertices = ctx.buffer(data=triangles.astype("f4").tobytes())
-    normals = ctx.buffer(
+    return create_vao(
+        gl,
+        program,
+        *create_buffers(gl, triangles, triangles_cross, colors_arr, edge_detect_arr),
+    )
+
+
+def create_buffers(
+    gl: GLResources,
+    triangles: NDArray[np.float32],
+    triangles_cross: NDArray[np.float32],
+    colors_arr: NDArray[np.uint8],
+    edge_detect_arr: NDArray[np.uint8],
+) -> tuple[moderngl.Buffer, moderngl.Buffer, moderngl.Buffer, moderngl.Buffer]:
+    vertices = gl.buffer(data=triangles.astype("f4").tobytes())
+    normals = gl.buffer(
         data=np.array([[v] * 3 for v in triangles_cross]).astype("f4").tobytes()
     )
-    colors = ctx.buffer(data=colors_arr.tobytes())
-    edge_detect = ctx.buffer(data=edge_detect_arr.tobytes())
-    return create_vao(ctx, program, vertices, normals, colors, edge_detect)
+    colors = gl.buffer(data=colors_arr.tobytes())
+    edge_detect = gl.buffer(data=edge_detect_arr.tobytes())
+    return vertices, normals, colors, edge_detect
 
 
 def create_vao(
-    ctx: moderngl.Context,
+    gl: GLResources,
     program: moderngl.Program,
     vertices: moderngl.Buffer,
     normals: moderngl.Buffer,
@@ -98,7 +130,7 @@ def create_vao(
     edge_detect: moderngl.Buffer,
 ) -> moderngl.VertexArray:
     try:
-        return ctx.vertex_array(
+        return gl.vertex_array(
             program,
             [
                 (vertices, "3f4", "in_position"),
@@ -113,16 +145,184 @@ def create_vao(
         raise e
 
 
+def create_compact_vao(
+    gl: GLResources, program: moderngl.Program, vertices: moderngl.Buffer
+) -> moderngl.VertexArray:
+    """
+    A vertex array of the corners of each face alone, without indices,
+    for the indexed program, which works out the rest as it draws.
+    It draws the mesh of id 0.
+    """
+    ids = gl.buffer(data=np.zeros(1, dtype="u2").tobytes())
+    return gl.vertex_array(
+        program,
+        [
+            (vertices, "3f4", "in_position"),
+            (ids, "1u2/r", "in_mesh_id"),
+            _untransformed(gl),
+        ],
+        mode=moderngl.TRIANGLES,
+    )
+
+
+def _untransformed(gl: GLResources) -> tuple[moderngl.Buffer, str, str]:
+    # Read once for the whole draw, as the vertices are not instances
+    transform = gl.buffer(data=np.eye(4, dtype="f4").tobytes())
+    return transform, "16f4/r", "in_transform"
+
+
+def create_indexed_vao(
+    gl: GLResources,
+    program: moderngl.Program,
+    meshes: list[Trimesh],
+    mesh_ids: list[int] | None = None,
+) -> tuple[moderngl.VertexArray, moderngl.Buffer]:
+    """
+    A vertex array of the vertices of the meshes, shared by their faces,
+    for the indexed program, which draws all of them at once.
+    The id of each mesh is the matching one of mesh_ids,
+    or by default its place in the list.
+    Returns it with its vertex buffer.
+    """
+    vertex_counts = [len(mesh.vertices) for mesh in meshes]
+    index_dtype = _short_or_long(sum(vertex_counts))
+    offsets = np.cumsum([0, *vertex_counts[:-1]])
+    vertices = gl.buffer(
+        data=np.concatenate([mesh.vertices for mesh in meshes], dtype="f4").tobytes()
+    )
+    indices = gl.buffer(
+        data=np.concatenate(
+            [mesh.faces + offset for mesh, offset in zip(meshes, offsets)]
+        )
+        .astype(index_dtype)
+        .tobytes()
+    )
+    mesh_ids = list(range(len(meshes))) if mesh_ids is None else mesh_ids
+    id_dtype = _short_or_long(max(mesh_ids) + 1)
+    if len(meshes) == 1:
+        # Read once for the whole draw
+        ids = gl.buffer(data=np.array(mesh_ids, dtype=id_dtype).tobytes())
+        id_content = (ids, f"1{id_dtype}/r")
+    else:
+        ids = gl.buffer(
+            data=np.repeat(np.array(mesh_ids, dtype=id_dtype), vertex_counts).tobytes()
+        )
+        id_content = (ids, f"1{id_dtype}")
+    vao = gl.vertex_array(
+        program,
+        [
+            (vertices, "3f4", "in_position"),
+            (*id_content, "in_mesh_id"),
+            _untransformed(gl),
+        ],
+        index_buffer=indices,
+        index_element_size=np.dtype(index_dtype).itemsize,
+        mode=moderngl.TRIANGLES,
+    )
+    return vao, vertices
+
+
+def create_instanced_vao(
+    gl: GLResources,
+    program: moderngl.Program,
+    mesh: Trimesh,
+    transforms: list[NDArray[np.float64]],
+    mesh_ids: list[int],
+) -> moderngl.VertexArray:
+    """
+    A vertex array of the mesh, for the indexed program, drawn once
+    for each transform as the mesh of the matching id.
+    Render it with as many instances as there are transforms.
+    """
+    index_dtype = _short_or_long(len(mesh.vertices))
+    id_dtype = _short_or_long(max(mesh_ids) + 1)
+    vertices = gl.buffer(data=np.asarray(mesh.vertices, dtype="f4").tobytes())
+    indices = gl.buffer(data=np.asarray(mesh.faces).astype(index_dtype).tobytes())
+    # Column by column, as the shader reads matrices
+    columns = np.array(transforms, dtype="f4").transpose(0, 2, 1)
+    vao = gl.vertex_array(
+        program,
+        [
+            (vertices, "3f4", "in_position"),
+            (
+                gl.buffer(data=np.array(mesh_ids, dtype=id_dtype).tobytes()),
+                f"1{id_dtype}/i",
+                "in_mesh_id",
+            ),
+            (gl.buffer(data=columns.tobytes()), "16f4/i", "in_transform"),
+        ],
+        index_buffer=indices,
+        index_element_size=np.dtype(index_dtype).itemsize,
+        mode=moderngl.TRIANGLES,
+    )
+    return vao
+
+
+def _short_or_long(count: int) -> str:
+    return "u2" if count <= MAX_SHORT_INDEX_VERTICES else "u4"
+
+
+class MeshColors:
+    """
+    The colors of the meshes of an indexed vertex array, by mesh id.
+    A hidden mesh has its color with an alpha of 0, so it is not drawn.
+    """
+
+    def __init__(self, gl: GLResources, colors: NDArray[np.uint8]):
+        self._colors = colors.copy()
+        self._visible = np.ones(len(colors), dtype=bool)
+        width = min(len(colors), MESH_COLORS_WIDTH)
+        rows = -(-len(colors) // width)
+        self._texels = width * rows
+        self._texture = gl.texture((width, rows), 4)
+        self._write()
+
+    def set_color(self, mesh_id: int, color: NDArray[np.uint8]):
+        self._colors[mesh_id] = color
+        self._write()
+
+    def set_visible(self, mesh_id: int, visible: bool):
+        self._visible[mesh_id] = visible
+        self._write()
+
+    def use(self, program: moderngl.Program):
+        self._texture.use(location=MESH_COLORS_LOCATION)
+        get_uniform(program, MESH_COLORS_UNIFORM).value = MESH_COLORS_LOCATION
+
+    def _write(self):
+        colors = self._colors.copy()
+        colors[~self._visible, 3] = 0
+        padding = self._texels - len(colors)
+        self._texture.write(np.pad(colors, ((0, padding), (0, 0))).tobytes())
+
+
+def get_uniform(program: moderngl.Program, name: str) -> moderngl.Uniform:
+    uniform = program[name]
+    if not isinstance(uniform, moderngl.Uniform):
+        raise TypeError(f"{name!r} is not a uniform")
+    return uniform
+
+
 def concat_colors(meshes: list[Trimesh]) -> NDArray[np.uint8]:
-    colors_list = np.empty(
-        (0, 12),
-        dtype=np.uint8,  # 12 = 4 color components * 3 vertices per triangle
+    # 12 = 4 color components * 3 vertices per triangle
+    colors = np.array([get_metadata_color(mesh) for mesh in meshes], dtype=np.uint8)
+    return np.repeat(
+        np.tile(colors.reshape(-1, 4), (1, 3)),
+        [len(mesh.faces) for mesh in meshes],
+        axis=0,
     )
-    for mesh in meshes:
-        color = get_metadata_color(mesh)
-        n_triangles = mesh.triangles.shape[0]
-        colors_list = np.append(colors_list, np.tile(color, (n_triangles, 3)), axis=0)
-    return colors_list
+
+
+def set_opaque_state(ctx: moderngl.Context, cull_back_face: bool = False):
+    if cull_back_face:
+        ctx.enable(moderngl.CULL_FACE)
+        ctx.front_face = "ccw"
+        ctx.cull_face = "back"  # Cull back-facing triangles
+    else:
+        ctx.disable(moderngl.CULL_FACE)
+    ctx.enable(moderngl.DEPTH_TEST)
+    ctx.disable(moderngl.BLEND)
+    ctx.depth_mask = True  # type: ignore[attr-defined]
 
 
 class TrimeshRenderee(Renderee):
@@ -142,12 +342,27 @@ class TrimeshOpaqueRenderee(TrimeshRenderee):
         mesh: Trimesh,
         cull_back_face: bool = False,
         name: str = "Unnamed Trimesh",
+        indexed: bool = False,
+        pool: BufferPool | None = None,
     ):
+        """
+        An indexed renderee uploads only the vertices and faces of the mesh,
+        and must be given the indexed program.
+        Its buffers come from the pool, and go back to it when released.
+        """
         super().__init__(ctx, program, name)
         self._ctx = ctx
         self._program = program
         self._mesh = mesh
+        self._indexed = indexed
+        self._gl = GLResources(ctx, pool)
+        self._color = get_metadata_color(mesh)
         self._vao = None
+        self._vertices: moderngl.Buffer | None = None
+        self._colors: moderngl.Buffer | None = None
+        self._mesh_colors: MeshColors | None = None
+        # Moves the mesh uploaded in the shader, so it need not be uploaded again
+        self._transform: NDArray[np.float64] | None = None
         self._points = corners(mesh.bounds)
         self._cull_back_face = cull_back_face
 
@@ -158,21 +373,221 @@ class TrimeshOpaqueRenderee(TrimeshRenderee):
     def subscribe_to_updates(self, updates: Observable):
         pass
 
+    def release(self):
+        self._gl.release()
+        self._vao = None
+        self._vertices = None
+        self._colors = None
+        self._mesh_colors = None
+
+    def apply_deltas(self, mesh: Trimesh, deltas: list[MeshDelta]):
+        """
+        Show the mesh that the deltas make from the one shown.
+        Moves and color changes are applied to what was uploaded,
+        as are new vertices where the mesh is indexed and has as many;
+        other new vertices or faces upload the mesh again when next drawn,
+        into the buffers it had if it is the same size.
+        """
+        replaced = [delta for delta in deltas if delta.geometry_replaced]
+        if replaced:
+            # The vertices are those of the final mesh, so no move is left
+            self._transform = None
+            if self._holds_faces_of(mesh, replaced):
+                assert self._vertices is not None
+                self._vertices.write(np.asarray(mesh.vertices, dtype="f4").tobytes())
+            else:
+                self._vao = None
+        elif self._vao is not None:
+            for delta in deltas:
+                if delta.transform is not None:
+                    self._transform = (
+                        delta.transform
+                        if self._transform is None
+                        else delta.transform @ self._transform
+                    )
+        colors_changed = any(delta.metadata is not None for delta in deltas)
+        self._mesh = mesh
+        self._points = corners(mesh.bounds)
+        if colors_changed:
+            self._color = get_metadata_color(mesh)
+        if self._vao is not None and colors_changed and self._colors is not None:
+            self._colors.write(
+                create_colors_array(self._color, len(mesh.faces)).tobytes()
+            )
+        if colors_changed and self._mesh_colors is not None:
+            self._mesh_colors.set_color(0, self._color)
+
+    def _holds_faces_of(self, mesh: Trimesh, replaced: list[MeshDelta]) -> bool:
+        """Whether only the vertices of what was uploaded need replacing"""
+        return (
+            self._vao is not None
+            and self._vertices is not None
+            and all(delta.faces is None for delta in replaced)
+            and self._vertices.size == len(mesh.vertices) * VERTEX_POSITION_BYTES
+        )
+
     def render(self):
-        if self._cull_back_face:
-            self._ctx.enable(moderngl.CULL_FACE)
-            self._ctx.front_face = "ccw"
-            self._ctx.cull_face = "back"  # Cull back-facing triangles
-        else:
-            self._ctx.disable(moderngl.CULL_FACE)
-        self._ctx.enable(moderngl.DEPTH_TEST)
-        self._ctx.disable(moderngl.BLEND)
-        self._ctx.depth_mask = True  # type: ignore[attr-defined]
+        set_opaque_state(self._ctx, self._cull_back_face)
+        self.draw()
+
+    def draw(self):
+        """Draw the mesh, in the state set for opaque meshes"""
         if (
             self._vao is None
         ):  # Lazily create the _vao so that it is created during the render when the context is active
-            self._vao = create_vao_from_mesh(self._ctx, self._program, self._mesh)
+            self._create_vao()
+        assert self._vao is not None
+        if self._mesh_colors is not None:
+            self._mesh_colors.use(self._program)
+        if self._transform is None:
+            self._vao.render()
+            return
+        model = get_uniform(self._program, MODEL_MATRIX_UNIFORM)
+        model_matrix = model.read()
+        # The uniform holds the matrix column by column, i.e. transposed
+        base = np.frombuffer(model_matrix, dtype="f4").reshape(4, 4)
+        model.write((self._transform.T.astype("f4") @ base).tobytes())
         self._vao.render()
+        model.write(model_matrix)
+
+    def _create_vao(self):
+        # What was uploaded before goes back to the pool, to be reused if it fits
+        self.release()
+        self._transform = None
+        if self._indexed:
+            self._vao, self._vertices = create_indexed_vao(
+                self._gl, self._program, [self._mesh]
+            )
+            self._mesh_colors = MeshColors(self._gl, self._color[np.newaxis])
+            return
+        vertices, normals, self._colors, edge_detect = create_buffers(
+            self._gl,
+            self._mesh.triangles,
+            self._mesh.triangles_cross,
+            create_colors_array_from_mesh(self._mesh),
+            create_edge_detect_array(self._mesh.triangles.shape[0]),
+        )
+        self._vao = create_vao(
+            self._gl, self._program, vertices, normals, self._colors, edge_detect
+        )
+
+
+class StreamedMeshRenderee(TrimeshRenderee):
+    """
+    Draws a mesh sent in chunks, drawing the faces that have arrived.
+    Buffers for the whole mesh are made when the first chunk is drawn,
+    and each chunk is written into them as it arrives.
+    A compact renderee has only the positions, and is drawn by the indexed program
+    without indices.
+    """
+
+    def __init__(
+        self,
+        ctx: moderngl.Context,
+        program: moderngl.Program,
+        first: MeshChunk,
+        name: str = "Unknown StreamedMesh",
+        compact: bool = False,
+        pool: BufferPool | None = None,
+    ):
+        super().__init__(ctx, program, name)
+        if first.first_face != 0 or first.bounds is None:
+            raise ValueError("A streamed mesh must start with its first chunk")
+        self._ctx = ctx
+        self._program = program
+        self._compact = compact
+        self._gl = GLResources(ctx, pool)
+        self._face_count = first.face_count
+        self._color = get_metadata_color(Trimesh(metadata=first.metadata or {}))
+        self._points = corners(first.bounds)
+        self._pending: list[MeshChunk] = [first]
+        self._arrived = len(first.triangles)
+        self._uploaded = 0
+        # The positions, then, unless compact, the normals, colors and edge detects
+        self._buffers: list[moderngl.Buffer] | None = None
+        self._vao: moderngl.VertexArray | None = None
+        self._mesh_colors: MeshColors | None = None
+
+    @property
+    def points(self) -> NDArray[np.float32]:
+        return self._points.astype("f4")
+
+    @property
+    def complete(self) -> bool:
+        return self._arrived >= self._face_count
+
+    def holds(self, mesh: Trimesh) -> bool:
+        """Whether every chunk of this mesh has arrived"""
+        return self.complete and len(mesh.faces) == self._face_count
+
+    def subscribe_to_updates(self, updates: Observable):
+        pass
+
+    def release(self):
+        self._gl.release()
+        self._vao = None
+        self._mesh_colors = None
+
+    def add_chunk(self, chunk: MeshChunk):
+        if chunk.first_face != self._arrived:
+            raise ValueError(
+                f"Expected the chunk from face {self._arrived}, got {chunk.first_face}"
+            )
+        self._pending.append(chunk)
+        self._arrived += len(chunk.triangles)
+
+    def render(self):
+        set_opaque_state(self._ctx)
+        # Uploaded while drawing, when the context is current
+        if self._buffers is None:
+            self._create_vao()
+        for chunk in self._pending:
+            self._upload(chunk)
+        self._pending = []
+        if self._vao is not None and self._uploaded > 0:
+            if self._mesh_colors is not None:
+                self._mesh_colors.use(self._program)
+            self._vao.render(vertices=self._uploaded * 3)
+
+    def _create_vao(self):
+        vertices = self._gl.buffer(reserve=self._face_count * FACE_POSITION_BYTES)
+        if self._compact:
+            self._buffers = [vertices]
+            self._vao = create_compact_vao(self._gl, self._program, vertices)
+            self._mesh_colors = MeshColors(self._gl, self._color[np.newaxis])
+            return
+        self._buffers = [
+            vertices,
+            self._gl.buffer(reserve=self._face_count * FACE_POSITION_BYTES),
+            self._gl.buffer(reserve=self._face_count * FACE_COLOR_BYTES),
+            self._gl.buffer(reserve=self._face_count * FACE_EDGE_DETECT_BYTES),
+        ]
+        self._vao = create_vao(self._gl, self._program, *self._buffers)
+
+    def _upload(self, chunk: MeshChunk):
+        assert self._buffers is not None
+        triangles = chunk.triangles.astype("f4")
+        count = len(triangles)
+        first = chunk.first_face
+        self._buffers[0].write(triangles.tobytes(), offset=first * FACE_POSITION_BYTES)
+        self._uploaded = first + count
+        if self._compact:
+            return
+        _, normals, colors, edge_detect = self._buffers
+        cross = np.cross(
+            triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]
+        )
+        normals.write(
+            np.repeat(cross, 3, axis=0).tobytes(), offset=first * FACE_POSITION_BYTES
+        )
+        colors.write(
+            create_colors_array(self._color, count).tobytes(),
+            offset=first * FACE_COLOR_BYTES,
+        )
+        edge_detect.write(
+            create_edge_detect_array(count).tobytes(),
+            offset=first * FACE_EDGE_DETECT_BYTES,
+        )
 
 
 class TrimeshNullRenderee(TrimeshRenderee):
@@ -201,8 +616,15 @@ class AlphaRenderee(Renderee):
         model_matrix: NDArray[np.float32],
         view_matrix: NDArray[np.float32],
         name: str = "Unknown AlphaRenderee",
+        pool: BufferPool | None = None,
     ):
+        """
+        The faces are sorted again whenever the view moves; the sorted buffers
+        are the same size each time, so with a pool they are rewritten in place.
+        """
         super().__init__(ctx, program, name)
+        self._gl = GLResources(ctx, pool)
+        self._updates: Observable | None = None
         self._triangles = triangles
         self._triangles_cross = triangles_cross
         self._colors_arr = colors_arr
@@ -230,6 +652,14 @@ class AlphaRenderee(Renderee):
 
     def subscribe_to_updates(self, updates: Observable):
         updates.subscribe(self.update_matrix)
+        self._updates = updates
+
+    def release(self):
+        if self._updates is not None:
+            self._updates.unsubscribe(self.update_matrix)
+            self._updates = None
+        self._gl.release()
+        self._resort_verts = True
 
     def update_matrix(self, var: ShaderVar, matrix: NDArray[np.float32]):
         if var == ShaderVar.MODEL_MATRIX:
@@ -245,8 +675,9 @@ class AlphaRenderee(Renderee):
         sorted_triangles_cross = self._triangles_cross[sorted_indices]
         sorted_colors = self._colors_arr[sorted_indices]
         edge_detect_arr = create_edge_detect_array(self._triangles.shape[0])
+        self._gl.release()
         self._vao = create_vao_from_arrays(
-            self._ctx,
+            self._gl,
             self._program,
             sorted_triangles,
             sorted_triangles_cross,
@@ -274,6 +705,7 @@ class TrimeshAlphaRenderee(TrimeshRenderee):
         model_matrix: NDArray[np.float32],
         view_matrix: NDArray[np.float32],
         name: str = "Unknown TrimeshAlpha",
+        pool: BufferPool | None = None,
     ):
         self._alpha_renderee = AlphaRenderee(
             ctx,
@@ -284,6 +716,7 @@ class TrimeshAlphaRenderee(TrimeshRenderee):
             model_matrix,
             view_matrix,
             name,
+            pool,
         )
         self._points = corners(mesh.bounds)
         self.name = name
@@ -293,35 +726,126 @@ class TrimeshAlphaRenderee(TrimeshRenderee):
         return self._points.astype("f4")
 
     def subscribe_to_updates(self, updates: Observable):
-        updates.subscribe(self._alpha_renderee.update_matrix)
+        self._alpha_renderee.subscribe_to_updates(updates)
+
+    def release(self):
+        self._alpha_renderee.release()
 
     def render(self):
         self._alpha_renderee.render()
 
 
 class TrimeshListOpaqueRenderee(TrimeshRenderee):
+    """
+    Draws opaque meshes. Indexed, a shape copied several times is uploaded once
+    and its copies drawn at once as instances of it; the other meshes
+    are packed into one vertex array and drawn at once.
+    Otherwise each mesh is drawn in turn.
+    """
+
     def __init__(
         self,
         ctx: moderngl.Context,
         program: moderngl.Program,
         meshes: list[Trimesh],
         name: str = "Unknown TrimeshList",
+        indexed: bool = False,
+        pool: BufferPool | None = None,
     ):
         super().__init__(ctx, program, name)
-        self._renderees = [TrimeshOpaqueRenderee(ctx, program, mesh) for mesh in meshes]
+        self._ctx = ctx
+        self._program = program
+        self._meshes = meshes
+        self._indexed = indexed
+        self._gl = GLResources(ctx, pool)
+        self._renderees = (
+            []
+            if indexed
+            else [
+                TrimeshOpaqueRenderee(ctx, program, mesh, pool=pool) for mesh in meshes
+            ]
+        )
+        # Each vertex array with the number of instances to draw, or None
+        self._vaos: list[tuple[moderngl.VertexArray, int | None]] | None = None
+        self._mesh_colors: MeshColors | None = None
+        self._hidden: set[int] = set()
 
     @property
     def points(self) -> NDArray[np.float32]:
-        if len(self._renderees) == 0:
+        if len(self._meshes) == 0:
             return np.empty((1, 3), dtype="f4")
-        return np.concatenate([r.points for r in self._renderees], axis=0, dtype="f4")
+        return np.concatenate(
+            [corners(mesh.bounds) for mesh in self._meshes], axis=0, dtype="f4"
+        )
 
     def subscribe_to_updates(self, updates: Observable):
         pass
 
-    def render(self):
+    def release(self):
         for renderee in self._renderees:
-            renderee.render()
+            renderee.release()
+        self._gl.release()
+        self._vaos = None
+        self._mesh_colors = None
+
+    def set_mesh_visible(self, index: int, visible: bool):
+        """Show or hide the mesh at the index of the list"""
+        if visible:
+            self._hidden.discard(index)
+        else:
+            self._hidden.add(index)
+        if self._mesh_colors is not None:
+            self._mesh_colors.set_visible(index, visible)
+
+    def render(self):
+        set_opaque_state(self._ctx)
+        if not self._indexed:
+            for i, renderee in enumerate(self._renderees):
+                if i not in self._hidden:
+                    renderee.draw()
+            return
+        if self._vaos is None:
+            self._create_vaos()
+        assert self._vaos is not None and self._mesh_colors is not None
+        self._mesh_colors.use(self._program)
+        for vao, instances in self._vaos:
+            if instances is None:
+                vao.render()
+            else:
+                vao.render(instances=instances)
+
+    def _create_vaos(self):
+        found = find_instances(self._meshes)
+        copied = [instances for instances in found if len(instances.meshes) > 1]
+        self._vaos = [
+            (
+                create_instanced_vao(
+                    self._gl,
+                    self._program,
+                    self._meshes[instances.meshes[0]],
+                    instances.transforms,
+                    instances.meshes,
+                ),
+                len(instances.meshes),
+            )
+            for instances in copied
+        ]
+        single = [i.meshes[0] for i in found if len(i.meshes) == 1]
+        if single:
+            vao, _ = create_indexed_vao(
+                self._gl, self._program, [self._meshes[i] for i in single], single
+            )
+            self._vaos.append((vao, None))
+        ratio = len(self._meshes) / len(found)
+        logger.debug(
+            f"{self.name}: {len(self._meshes)} meshes drawn as {len(copied)} instanced shapes and {len(single)} others; instancing ratio {ratio:.1f}"
+        )
+        self._mesh_colors = MeshColors(
+            self._gl,
+            np.array([get_metadata_color(mesh) for mesh in self._meshes]),
+        )
+        for index in self._hidden:
+            self._mesh_colors.set_visible(index, False)
 
 
 class TrimeshListAlphaRenderee(TrimeshRenderee):
@@ -333,6 +857,7 @@ class TrimeshListAlphaRenderee(TrimeshRenderee):
         model_matrix: NDArray[np.float32],
         view_matrix: NDArray[np.float32],
         name: str = "Unknow TrimeshListAlpha",
+        pool: BufferPool | None = None,
     ):
         self._alpha_renderee = AlphaRenderee(
             ctx,
@@ -343,6 +868,7 @@ class TrimeshListAlphaRenderee(TrimeshRenderee):
             model_matrix,
             view_matrix,
             name,
+            pool,
         )
 
         self._points = np.concatenate([corners(mesh.bounds) for mesh in meshes]).astype(
@@ -354,7 +880,10 @@ class TrimeshListAlphaRenderee(TrimeshRenderee):
         return self._points
 
     def subscribe_to_updates(self, updates: Observable):
-        updates.subscribe(self._alpha_renderee.update_matrix)
+        self._alpha_renderee.subscribe_to_updates(updates)
+
+    def release(self):
+        self._alpha_renderee.release()
 
     def render(self):
         self._alpha_renderee.render()
@@ -378,6 +907,10 @@ class TrimeshListRenderee(TrimeshRenderee):
     def subscribe_to_updates(self, updates: Observable):
         self._alphas_renderee.subscribe_to_updates(updates)
 
+    def release(self):
+        self._opaques_renderee.release()
+        self._alphas_renderee.release()
+
     def render(self):
         self._opaques_renderee.render()
         self._alphas_renderee.render()
@@ -390,7 +923,15 @@ def create_trimesh_renderee(
     model_matrix: NDArray[np.float32],
     view_matrix: NDArray[np.float32],
     name: str = "Unknown create_trimesh_renderee",
+    indexed_program: moderngl.Program | None = None,
+    pool: BufferPool | None = None,
 ) -> TrimeshRenderee:
+    """
+    Opaque meshes are drawn by the indexed program if one is given,
+    so only their vertices and faces are uploaded.
+    Transparent meshes are sorted face by face, so they keep a color per vertex.
+    Buffers come from the pool if one is given, and go back to it on release.
+    """
     if isinstance(mesh, list):
         return create_trimesh_list_renderee(
             ctx,
@@ -399,6 +940,8 @@ def create_trimesh_renderee(
             model_matrix,
             view_matrix,
             name,
+            indexed_program,
+            pool,
         )
     else:
         return create_single_trimesh_renderee(
@@ -408,6 +951,8 @@ def create_trimesh_renderee(
             model_matrix,
             view_matrix,
             name,
+            indexed_program,
+            pool,
         )
 
 
@@ -418,9 +963,13 @@ def create_trimesh_list_renderee(
     model_matrix: NDArray[np.float32],
     view_matrix: NDArray[np.float32],
     name: str,
+    indexed_program: moderngl.Program | None = None,
+    pool: BufferPool | None = None,
 ) -> TrimeshListRenderee:
     opaques, alphas = split_opaque_alpha(meshes)
-    opaques_renderee = create_trimesh_list_opaque_renderee(ctx, program, opaques)
+    opaques_renderee = create_trimesh_list_opaque_renderee(
+        ctx, program, opaques, indexed_program, name, pool
+    )
     alphas_renderee = create_trimesh_list_alpha_renderee(
         ctx,
         program,
@@ -428,6 +977,7 @@ def create_trimesh_list_renderee(
         model_matrix,
         view_matrix,
         name,
+        pool,
     )
     return TrimeshListRenderee(opaques_renderee, alphas_renderee)
 
@@ -448,11 +998,20 @@ def is_alpha(mesh: Trimesh) -> bool:
 
 
 def create_trimesh_list_opaque_renderee(
-    ctx: moderngl.Context, program: moderngl.Program, opaques: list[Trimesh]
+    ctx: moderngl.Context,
+    program: moderngl.Program,
+    opaques: list[Trimesh],
+    indexed_program: moderngl.Program | None = None,
+    name: str = "Unknown TrimeshList",
+    pool: BufferPool | None = None,
 ):
     if len(opaques) == 0:
         return TrimeshNullRenderee()
-    return TrimeshListOpaqueRenderee(ctx, program, opaques)
+    if indexed_program is not None:
+        return TrimeshListOpaqueRenderee(
+            ctx, indexed_program, opaques, name, indexed=True, pool=pool
+        )
+    return TrimeshListOpaqueRenderee(ctx, program, opaques, name, pool=pool)
 
 
 def create_trimesh_list_alpha_renderee(
@@ -462,11 +1021,12 @@ def create_trimesh_list_alpha_renderee(
     model_matrix: NDArray[np.float32],
     view_matrix: NDArray[np.float32],
     name: str,
+    pool: BufferPool | None = None,
 ):
     if len(alphas) == 0:
         return TrimeshNullRenderee()
     return TrimeshListAlphaRenderee(
-        ctx, program, alphas, model_matrix, view_matrix, name
+        ctx, program, alphas, model_matrix, view_matrix, name, pool
     )
 
 
@@ -477,6 +1037,8 @@ def create_single_trimesh_renderee(
     model_matrix: NDArray[np.float32],
     view_matrix: NDArray[np.float32],
     name: str,
+    indexed_program: moderngl.Program | None = None,
+    pool: BufferPool | None = None,
 ) -> TrimeshRenderee:
     if is_alpha(mesh):
         return TrimeshAlphaRenderee(
@@ -486,9 +1048,14 @@ def create_single_trimesh_renderee(
             model_matrix,
             view_matrix,
             name,
+            pool,
+        )
+    elif indexed_program is not None:
+        return TrimeshOpaqueRenderee(
+            ctx, indexed_program, mesh, name=name, indexed=True, pool=pool
         )
     else:
-        return TrimeshOpaqueRenderee(ctx, program, mesh, name=name)
+        return TrimeshOpaqueRenderee(ctx, program, mesh, name=name, pool=pool)
 
 
 def sort_triangles(
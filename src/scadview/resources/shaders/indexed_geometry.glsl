@@ -0,0 +1,38 @@
+#version 330
+
+// Gives each face the normals and each corner the edge detect that
+// main_fragment.glsl takes, and drops the faces of hidden meshes,
+// whose color has no alpha
+layout(triangles) in;
+layout(triangle_strip, max_vertices = 3) out;
+
+in vec3 v_pos[];
+in vec3 v_w_pos[];
+in vec4 v_color[];
+
+out vec3 pos;
+out vec3 normal;
+out vec3 w_normal;
+out vec3 w_pos;
+out vec4 color;
+out vec3 edge_detect;
+
+void main() {
+    if (v_color[0].a == 0.0) {
+        return;
+    }
+    vec3 face_w_normal = normalize(cross(v_w_pos[1] - v_w_pos[0], v_w_pos[2] - v_w_pos[0]));
+    vec3 face_normal = normalize(cross(v_pos[1] - v_pos[0], v_pos[2] - v_pos[0]));
+    for (int i = 0; i < 3; i++) {
+        gl_Position = gl_in[i].gl_Position;
+        pos = v_pos[i];
+        w_pos = v_w_pos[i];
+        normal = face_normal;
+        w_normal = face_w_normal;
+        color = v_color[i];
+        edge_detect = vec3(0.0);
+        edge_detect[i] = 1.0;
+        EmitVertex();
+    }
+    EndPrimitive();
+}
@@ -0,0 +1,30 @@
+#version 330
+
+// Vertices are shared by faces, so what belongs to a face
+// is worked out in the geometry shader.
+// Several meshes may be drawn at once; each vertex, or instance, has the id
+// of its mesh, whose color is in row-major order in mesh_colors
+in vec3 in_position;
+in uint in_mesh_id;
+// Moves an instance of the vertices into place
+in mat4 in_transform;
+
+uniform mat4 m_model;
+uniform mat4 m_camera;
+uniform mat4 m_proj;
+uniform sampler2D mesh_colors;
+
+out vec3 v_pos;
+out vec3 v_w_pos;
+out vec4 v_color;
+
+void main() {
+    vec4 world_pos = m_model * in_transform * vec4(in_position, 1.0);
+    v_w_pos = world_pos.xyz / world_pos.w;
+    vec4 p = m_camera * world_pos;
+    gl_Position = m_proj * p;
+    v_pos = p.xyz / p.w;
+    int width = textureSize(mesh_colors, 0).x;
+    int id = int(in_mesh_id);
+    v_color = texelFetch(mesh_colors, ivec2(id % width, id / width), 0);
+}
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from importlib import metadata
+from typing import Any
+
+from scadview.mesh_store import MeshStore, PendingEntry
+from scadview.module_loader import user_modules
+from scadview.parameters import ParamValue
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MAX_BYTES = 2 * 1024**3
+# A change to any of these can change what create_mesh produces
+VERSIONED_PACKAGES = ["scadview", "trimesh", "manifold3d"]
+STATS_FILE = "stats.json"
+
+
+def default_cache_dir() -> str:
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+        return os.path.join(base, "scadview", "Cache")
+    if sys.platform == "darwin":
+        return os.path.expanduser("~/Library/Caches/scadview")
+    base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "scadview")
+
+
+def _package_versions() -> dict[str, str]:
+    versions: dict[str, str] = {}
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = "unknown"
+    return versions
+
+
+def _file_hash(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return "missing"
+
+
+def user_module_files(module_path: str, project_root: str | None = None) -> list[str]:
+    """
+    Files of the imported modules that live alongside the module
+    or under the project root, i.e. the user's own rather than installed ones.
+    """
+    roots = [os.path.dirname(os.path.abspath(module_path))]
+    if project_root:
+        roots.append(project_root)
+    module_file = os.path.abspath(module_path)
+    return sorted(set(user_modules(roots).values()) - {module_file})
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+class ResultCache:
+    """
+    Persistent cache of create_mesh results.
+
+    Entries are keyed by the contents of the module, the user modules it
+    imported, the versions of the packages that build the meshes,
+    and the parameters create_mesh was called with.
+    Which user modules a module imports is only known after running it,
+    so it is recorded per module in a manifest.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        project_root: str | None = None,
+    ):
+        self.directory = directory or default_cache_dir()
+        self._project_root = project_root
+        self._store = MeshStore(os.path.join(self.directory, "results"), max_bytes)
+        self._manifest_dir = os.path.join(self.directory, "manifests")
+
+    def lookup(
+        self, module_path: str, params: dict[str, ParamValue] | None = None
+    ) -> list[Any] | None:
+        """Return the cached frames for the module, or None on a miss."""
+        dependencies = self._read_manifest(module_path)
+        frames = None
+        if dependencies is not None:
+            frames = self._store.get(
+                self._key(module_path, _file_hash(module_path), dependencies, params)
+            )
+        stats = self._update_stats(frames is not None)
+        outcome = "hit" if frames is not None else "miss"
+        logger.info(
+            f"Result cache {outcome} for {module_path} (hits: {stats.hits}, misses: {stats.misses})"
+        )
+        return frames
+
+    def dependencies(self, module_path: str) -> list[str] | None:
+        """The user modules the module imported when its result was stored."""
+        return self._read_manifest(module_path)
+
+    def begin(
+        self, module_path: str, params: dict[str, ParamValue] | None = None
+    ) -> ResultCacheEntry:
+        # Hash the module before it runs, so an edit made during the load
+        # cannot end up keyed to the old result
+        return ResultCacheEntry(
+            self, module_path, _file_hash(module_path), self._store.begin(), params
+        )
+
+    def commit(
+        self,
+        module_path: str,
+        module_hash: str,
+        pending: PendingEntry,
+        params: dict[str, ParamValue] | None = None,
+    ):
+        dependencies = user_module_files(module_path, self._project_root)
+        self._write_manifest(module_path, dependencies)
+        pending.commit(self._key(module_path, module_hash, dependencies, params))
+
+    @property
+    def stats(self) -> CacheStats:
+        try:
+            with open(os.path.join(self.directory, STATS_FILE)) as f:
+                return CacheStats(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return CacheStats()
+
+    def clear(self):
+        self._store.clear()
+
+    def _update_stats(self, hit: bool) -> CacheStats:
+        stats = self.stats
+        if hit:
+            stats.hits += 1
+        else:
+            stats.misses += 1
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, STATS_FILE), "w") as f:
+                json.dump(stats.__dict__, f)
+        except OSError as e:
+            logger.debug(f"Could not save result cache stats: {e}")
+        return stats
+
+    def _key(
+        self,
+        module_path: str,
+        module_hash: str,
+        dependencies: list[str],
+        params: dict[str, ParamValue] | None,
+    ) -> str:
+        key_source: dict[str, Any] = {
+            "module": os.path.abspath(module_path),
+            "hash": module_hash,
+            "dependencies": {path: _file_hash(path) for path in dependencies},
+            "versions": _package_versions(),
+        }
+        # Left out without parameters, so entries stored before them still hit
+        if params:
+            key_source["params"] = params
+        return hashlib.sha256(
+            json.dumps(key_source, sort_keys=True).encode()
+        ).hexdigest()
+
+    def _manifest_path(self, module_path: str) -> str:
+        name = hashlib.sha256(os.path.abspath(module_path).encode()).hexdigest()
+        return os.path.join(self._manifest_dir, name + ".json")
+
+    def _read_manifest(self, module_path: str) -> list[str] | None:
+        try:
+            with open(self._manifest_path(module_path)) as f:
+                return list(json.load(f)["dependencies"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_manifest(self, module_path: str, dependencies: list[str]):
+        os.makedirs(self._manifest_dir, exist_ok=True)
+        with open(self._manifest_path(module_path), "w") as f:
+            json.dump({"dependencies": dependencies}, f)
+
+
+class ResultCacheEntry:
+    """The frames of a load in progress, stored once the load completes."""
+
+    def __init__(
+        self,
+        cache: ResultCache,
+        module_path: str,
+        module_hash: str,
+        pending: PendingEntry,
+        params: dict[str, ParamValue] | None = None,
+    ):
+        self._cache = cache
+        self._module_path = module_path
+        self._module_hash = module_hash
+        self._pending = pending
+        self._params = params
+
+    def add(self, frame: Any):
+        if self._pending.closed:
+            return
+        try:
+            self._pending.add(frame)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Not caching result of {self._module_path}: {e}")
+            self.abort()
+
+    def commit(self):
+        if self._pending.closed:
+            return
+        try:
+            self._cache.commit(
+                self._module_path, self._module_hash, self._pending, self._params
+            )
+        except OSError as e:
+            logger.warning(f"Could not cache result of {self._module_path}: {e}")
+            self.abort()
+
+    def abort(self):
+        self._pending.abort()
@@ -17,6 +17,9 @@ from wx.glcanvas import (
 )
 
 from scadview.load_status import LoadStatus
+from scadview.mesh_delta import MeshDelta
+from scadview.mesh_loader_process import PRIMARY_MODEL_ID
+from scadview.mesh_transport import MeshChunk
 from scadview.render.gl_widget_adapter import GlWidgetAdapter
 
 logger = logging.getLogger(__name__)
@@ -177,8 +180,43 @@ class GlWidget(GLCanvas):
             return
         self.Refresh(False)
 
-    def load_mesh(self, mesh: Trimesh | list[Trimesh], name: str):
-        self._gl_widget_adapter.load_mesh(mesh, name)
+    def load_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        name: str,
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        self._gl_widget_adapter.load_mesh(mesh, name, model_id)
+        self.Refresh(False)
+
+    def update_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        deltas: list[MeshDelta],
+        name: str,
+        model_id: int = PRIMARY_MODEL_ID,
+    ):
+        self._gl_widget_adapter.update_mesh(mesh, deltas, name, model_id)
+        self.Refresh(False)
+
+    def add_mesh_chunk(
+        self, chunk: MeshChunk, name: str, model_id: int = PRIMARY_MODEL_ID
+    ):
+        self._gl_widget_adapter.add_mesh_chunk(chunk, name, model_id)
+        self.Refresh(False)
+
+    def finish_streamed_mesh(
+        self, mesh: Trimesh, name: str, model_id: int = PRIMARY_MODEL_ID
+    ):
+        self._gl_widget_adapter.finish_streamed_mesh(mesh, name, model_id)
+        self.Refresh(False)
+
+    def set_model_visible(self, model_id: int, visible: bool):
+        self._gl_widget_adapter.set_model_visible(model_id, visible)
+        self.Refresh(False)
+
+    def remove_model(self, model_id: int):
+        self._gl_widget_adapter.remove_model(model_id)
         self.Refresh(False)
 
     def frame(self):
@@ -1,11 +1,17 @@
 import logging
 import os
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
 
 import wx
+from trimesh import Trimesh
 
 from scadview.controller import Controller, export_formats
 from scadview.load_status import LoadStatus
-from scadview.mesh_loader_process import LoadResult
+from scadview.mesh_loader_process import PRIMARY_MODEL_ID, LoadResult
+from scadview.mesh_transport import MeshChunk
+from scadview.parameters import Parameter, ParamValue
 from scadview.render.gl_widget_adapter import GlWidgetAdapter
 from scadview.ui.wx.action import (
     Action,
@@ -15,14 +21,25 @@ from scadview.ui.wx.action import (
 )
 from scadview.ui.wx.font_dialog import FontDialog
 from scadview.ui.wx.gl_widget import create_graphics_widget
+from scadview.ui.wx.parameter_panel import ParameterPanel
 
 logger = logging.getLogger(__name__)
 
-LOAD_CHECK_INTERVAL_MS = 10
 INITIAL_FRAME_SIZE = (900, 600)
 BORDER_SIZE = 6
 
 
+@dataclass
+class _ShownLoad:
+    """The result of a model's loads last shown"""
+
+    load_number: int = 0
+    sequence_number: int = 0
+    parts_progress: tuple[int, int] | None = None
+    # Until a whole mesh of the load is shown, framing follows the parts shown
+    whole_mesh_framed: bool = False
+
+
 class MainFrame(wx.Frame):
     def __init__(
         self,
@@ -51,6 +68,12 @@ class MainFrame(wx.Frame):
         self._add_file_buttons()
         self._add_view_buttons()
 
+        self._parameter_panel = ParameterPanel(
+            self._button_panel, self._on_param_change
+        )
+        self._parameter_panel.Hide()
+        self._panel_sizer.Add(self._parameter_panel, 0, wx.ALL | wx.EXPAND, BORDER_SIZE)
+
         self._panel_sizer.AddStretchSpacer()
 
         root = wx.BoxSizer(wx.HORIZONTAL)
@@ -65,24 +88,47 @@ class MainFrame(wx.Frame):
         menu_bar = wx.MenuBar()
         menu_bar.Append(self._create_file_menu(), "File")
         menu_bar.Append(self._create_view_menu(), "View")
+        self._models_menu = wx.Menu()
+        self._models_menu_ids: list[int] = []
+        menu_bar.Append(self._models_menu, "Models")
         menu_bar.Append(self._create_help_menu(), "Help")
         self.SetMenuBar(menu_bar)
 
-        self._loader_timer = wx.Timer(self)
-        self.Bind(wx.EVT_TIMER, self.on_load_timer, self._loader_timer)
-        self._loader_load_completed = False
-        self._loader_last_load_number = 0
-        self._loader_last_sequence_number = 0
+        self._controller.on_load_result_pending.subscribe(self._on_load_result_pending)
+        self._controller.start_listening()
+        self._shown_loads: dict[int, _ShownLoad] = {}
+        self._scene_model_ids: set[int] = {PRIMARY_MODEL_ID}
         self._controller.on_load_status_change.subscribe(self._indicate_load_status)
+        self._controller.on_watched_files_change.subscribe(
+            self._on_watched_files_change
+        )
+        self._controller.on_models_change.subscribe(self._on_models_change)
+        self._controller.on_module_path_set.subscribe(self._on_primary_path_set)
+        self._controller.on_parameters_change.subscribe(self._on_parameters_change)
 
     def _create_file_actions(self):
         self._load_action = Action("Load .py...", self.on_load, "L")
+        self._add_model_action = Action("Add Model...", self.on_add_model)
         self._reload_action = EnableableAction[str](
             Action("Reload", self.on_reload, accelerator="R"),
             initial_value="",
             on_value_change=self._controller.on_module_path_set,
             enable_func=self._on_module_path_set,
         )
+        self._reload_uncached_action = EnableableAction[str](
+            Action(
+                "Reload (skip cache)", self.on_reload_uncached, accelerator="Shift+R"
+            ),
+            initial_value="",
+            on_value_change=self._controller.on_module_path_set,
+            enable_func=self._on_module_path_set,
+        )
+        self._auto_reload_action = CheckableAction[bool](
+            Action("Auto Reload", self.on_toggle_auto_reload, checkable=True),
+            self._controller.watching,
+            lambda x: x,
+            self._controller.on_watching_change,
+        )
         self._export_action = EnableableAction[LoadStatus](
             Action("Export...", self.export, accelerator="E"),
             initial_value=LoadStatus.NONE,
@@ -146,6 +192,8 @@ class MainFrame(wx.Frame):
         self._panel_sizer.Add(load_btn, 0, wx.ALL | wx.EXPAND, BORDER_SIZE)
         self._reload_btn = self._reload_action.button(self._button_panel)
         self._panel_sizer.Add(self._reload_btn, 0, wx.ALL | wx.EXPAND, BORDER_SIZE)
+        auto_reload_chk = self._auto_reload_action.checkbox(self._button_panel)
+        self._panel_sizer.Add(auto_reload_chk, 0, wx.ALL | wx.EXPAND, BORDER_SIZE)
         self._export_btn = self._export_action.button(self._button_panel)
         self._panel_sizer.Add(self._export_btn, 0, wx.ALL | wx.EXPAND, BORDER_SIZE)
 
@@ -183,7 +231,10 @@ class MainFrame(wx.Frame):
     def _create_file_menu(self) -> wx.Menu:
         file_menu = wx.Menu()
         self._load_action.menu_item(file_menu)
+        self._add_model_action.menu_item(file_menu)
         self._reload_menu_item = self._reload_action.menu_item(file_menu)
+        self._reload_uncached_action.menu_item(file_menu)
+        self._auto_reload_action.menu_item(file_menu)
         self._export_menu_item = self._export_action.menu_item(file_menu)
 
         return file_menu
@@ -227,42 +278,203 @@ class MainFrame(wx.Frame):
                 self._controller.load_mesh(
                     dlg.GetPath()  # pyright: ignore[reportUnknownArgumentType]
                 )
-                self._loader_timer.Start(LOAD_CHECK_INTERVAL_MS)
                 self._load_progress_gauge.Pulse()
 
+    def on_add_model(self, _: wx.Event):
+        with wx.FileDialog(
+            self,
+            "Add a python file to the scene",
+            wildcard="Python files (*.py)|*.py",
+            style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST,
+        ) as dlg:  # pyright: ignore[reportUnknownVariableType]
+            if dlg.ShowModal() == wx.ID_OK:
+                self._controller.add_model(
+                    dlg.GetPath()  # pyright: ignore[reportUnknownArgumentType]
+                )
+
+    def _on_primary_path_set(self, _path: str):
+        self._update_models_menu()
+
+    def _on_models_change(self):
+        models = self._controller.models
+        model_ids = {model.model_id for model in models}
+        for model_id in self._scene_model_ids - model_ids:
+            self._gl_widget.remove_model(model_id)
+            self._shown_loads.pop(model_id, None)
+        self._scene_model_ids = model_ids
+        for model in models:
+            self._gl_widget.set_model_visible(model.model_id, model.visible)
+        self._update_models_menu()
+
+    def _on_parameters_change(self, parameters: list[Parameter]):
+        self._parameter_panel.show(
+            parameters, self._controller.model(PRIMARY_MODEL_ID).param_values
+        )
+
+    def _on_param_change(self, name: str, value: ParamValue):
+        self._controller.set_param(name, value)
+        self._load_progress_gauge.Pulse()
+
+    def _update_models_menu(self):
+        for item_id in self._models_menu_ids:
+            self.Unbind(wx.EVT_MENU, id=item_id)
+        self._models_menu_ids = []
+        for item in list(self._models_menu.GetMenuItems()):
+            self._models_menu.DestroyItem(item)
+        for model in self._controller.models:
+            if model.module_path == "":
+                continue
+            submenu = wx.Menu()
+            self._append_model_item(
+                submenu,
+                "Reload",
+                partial(self._controller.reload_mesh, model_id=model.model_id),
+            )
+            self._append_model_item(
+                submenu,
+                "Show",
+                partial(
+                    self._controller.set_model_visible,
+                    model.model_id,
+                    not model.visible,
+                ),
+                checked=model.visible,
+            )
+            if model.model_id != PRIMARY_MODEL_ID:
+                self._append_model_item(
+                    submenu,
+                    "Remove",
+                    partial(self._controller.remove_model, model.model_id),
+                )
+            self._models_menu.AppendSubMenu(submenu, model.name)
+
+    def _append_model_item(
+        self,
+        menu: wx.Menu,
+        label: str,
+        callback: Callable[[], None],
+        checked: bool | None = None,
+    ):
+        if checked is None:
+            item = menu.Append(wx.ID_ANY, label)
+        else:
+            item = menu.AppendCheckItem(wx.ID_ANY, label)
+            item.Check(checked)
+        self.Bind(wx.EVT_MENU, lambda _: callback(), item)
+        self._models_menu_ids.append(item.GetId())
+
     def on_reload(self, _: wx.Event):
         self._controller.reload_mesh()
-        self._loader_timer.Start(LOAD_CHECK_INTERVAL_MS)
         self._load_progress_gauge.Pulse()
 
-    def on_load_timer(self, _: wx.Event):
-        load_result = self._controller.check_load_queue()
+    def on_reload_uncached(self, _: wx.Event):
+        self._controller.reload_mesh(use_cache=False)
+        self._load_progress_gauge.Pulse()
+
+    def on_toggle_auto_reload(self, _: wx.Event):
+        self._controller.watching = not self._controller.watching
+
+    def _on_watched_files_change(self, model_id: int):
+        # Called from the watcher thread
+        wx.CallAfter(self._auto_reload, model_id)
+
+    def _auto_reload(self, model_id: int):
+        if self._controller.auto_reload(model_id) and model_id == PRIMARY_MODEL_ID:
+            self._load_progress_gauge.Pulse()
+
+    def _on_load_result_pending(self, model_id: int):
+        # Called from the controller's listener thread, once until it is taken
+        wx.CallAfter(self._take_load_result, model_id)
+
+    def _take_load_result(self, model_id: int):
+        if not self:  # The frame was destroyed after the result was sent
+            return
+        load_result = self._controller.take_load_result(model_id)
+        if load_result is not None:
+            self.on_load_result(load_result)
+
+    def on_load_result(self, load_result: LoadResult):
+        if not self:  # The frame was destroyed after the result was sent
+            return
+        self._controller.handle_load_result(load_result)
+        if load_result.job_id is not None:  # Passed to on_job_result
+            return
         mesh = load_result.mesh
-        if load_result.complete:
-            self._loader_timer.Stop()
-            self._load_progress_gauge.SetValue(self._load_progress_gauge.GetRange())
+        if load_result.model_id == PRIMARY_MODEL_ID:
+            self._show_progress(load_result)
         if load_result.error:
             logger.error(load_result.error)
-        if self._has_mesh_changed(load_result):
+        if load_result.chunk is not None:
+            self._show_chunk(load_result.chunk, load_result)
+            return
+        shown = self._shown_loads.setdefault(load_result.model_id, _ShownLoad())
+        if self._has_mesh_changed(load_result, shown):
             logger.debug("on_load_time: mesh has changed")
+            first_in_load = self._is_first_in_load(load_result, shown)
             if mesh is not None:  # Keep the type checker happy
-                self._gl_widget.load_mesh(mesh, "loaded mesh")
-            if self._is_first_in_load(load_result):
+                self._show_mesh(mesh, load_result, first_in_load)
+            if first_in_load or not shown.whole_mesh_framed:
                 self._gl_widget.frame()
-            self._loader_last_load_number = load_result.load_number
-            self._loader_last_sequence_number = load_result.sequence_number
+                shown.whole_mesh_framed = load_result.parts_progress is None
+            shown.load_number = load_result.load_number
+            shown.sequence_number = load_result.sequence_number
+            shown.parts_progress = load_result.parts_progress
+
+    def _show_progress(self, load_result: LoadResult):
+        if load_result.complete:
+            self._load_progress_gauge.SetValue(self._load_progress_gauge.GetRange())
+        elif load_result.parts_progress is not None:
+            converted, parts = load_result.parts_progress
+            self._load_progress_gauge.SetValue(
+                self._load_progress_gauge.GetRange() * converted // parts
+            )
+        elif load_result.chunk is not None:
+            chunk = load_result.chunk
+            self._load_progress_gauge.SetValue(
+                self._load_progress_gauge.GetRange()
+                * (chunk.first_face + len(chunk.triangles))
+                // chunk.face_count
+            )
+
+    def _show_chunk(self, chunk: MeshChunk, load_result: LoadResult):
+        model_id = load_result.model_id
+        self._gl_widget.add_mesh_chunk(chunk, "loaded mesh", model_id)
+        shown = self._shown_loads.setdefault(model_id, _ShownLoad())
+        # The first chunk has the bounds of the whole mesh; framed as a whole mesh is
+        if chunk.first_face == 0 and (
+            self._is_first_in_load(load_result, shown) or not shown.whole_mesh_framed
+        ):
+            self._gl_widget.frame()
+
+    def _show_mesh(
+        self,
+        mesh: Trimesh | list[Trimesh],
+        load_result: LoadResult,
+        first_in_load: bool,
+    ):
+        if load_result.streamed and isinstance(mesh, Trimesh):
+            self._gl_widget.finish_streamed_mesh(
+                mesh, "loaded mesh", load_result.model_id
+            )
+        elif load_result.deltas and not first_in_load:
+            self._gl_widget.update_mesh(
+                mesh, load_result.deltas, "loaded mesh", load_result.model_id
+            )
+        else:
+            self._gl_widget.load_mesh(mesh, "loaded mesh", load_result.model_id)
 
     def _indicate_load_status(self, status: LoadStatus):
         self._gl_widget.indicate_load_status(status)
 
-    def _has_mesh_changed(self, load_result: LoadResult) -> bool:
+    def _has_mesh_changed(self, load_result: LoadResult, shown: _ShownLoad) -> bool:
         return load_result.mesh is not None and (
-            self._loader_last_load_number != load_result.load_number
-            or self._loader_last_sequence_number != load_result.sequence_number
+            shown.load_number != load_result.load_number
+            or shown.sequence_number != load_result.sequence_number
+            or shown.parts_progress != load_result.parts_progress
         )
 
-    def _is_first_in_load(self, load_result: LoadResult) -> bool:
-        return self._loader_last_load_number != load_result.load_number
+    def _is_first_in_load(self, load_result: LoadResult, shown: _ShownLoad) -> bool:
+        return shown.load_number != load_result.load_number
 
     def export(self, _: wx.Event):
         default_export_path = self._controller.default_export_path()
@@ -298,6 +510,6 @@ class MainFrame(wx.Frame):
         self._gl_widget.toggle_gnomon()
 
     def on_close(self, _: wx.Event):
-        self._loader_timer.Stop()
+        self._controller.stop_listening()
         del self._controller
         self.Destroy()
@@ -0,0 +1,75 @@
+from typing import Callable
+
+import wx
+
+from scadview.parameters import Parameter, ParamValue
+
+# Spin controls need bounds; parameters have none
+PARAM_LIMIT = 10**9
+BORDER_SIZE = 6
+
+
+class ParameterPanel(wx.Panel):
+    """
+    A control for each keyword parameter of create_mesh,
+    calling on_change with the name and new value of a parameter edited.
+    """
+
+    def __init__(self, parent: wx.Window, on_change: Callable[[str, ParamValue], None]):
+        super().__init__(parent)
+        self._on_change = on_change
+        self._sizer = wx.FlexGridSizer(cols=2, vgap=BORDER_SIZE, hgap=BORDER_SIZE)
+        self._sizer.AddGrowableCol(1)
+        self.SetSizer(self._sizer)
+
+    def show(self, parameters: list[Parameter], values: dict[str, ParamValue]):
+        """Replace the controls with those for the parameters, set to the values."""
+        self._sizer.Clear(delete_windows=True)
+        for parameter in parameters:
+            value = values.get(parameter.name, parameter.default)
+            self._sizer.Add(
+                wx.StaticText(self, label=parameter.name), 0, wx.ALIGN_CENTER_VERTICAL
+            )
+            self._sizer.Add(self._control(parameter, value), 1, wx.EXPAND)
+        self.Show(bool(parameters))
+        self.GetParent().Layout()
+
+    def _control(self, parameter: Parameter, value: ParamValue) -> wx.Window:
+        name = parameter.name
+        if isinstance(value, bool):
+            check_box = wx.CheckBox(self)
+            check_box.SetValue(value)
+            check_box.Bind(
+                wx.EVT_CHECKBOX,
+                lambda _: self._on_change(name, check_box.GetValue()),
+            )
+            return check_box
+        if isinstance(value, int):
+            spin = wx.SpinCtrl(self, min=-PARAM_LIMIT, max=PARAM_LIMIT, initial=value)
+            spin.Bind(wx.EVT_SPINCTRL, lambda _: self._on_change(name, spin.GetValue()))
+            return spin
+        if isinstance(value, float):
+            spin_double = wx.SpinCtrlDouble(
+                self,
+                min=-PARAM_LIMIT,
+                max=PARAM_LIMIT,
+                initial=value,
+                inc=parameter.step,
+            )
+            spin_double.SetDigits(_digits(parameter.step))
+            spin_double.Bind(
+                wx.EVT_SPINCTRLDOUBLE,
+                lambda _: self._on_change(name, spin_double.GetValue()),
+            )
+            return spin_double
+        text = wx.TextCtrl(self, value=value, style=wx.TE_PROCESS_ENTER)
+        text.Bind(wx.EVT_TEXT_ENTER, lambda _: self._on_change(name, text.GetValue()))
+        return text
+
+
+def _digits(step: float) -> int:
+    # Enough to show a value a step from another
+    digits = 0
+    while step * 10**digits < 1 and digits < 12:
+        digits += 1
+    return digits
@@ -0,0 +1,122 @@
+import numpy as np
+import numpy.testing as npt
+import pytest
+from manifold3d import Manifold
+from trimesh.creation import box
+
+from scadview.api import cache as cache_module
+from scadview.api.cache import cache, clear_cache, load_from_disk, take_new_keys
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "default_cache_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(cache_module, "_disk_store", None)
+    clear_cache()
+    take_new_keys()
+    yield tmp_path
+    clear_cache()
+
+
+def test_repeated_call_is_memoized():
+    calls = []
+
+    @cache
+    def make(size):
+        calls.append(size)
+        return box([size, size, size])
+
+    first = make(2.0)
+    second = make(2.0)
+    make(3.0)
+    assert calls == [2.0, 3.0]
+    npt.assert_array_equal(first.vertices, second.vertices)
+
+
+def test_result_is_a_copy():
+    @cache
+    def make():
+        return box()
+
+    make().apply_translation([10, 0, 0])
+    npt.assert_array_equal(make().vertices, box().vertices)
+
+
+def test_disk_tier_survives_memory_clear():
+    calls = []
+
+    @cache
+    def make(n):
+        calls.append(n)
+        return Manifold.cube((n, n, n))
+
+    make(2)
+    clear_cache(disk=False)
+    assert make(2).volume() == pytest.approx(8)
+    assert calls == [2]
+
+
+def test_memory_only():
+    calls = []
+
+    @cache(disk=False)
+    def make(n):
+        calls.append(n)
+        return np.arange(n)
+
+    make(3)
+    clear_cache(disk=False)
+    npt.assert_array_equal(make(3), np.arange(3))
+    assert calls == [3, 3]
+    assert take_new_keys() == []
+
+
+def test_source_change_invalidates(monkeypatch):
+    calls = []
+
+    def make():
+        calls.append(1)
+        return (1, 2)
+
+    cache(make)()
+    cache(make)()
+    # Stands in for a reload where the function was edited
+    monkeypatch.setattr(cache_module, "_source_hash", lambda _: "edited")
+    cache(make)()
+    assert len(calls) == 2
+
+
+def test_array_and_mesh_arguments():
+    calls = []
+
+    @cache
+    def offset(mesh, amount):
+        calls.append(1)
+        return mesh.copy().apply_translation(amount)
+
+    offset(box(), np.array([1.0, 0, 0]))
+    offset(box(), np.array([1.0, 0, 0]))
+    offset(box(), np.array([2.0, 0, 0]))
+    assert len(calls) == 2
+
+
+def test_unhashable_argument():
+    @cache
+    def make(_):
+        return None
+
+    with pytest.raises(TypeError):
+        make(object())
+
+
+def test_load_from_disk_fills_memory():
+    @cache
+    def make():
+        return box()
+
+    make()
+    keys = take_new_keys()
+    assert len(keys) == 1
+    clear_cache(disk=False)
+    load_from_disk(keys)
+    assert keys[0] in cache_module._memory
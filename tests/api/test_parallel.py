@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+
+import numpy.testing as npt
+import pytest
+from manifold3d import Manifold
+from trimesh.creation import icosphere
+
+from scadview.api import parallel
+from scadview.api.parallel import parallel_map, recover_pool, start_pool
+from scadview.module_loader import ModuleLoader
+
+pytestmark = pytest.mark.skipif(
+    not parallel.PARALLEL_SUPPORTED, reason="parallel_map only forks on Linux"
+)
+
+
+@pytest.fixture(autouse=True)
+def pool():
+    start_pool(2)
+    yield parallel._pool  # pyright: ignore[reportPrivateUsage] - to check the pool
+    start_pool(0)
+
+
+def _square(x):
+    return x * x
+
+
+def _sphere(subdivisions):
+    return icosphere(subdivisions=subdivisions)
+
+
+def _cube(size):
+    return Manifold.cube([size, size, size])
+
+
+def _pid(_):
+    return os.getpid()
+
+
+def _fail_on_two(x):
+    if x == 2:
+        raise ValueError("two")
+    return x
+
+
+def test_results_are_in_order():
+    assert parallel_map(_square, range(10)) == [x * x for x in range(10)]
+
+
+def test_meshes_come_back():
+    # Large enough to go through shared memory
+    spheres = parallel_map(_sphere, [1, 5])
+    for subdivisions, sphere in zip([1, 5], spheres):
+        npt.assert_array_equal(sphere.faces, icosphere(subdivisions=subdivisions).faces)
+    cubes = parallel_map(_cube, [1.0, 2.0])
+    assert [cube.volume() for cube in cubes] == pytest.approx([1.0, 8.0])
+
+
+def test_workers_are_kept_between_calls():
+    first = set(parallel_map(_pid, range(8)))
+    assert os.getpid() not in first
+    assert set(parallel_map(_pid, range(8))) <= first | {os.getpid()}
+
+
+def _exit_on_two(x):
+    if x == 2:
+        os._exit(1)
+    return x
+
+
+def test_error_is_raised_and_pool_still_works():
+    with pytest.raises(ValueError, match="two"):
+        parallel_map(_fail_on_two, [1, 2, 3, 4])
+    assert parallel_map(_square, [1, 2, 3]) == [1, 4, 9]
+
+
+def test_lambda_runs_in_this_process():
+    assert parallel_map(lambda _: os.getpid(), [1, 2]) == [os.getpid()] * 2
+
+
+def test_changed_user_module_is_reloaded_in_workers(tmp_path):
+    path = tmp_path / "parallel_part.py"
+    path.write_text("def part(x):\n    return x + 1\n")
+    part = ModuleLoader("part").load_function(str(path))
+    assert parallel_map(part, [1, 2]) == [2, 3]
+    path.write_text("def part(x):\n    return x + 100\n")
+    part = ModuleLoader("part").load_function(str(path))
+    assert parallel_map(part, [1, 2]) == [101, 102]
+
+
+def test_unchanged_user_module_is_not_reloaded_in_workers(tmp_path):
+    imports = tmp_path / "imports.txt"
+    path = tmp_path / "counted_part.py"
+    path.write_text(
+        f"with open({str(imports)!r}, 'a') as f:\n"
+        "    f.write('x')\n"
+        "def part(x):\n"
+        "    return x + 1\n"
+    )
+    part = ModuleLoader("part").load_function(str(path))
+    assert parallel_map(part, [1, 2, 3, 4]) == [2, 3, 4, 5]
+    count = len(imports.read_text())
+    assert parallel_map(part, [1, 2, 3, 4]) == [2, 3, 4, 5]
+    assert len(imports.read_text()) == count
+
+
+def _map_pids(results):
+    results.put((os.getpid(), parallel_map(_pid, range(4))))
+
+
+def test_processes_forked_later_use_the_pool():
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    child = context.Process(target=_map_pids, args=(results,))
+    child.start()
+    child_pid, pids = results.get(timeout=10.0)
+    child.join()
+    assert child_pid not in pids
+    assert os.getpid() not in pids
+
+
+def _hold_pool(pool, held, release):
+    with pool._lock:  # pyright: ignore[reportPrivateUsage] - as a map in this process would
+        held.set()
+        release.wait(10.0)
+
+
+def test_map_in_another_process_makes_the_pool_busy(pool):
+    context = multiprocessing.get_context("fork")
+    held, release = context.Event(), context.Event()
+    child = context.Process(target=_hold_pool, args=(pool, held, release))
+    child.start()
+    assert held.wait(10.0)
+    assert parallel_map(_pid, range(2)) == [os.getpid()] * 2
+    release.set()
+    child.join()
+    assert os.getpid() not in parallel_map(_pid, range(2))
+
+
+def test_pool_used_by_a_killed_process_is_restarted(pool):
+    pids = set(parallel_map(_pid, range(4)))
+    # As left by a process killed mid-map
+    pool._lock.acquire()  # pyright: ignore[reportPrivateUsage] - to fake a killed map
+    pool._user_pid.value = 2**22 + 1  # pyright: ignore[reportPrivateUsage] - no such process
+    assert pool.stale
+    # Busy, so called here
+    assert parallel_map(_pid, range(2)) == [os.getpid()] * 2
+    recover_pool()
+    assert not pool.stale
+    assert not set(parallel_map(_pid, range(4))) & pids
+
+
+def test_reply_left_by_a_killed_map_is_discarded(pool):
+    # As a map killed before it read its reply would leave it
+    target = parallel._target(_square)  # pyright: ignore[reportPrivateUsage] - to send a task
+    pool._conns[0].send(((0, 0), target, 0, 5))  # pyright: ignore[reportPrivateUsage] - to send a task
+    assert parallel_map(_square, [1, 2, 3]) == [1, 4, 9]
+    assert parallel_map(_square, [1, 2, 3]) == [1, 4, 9]
+
+
+def test_worker_that_died_is_replaced(pool):
+    pids = set(parallel_map(_pid, range(4)))
+    with pytest.raises(ChildProcessError):
+        parallel_map(_exit_on_two, [1, 2, 3, 4])
+    assert not pool.stale
+    assert not set(parallel_map(_pid, range(4))) & pids
+
+
+def _map_exit_on_two(errors):
+    try:
+        parallel_map(_exit_on_two, [1, 2, 3, 4])
+        errors.put(None)
+    except ChildProcessError as e:
+        errors.put(type(e).__name__)
+
+
+def test_worker_that_died_in_another_process_is_replaced_by_the_owner(pool):
+    pids = set(parallel_map(_pid, range(4)))
+    context = multiprocessing.get_context("fork")
+    errors = context.Queue()
+    child = context.Process(target=_map_exit_on_two, args=(errors,))
+    child.start()
+    assert errors.get(timeout=10.0) == "ChildProcessError"
+    child.join()
+    assert pool.stale
+    # Not sent to the dead worker, so called here
+    assert parallel_map(_pid, range(2)) == [os.getpid()] * 2
+    recover_pool()
+    assert not pool.stale
+    assert not set(parallel_map(_pid, range(4))) & pids
+
+
+def test_no_pool_is_started_where_forking_is_unsupported(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_SUPPORTED", False)
+    start_pool(2)
+    assert parallel._pool is None  # pyright: ignore[reportPrivateUsage] - to check the pool
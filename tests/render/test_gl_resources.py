@@ -0,0 +1,59 @@
+from unittest import mock
+
+from scadview.render.gl_resources import BufferPool, GLResources
+
+
+def test_pool_reuses_a_buffer_of_the_same_size():
+    ctx = mock.MagicMock()
+    pool = BufferPool(ctx)
+    buffer = pool.buffer(b"1234")
+    pool.give_back(buffer, 4)
+    assert pool.held_bytes == 4
+
+    reused = pool.buffer(b"5678")
+    assert reused is buffer
+    ctx.buffer.assert_called_once_with(data=b"1234")
+    buffer.orphan.assert_called_once()
+    buffer.write.assert_called_once_with(b"5678")
+    assert pool.held_bytes == 0
+
+
+def test_pool_allocates_a_buffer_of_another_size():
+    ctx = mock.MagicMock()
+    pool = BufferPool(ctx)
+    pool.give_back(pool.buffer(b"1234"), 4)
+    pool.buffer(reserve=8)
+    ctx.buffer.assert_called_with(reserve=8)
+    assert pool.held_bytes == 4
+
+
+def test_pool_releases_the_oldest_beyond_its_size():
+    pool = BufferPool(mock.MagicMock(), max_bytes=10)
+    oldest, newest = mock.MagicMock(), mock.MagicMock()
+    pool.give_back(oldest, 6)
+    pool.give_back(newest, 6)
+    oldest.release.assert_called_once()
+    newest.release.assert_not_called()
+    assert pool.held_bytes == 6
+
+
+def test_resources_release_everything_they_made():
+    ctx = mock.MagicMock()
+    pool = BufferPool(ctx)
+    gl = GLResources(ctx, pool)
+    buffer = gl.buffer(b"1234")
+    vao = gl.vertex_array(mock.MagicMock(), [(buffer, "1f4", "in_x")])
+    texture = gl.texture((1, 1), 4)
+    gl.release()
+
+    vao.release.assert_called_once()
+    texture.release.assert_called_once()
+    buffer.release.assert_not_called()
+    assert pool.held_bytes == 4
+
+
+def test_resources_without_a_pool_release_their_buffers():
+    gl = GLResources(mock.MagicMock())
+    buffer = gl.buffer(b"1234")
+    gl.release()
+    buffer.release.assert_called_once()
@@ -0,0 +1,39 @@
+import numpy as np
+import numpy.testing as npt
+from trimesh.creation import box, icosphere
+from trimesh.transformations import random_rotation_matrix, reflection_matrix
+
+from scadview.render.instancing import find_instances
+
+
+def _moved(mesh, seed):
+    transform = random_rotation_matrix(np.random.default_rng(seed).random(3))
+    transform[:3, 3] = (seed, -seed, 2 * seed)
+    return mesh.copy().apply_transform(transform), transform
+
+
+def test_find_instances_groups_moved_copies():
+    stud = icosphere(subdivisions=2)
+    copies = [_moved(stud, seed) for seed in range(5)]
+    meshes = [copy for copy, _ in copies]
+    meshes.insert(2, box())
+
+    found = find_instances(meshes)
+
+    assert [instances.meshes for instances in found] == [[0, 1, 3, 4, 5], [2]]
+    first = copies[0][1]
+    for transform, (_, expected) in zip(found[0].transforms, copies):
+        npt.assert_allclose(transform @ first, expected, atol=1e-9)
+    npt.assert_allclose(found[1].transforms[0], np.eye(4))
+
+
+def test_find_instances_keeps_different_shapes_apart():
+    # The same faces, but not moved copies of each other
+    boxes = [box((1, 1, 1)), box((1, 1, 2)), box((1, 1, 1)).apply_scale(1.001)]
+    assert len(find_instances(boxes)) == 3
+
+
+def test_find_instances_does_not_match_mirror_images():
+    stud = box((1, 2, 3))
+    mirrored = stud.copy().apply_transform(reflection_matrix([0, 0, 0], [1, 0, 0]))
+    assert len(find_instances([stud, mirrored])) == 2
@@ -1,7 +1,13 @@
 from unittest.mock import MagicMock, Mock, patch
 
 import numpy as np
+import numpy.testing as npt
+import pytest
+from trimesh.creation import box, icosphere
 
+from scadview.api.colors import set_mesh_color
+from scadview.mesh_loader_process import PRIMARY_MODEL_ID
+from scadview.mesh_transport import mesh_chunks
 from scadview.render.camera import Camera
 from scadview.render.renderer import Renderer
 
@@ -44,3 +50,92 @@ def test_frame():
         renderer = Renderer(context, camera, window_size)
         renderer.frame(np.array([[1, 0, 0]]))
         camera.frame.assert_called()
+
+
+def _renderer() -> Renderer:
+    context = MagicMock()
+    with patch("scadview.render.shader_program.isinstance") as mock_isinstance:
+        mock_isinstance.return_value = True
+        return Renderer(context, Mock(), (320, 200))
+
+
+def test_models_are_framed_together():
+    renderer = _renderer()
+    renderer.load_mesh(box([1.0, 1.0, 1.0]), "primary")
+    moved = box([1.0, 1.0, 1.0])
+    moved.apply_translation([10.0, 0.0, 0.0])
+    renderer.load_mesh(moved, "second", model_id=1)
+    renderer.frame()
+    points = renderer._camera.frame.call_args.args[0]
+    assert points[:, 0].min() == -0.5
+    assert points[:, 0].max() == 10.5
+
+
+def test_hidden_model_is_not_framed_or_rendered():
+    renderer = _renderer()
+    renderer.load_mesh(box([1.0, 1.0, 1.0]), "primary")
+    big = box([100.0, 100.0, 100.0])
+    renderer.load_mesh(big, "second", model_id=1)
+    renderer.set_model_visible(1, False)
+    assert renderer.scale == box([1.0, 1.0, 1.0]).scale
+    assert renderer._renderees[1] not in renderer._scene_renderees()
+    renderer.set_model_visible(1, True)
+    assert renderer.scale == big.scale
+
+
+def test_removed_model_leaves_the_others():
+    renderer = _renderer()
+    renderer.load_mesh(box([1.0, 1.0, 1.0]), "primary")
+    renderer.load_mesh(box([100.0, 100.0, 100.0]), "second", model_id=1)
+    renderer.remove_model(1)
+    assert list(renderer._renderees) == [PRIMARY_MODEL_ID]
+    assert renderer.scale == box([1.0, 1.0, 1.0]).scale
+
+
+def test_opaque_models_are_drawn_before_transparent_ones():
+    renderer = _renderer()
+    transparent = box([1.0, 1.0, 1.0])
+    set_mesh_color(transparent, [1.0, 0.0, 0.0], 0.5)
+    renderer.load_mesh(transparent, "primary")
+    renderer.load_mesh(box([1.0, 1.0, 1.0]), "second", model_id=1)
+    assert renderer._scene_renderees() == [
+        renderer._renderees[1],
+        renderer._renderees[PRIMARY_MODEL_ID],
+    ]
+
+
+def test_streamed_mesh_is_framed_by_its_first_chunk_and_kept():
+    renderer = _renderer()
+    mesh = icosphere(radius=5.0)
+    chunks = list(mesh_chunks(mesh, 500))
+    renderer.add_mesh_chunk(chunks[0], "streamed")
+    assert renderer.scale == pytest.approx(mesh.scale)
+    renderer.frame()
+    points = renderer._camera.frame.call_args.args[0]
+    npt.assert_allclose(points.min(axis=0), mesh.bounds[0], rtol=1e-6)
+    for chunk in chunks[1:]:
+        renderer.add_mesh_chunk(chunk, "streamed")
+    streamed = renderer._renderees[PRIMARY_MODEL_ID]
+    renderer.finish_streamed_mesh(mesh, "streamed")
+    assert renderer._renderees[PRIMARY_MODEL_ID] is streamed
+
+
+def test_replaced_renderees_are_released_when_next_rendered():
+    renderer = _renderer()
+    renderer.load_mesh(box([1.0, 1.0, 1.0]), "primary")
+    first = renderer._renderees[PRIMARY_MODEL_ID]
+    renderer.load_mesh(box([1.0, 1.0, 1.0]), "primary")
+    renderer.load_mesh(box([2.0, 2.0, 2.0]), "second", model_id=1)
+    second = renderer._renderees[1]
+    renderer.remove_model(1)
+    with (
+        patch("scadview.render.shader_program.isinstance", return_value=True),
+        patch.object(type(first), "render"),
+        patch.object(type(first), "release", autospec=True) as release,
+    ):
+        renderer.render(True, True, False, False)
+        released = [c.args[0] for c in release.call_args_list]
+    assert any(r is first for r in released)
+    assert any(r is second for r in released)
+    assert not any(r is renderer._renderees[PRIMARY_MODEL_ID] for r in released)
+    assert renderer._to_release == []
@@ -1,15 +1,24 @@
 from unittest import mock
 
+import moderngl
 import numpy as np
+import numpy.testing as npt
 import pytest
 from pyrr import matrix44
 from trimesh.creation import box, icosphere
 
+from scadview.mesh_delta import MeshDelta
+from scadview.mesh_transport import mesh_chunks
+from scadview.observable import Observable
+from scadview.render.gl_resources import BufferPool, GLResources
 from scadview.render.shader_program import ShaderVar
 from scadview.render.trimesh_renderee import (
     DEFAULT_COLOR,
+    MESH_COLORS_LOCATION,
     AlphaRenderee,
+    StreamedMeshRenderee,
     TrimeshAlphaRenderee,
+    TrimeshListOpaqueRenderee,
     TrimeshListRenderee,
     TrimeshNullRenderee,
     TrimeshOpaqueRenderee,
@@ -18,6 +27,7 @@ from scadview.render.trimesh_renderee import (
     convert_color_to_uint8,
     create_colors_array,
     create_colors_array_from_mesh,
+    create_indexed_vao,
     create_trimesh_renderee,
     get_metadata_color,
     sort_triangles,
@@ -324,6 +334,210 @@ def test_trimesh_opaque_renderee_render_calls_ctx_methods(dummy_trimesh):
     renderee._vao.render.assert_called_once()
 
 
+def _rendered_renderee(mesh):
+    ctx = mock.MagicMock()
+    program = mock.MagicMock()
+    model = mock.MagicMock(spec=moderngl.Uniform)
+    model.read.return_value = np.eye(4, dtype="f4").tobytes()
+    program.__getitem__.return_value = model
+    renderee = TrimeshOpaqueRenderee(ctx, program, mesh)
+    renderee.render()
+    return renderee, ctx, model
+
+
+def test_trimesh_opaque_renderee_moves_mesh_in_shader():
+    renderee, ctx, model = _rendered_renderee(box())
+    transform = np.eye(4)
+    transform[:3, 3] = (1, 2, 3)
+    renderee.apply_deltas(box().apply_transform(transform), [MeshDelta(transform)])
+    ctx.buffer.reset_mock()
+    renderee.render()
+
+    ctx.buffer.assert_not_called()
+    written, restored = [c.args[0] for c in model.write.call_args_list]
+    # Written column by column
+    npt.assert_allclose(np.frombuffer(written, dtype="f4").reshape(4, 4).T, transform)
+    assert restored == np.eye(4, dtype="f4").tobytes()
+    npt.assert_allclose(renderee.points.min(axis=0), (0.5, 1.5, 2.5))
+
+
+def test_trimesh_opaque_renderee_reuploads_new_vertices():
+    renderee, ctx, model = _rendered_renderee(box())
+    scaled = box(extents=(2, 2, 2))
+    renderee.apply_deltas(scaled, [MeshDelta(vertices=scaled.vertices)])
+    ctx.buffer.reset_mock()
+    renderee.render()
+
+    ctx.buffer.assert_called()
+    model.write.assert_not_called()
+
+
+def _indexed_renderee(mesh):
+    ctx = mock.MagicMock()
+    program = mock.MagicMock()
+    uniform = mock.MagicMock(spec=moderngl.Uniform)
+    program.__getitem__.return_value = uniform
+    buffers = {}
+
+    def buffer(data):
+        buffers[len(buffers)] = mock.MagicMock(size=len(data), data=data)
+        return buffers[len(buffers) - 1]
+
+    ctx.buffer.side_effect = buffer
+    renderee = TrimeshOpaqueRenderee(ctx, program, mesh, indexed=True)
+    renderee.render()
+    return renderee, ctx, uniform, buffers
+
+
+def test_indexed_trimesh_opaque_renderee_uploads_vertices_and_faces():
+    mesh = box()
+    mesh.metadata["scadview"] = {"color": [0.2, 0.4, 0.6, 1.0]}
+    renderee, ctx, color, buffers = _indexed_renderee(mesh)
+
+    vertices, indices, _, _ = buffers.values()
+    npt.assert_allclose(
+        np.frombuffer(vertices.data, dtype="f4").reshape(-1, 3), mesh.vertices
+    )
+    npt.assert_array_equal(
+        np.frombuffer(indices.data, dtype="u2").reshape(-1, 3), mesh.faces
+    )
+    assert ctx.vertex_array.call_args.kwargs["index_element_size"] == 2
+    texture = ctx.texture.return_value
+    written = np.frombuffer(texture.write.call_args.args[0], dtype="u1")
+    npt.assert_array_equal(written, convert_color_to_uint8([0.2, 0.4, 0.6, 1.0]))
+    texture.use.assert_called_with(location=MESH_COLORS_LOCATION)
+    assert color.value == MESH_COLORS_LOCATION
+
+    mesh.metadata["scadview"] = {"color": [1.0, 0.0, 0.0, 1.0]}
+    renderee.apply_deltas(mesh, [MeshDelta(metadata=mesh.metadata)])
+    renderee.render()
+    assert len(buffers) == 4
+    written = np.frombuffer(texture.write.call_args.args[0], dtype="u1")
+    npt.assert_array_equal(written, [255, 0, 0, 255])
+
+
+def test_indexed_trimesh_opaque_renderee_uses_long_indices_for_large_meshes():
+    _, ctx, _, _ = _indexed_renderee(icosphere(subdivisions=7))
+    assert ctx.vertex_array.call_args.kwargs["index_element_size"] == 4
+
+
+def test_indexed_trimesh_opaque_renderee_rewrites_new_vertices():
+    renderee, _, _, buffers = _indexed_renderee(box())
+    transform = np.eye(4)
+    transform[:3, 3] = (1, 2, 3)
+    renderee.apply_deltas(box(), [MeshDelta(transform)])
+    scaled = box(extents=(2, 2, 2))
+    renderee.apply_deltas(scaled, [MeshDelta(vertices=scaled.vertices)])
+    renderee.render()
+
+    assert len(buffers) == 4
+    assert renderee._transform is None
+    written = buffers[0].write.call_args.args[0]
+    npt.assert_allclose(
+        np.frombuffer(written, dtype="f4").reshape(-1, 3), scaled.vertices
+    )
+
+    sphere = icosphere()
+    renderee.apply_deltas(sphere, [MeshDelta(vertices=sphere.vertices)])
+    renderee.render()
+    assert len(buffers) == 8
+
+
+def test_create_trimesh_renderee_draws_opaque_meshes_indexed():
+    program = mock.MagicMock()
+    indexed_program = mock.MagicMock()
+    opaque = box()
+    alpha = box()
+    alpha.metadata["scadview"] = {"color": [0.0, 0.0, 0.0, 0.5]}
+    eye = np.eye(4)
+
+    renderee = create_trimesh_renderee(
+        mock.MagicMock(), program, opaque, eye, eye, indexed_program=indexed_program
+    )
+    assert isinstance(renderee, TrimeshOpaqueRenderee)
+    assert renderee._program is indexed_program
+    assert renderee._indexed
+    renderee = create_trimesh_renderee(
+        mock.MagicMock(), program, alpha, eye, eye, indexed_program=indexed_program
+    )
+    assert isinstance(renderee, TrimeshAlphaRenderee)
+
+
+def test_create_indexed_vao_packs_meshes():
+    ctx = mock.MagicMock()
+    buffers = []
+    ctx.buffer.side_effect = lambda data: buffers.append(data)
+    meshes = [box(), icosphere(subdivisions=1)]
+    create_indexed_vao(GLResources(ctx), mock.MagicMock(), meshes)
+
+    vertices, indices, ids, transform = buffers
+    npt.assert_allclose(
+        np.frombuffer(vertices, dtype="f4").reshape(-1, 3),
+        np.concatenate([m.vertices for m in meshes]),
+    )
+    npt.assert_array_equal(
+        np.frombuffer(indices, dtype="u2").reshape(-1, 3),
+        np.concatenate([meshes[0].faces, meshes[1].faces + 8]),
+    )
+    npt.assert_array_equal(np.frombuffer(ids, dtype="u2"), [0] * 8 + [1] * 42)
+    npt.assert_array_equal(np.frombuffer(transform, dtype="f4"), np.eye(4).flat)
+
+
+def test_indexed_trimesh_list_opaque_renderee_draws_once():
+    ctx = mock.MagicMock()
+    program = mock.MagicMock()
+    program.__getitem__.return_value = mock.MagicMock(spec=moderngl.Uniform)
+    # Different shapes, so none is drawn as an instance of another
+    meshes = [box((1, 1, 1 + i)).apply_translation((i, 0, 0)) for i in range(100)]
+    meshes[1].metadata["scadview"] = {"color": [1.0, 0.0, 0.0, 1.0]}
+    renderee = TrimeshListOpaqueRenderee(ctx, program, meshes, indexed=True)
+    renderee.set_mesh_visible(2, False)
+    renderee.render()
+
+    ctx.vertex_array.assert_called_once()
+    ctx.vertex_array.return_value.render.assert_called_once_with()
+    texture = ctx.texture.return_value
+    colors = np.frombuffer(texture.write.call_args.args[0], dtype="u1").reshape(-1, 4)
+    npt.assert_array_equal(colors[0], convert_color_to_uint8(DEFAULT_COLOR))
+    npt.assert_array_equal(colors[1], [255, 0, 0, 255])
+    assert colors[2, 3] == 0
+    renderee.set_mesh_visible(2, True)
+    colors = np.frombuffer(texture.write.call_args.args[0], dtype="u1").reshape(-1, 4)
+    assert colors[2, 3] == 255
+    npt.assert_allclose(renderee.points.max(axis=0), (99.5, 0.5, 50.0))
+
+
+def test_indexed_trimesh_list_opaque_renderee_draws_copies_as_instances():
+    ctx = mock.MagicMock()
+    program = mock.MagicMock()
+    program.__getitem__.return_value = mock.MagicMock(spec=moderngl.Uniform)
+    buffers = []
+    ctx.buffer.side_effect = lambda data: buffers.append(data)
+    stud = icosphere(subdivisions=1)
+    transforms = [matrix44.create_from_z_rotation(i).T for i in range(10)]
+    for transform in transforms:
+        transform[:3, 3] = (1, 2, 3)
+    meshes = [stud.copy().apply_transform(t) for t in transforms]
+    meshes.insert(3, box())
+    renderee = TrimeshListOpaqueRenderee(ctx, program, meshes, indexed=True)
+    renderee.render()
+
+    assert ctx.vertex_array.call_count == 2
+    vao = ctx.vertex_array.return_value
+    vao.render.assert_any_call(instances=10)
+    vao.render.assert_any_call()
+    vertices, _, ids, instance_transforms = buffers[:4]
+    assert len(np.frombuffer(vertices, dtype="f4")) == len(stud.vertices) * 3
+    npt.assert_array_equal(
+        np.frombuffer(ids, dtype="u2"), [0, 1, 2, 4, 5, 6, 7, 8, 9, 10]
+    )
+    written = np.frombuffer(instance_transforms, dtype="f4").reshape(-1, 4, 4)
+    # Column by column; taking the first copy to each of the others
+    npt.assert_allclose(
+        written.transpose(0, 2, 1) @ transforms[0], transforms, atol=1e-5
+    )
+
+
 def test_trimesh_opaque_renderee_points_property(dummy_trimesh):
     ctx = mock.MagicMock()
     program = mock.MagicMock()
@@ -428,6 +642,58 @@ def test_alpha_renderee_sort_buffers_calls_ctx_buffer(
     assert alpha_renderee._ctx.buffer.call_count >= 3  # vertices, normals, color_buff
 
 
+def test_alpha_renderee_sort_reuses_pooled_buffers():
+    ctx = mock.MagicMock()
+    mesh = box()
+    renderee = AlphaRenderee(
+        ctx,
+        mock.MagicMock(),
+        mesh.triangles,
+        mesh.triangles_cross,
+        create_colors_array_from_mesh(mesh),
+        np.eye(4, dtype="f4"),
+        np.eye(4, dtype="f4"),
+        pool=BufferPool(ctx),
+    )
+    renderee._sort_buffers()
+    allocated = ctx.buffer.call_count
+    renderee.view_matrix = np.eye(4, dtype="f4") * 2
+    renderee._sort_buffers()
+
+    assert ctx.buffer.call_count == allocated
+    ctx.buffer.return_value.orphan.assert_called()
+    ctx.vertex_array.return_value.release.assert_called_once()
+
+
+def test_alpha_renderee_release_stops_updates(alpha_renderee):
+    updates = Observable()
+    alpha_renderee.subscribe_to_updates(updates)
+    alpha_renderee.release()
+    updates.notify(ShaderVar.MODEL_MATRIX, np.eye(4, dtype="f4") * 2)
+    npt.assert_array_equal(alpha_renderee.model_matrix, np.eye(4))
+
+
+def test_opaque_renderee_uploads_new_faces_into_its_buffers():
+    ctx = mock.MagicMock()
+    program = mock.MagicMock()
+    program.__getitem__.return_value = mock.MagicMock(spec=moderngl.Uniform)
+    mesh = box()
+    renderee = TrimeshOpaqueRenderee(
+        ctx, program, mesh, indexed=True, pool=BufferPool(ctx)
+    )
+    renderee.render()
+    allocated = ctx.buffer.call_count
+    flipped = mesh.copy()
+    flipped.faces = flipped.faces[:, ::-1]
+    renderee.apply_deltas(flipped, [MeshDelta(faces=flipped.faces)])
+    renderee.render()
+
+    assert ctx.buffer.call_count == allocated
+    ctx.texture.return_value.release.assert_called_once()
+    renderee.release()
+    assert ctx.vertex_array.return_value.release.call_count == 2
+
+
 @mock.patch("scadview.render.trimesh_renderee.create_vao")
 def test_alpha_renderee_render_calls_sort_and_vao_render(
     create_vao,
@@ -482,3 +748,65 @@ def test_trimesh_list_renderee_render_calls_both(dummy_trimesh_list_renderee):
     dummy_trimesh_list_renderee.render()
     dummy_trimesh_list_renderee._opaques_renderee.render.assert_called_once()
     dummy_trimesh_list_renderee._alphas_renderee.render.assert_called_once()
+
+
+def test_streamed_mesh_renderee_draws_the_chunks_that_arrived():
+    ctx = mock.MagicMock()
+    buffers = [mock.MagicMock() for _ in range(4)]
+    ctx.buffer.side_effect = buffers
+    mesh = icosphere()
+    chunks = list(mesh_chunks(mesh, 500))
+    renderee = StreamedMeshRenderee(ctx, mock.MagicMock(), chunks[0])
+    npt.assert_allclose(renderee.points.min(axis=0), mesh.bounds[0], rtol=1e-6)
+    renderee.render()
+    vao = ctx.vertex_array.return_value
+    vao.render.assert_called_with(vertices=500 * 3)
+    # Buffers are made once, for the whole mesh
+    assert ctx.buffer.call_args_list[0].kwargs["reserve"] == len(mesh.faces) * 36
+
+    renderee.add_chunk(chunks[1])
+    renderee.add_chunk(chunks[2])
+    assert renderee.holds(mesh)
+    renderee.render()
+    assert ctx.buffer.call_count == 4
+    vao.render.assert_called_with(vertices=len(mesh.faces) * 3)
+    vertices = buffers[0]
+    assert [c.kwargs["offset"] for c in vertices.write.call_args_list] == [
+        0,
+        500 * 36,
+        1000 * 36,
+    ]
+    written = np.concatenate(
+        [np.frombuffer(c.args[0], dtype="f4") for c in vertices.write.call_args_list]
+    )
+    npt.assert_allclose(written.reshape(-1, 3, 3), mesh.triangles, rtol=1e-6)
+
+
+def test_streamed_mesh_renderee_needs_chunks_in_order():
+    chunks = list(mesh_chunks(icosphere(), 500))
+    with pytest.raises(ValueError):
+        StreamedMeshRenderee(mock.MagicMock(), mock.MagicMock(), chunks[1])
+    renderee = StreamedMeshRenderee(mock.MagicMock(), mock.MagicMock(), chunks[0])
+    with pytest.raises(ValueError):
+        renderee.add_chunk(chunks[2])
+
+
+def test_compact_streamed_mesh_renderee_has_positions_only():
+    ctx = mock.MagicMock()
+    program = mock.MagicMock()
+    program.__getitem__.return_value = mock.MagicMock(spec=moderngl.Uniform)
+    mesh = icosphere()
+    chunks = list(mesh_chunks(mesh, 500))
+    renderee = StreamedMeshRenderee(ctx, program, chunks[0], compact=True)
+    for chunk in chunks[1:]:
+        renderee.add_chunk(chunk)
+    renderee.render()
+
+    # The rest are the id and transform, one value each for the whole draw
+    ctx.buffer.assert_any_call(reserve=len(mesh.faces) * 36)
+    assert ctx.buffer.call_count == 3
+    assert ctx.buffer.return_value.write.call_count == len(chunks)
+    ctx.texture.return_value.use.assert_called_with(location=MESH_COLORS_LOCATION)
+    ctx.vertex_array.return_value.render.assert_called_with(
+        vertices=len(mesh.faces) * 3
+    )
@@ -0,0 +1,59 @@
+import pytest
+import trimesh
+
+from scadview.batch import (
+    output_paths,
+    param_grid,
+    parse_param,
+    run_batch,
+)
+
+
+def test_parse_param_list():
+    assert parse_param("radius=10,12.5,wide") == ("radius", [10, 12.5, "wide"])
+
+
+def test_parse_param_range_includes_stop():
+    assert parse_param("height=20:40:5") == ("height", [20, 25, 30, 35, 40])
+    assert parse_param("t=0:0.3:0.1") == ("t", [0.0, 0.1, 0.2, 0.3])
+
+
+@pytest.mark.parametrize("spec", ["radius", "1x=2", "h=1:2", "h=1:2:0", "h=a:2:1"])
+def test_parse_param_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_param(spec)
+
+
+def test_param_grid_and_outputs():
+    grid = param_grid([("a", [1, 2]), ("b", ["x"])])
+    assert grid == [{"a": 1, "b": "x"}, {"a": 2, "b": "x"}]
+    assert output_paths("out/{a}_{b}.stl", grid) == ["out/1_x.stl", "out/2_x.stl"]
+    with pytest.raises(ValueError):
+        output_paths("out/{b}.stl", grid)
+    with pytest.raises(ValueError):
+        output_paths("out/{c}.stl", grid)
+
+
+def test_run_batch_exports_each_job(tmp_path):
+    module_path = tmp_path / "sized.py"
+    module_path.write_text(
+        """
+from manifold3d import Manifold
+
+def create_mesh(size=1):
+    if size < 0:
+        raise ValueError("negative size")
+    yield Manifold.cube((size, size, size))
+"""
+    )
+    grid = param_grid([("size", [1, 2, -1])])
+    outputs = output_paths(str(tmp_path / "out" / "{size}.stl"), grid)
+    results = run_batch(str(module_path), grid, outputs, jobs=2)
+
+    assert [r.params for r in results] == grid
+    for result, size in zip(results[:2], (1, 2)):
+        assert result.error is None
+        assert result.seconds > 0
+        assert result.peak_rss_bytes is None or result.peak_rss_bytes > 0
+        assert tuple(trimesh.load(result.output).extents) == (size, size, size)
+    assert results[2].error == "ValueError: negative size"
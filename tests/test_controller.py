@@ -0,0 +1,241 @@
+import queue
+from threading import Event, Thread
+from time import monotonic, sleep
+from unittest.mock import Mock, patch
+
+import pytest
+from trimesh.creation import box
+
+from scadview.controller import (
+    LOAD_RESULT_WAIT_TIMEOUT,
+    Controller,
+    PendingResult,
+    _listen_for_results,
+)
+from scadview.load_status import LoadStatus
+from scadview.mesh_loader_process import (
+    PRIMARY_MODEL_ID,
+    LoaderOptions,
+    LoadMeshCommand,
+    LoadResult,
+    MpLoadQueue,
+    PrefetchJob,
+    SubmitJobCommand,
+)
+from scadview.parameters import Parameter
+
+
+def test_listener_delivers_results_until_stopped():
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    pending = PendingResult()
+    told = queue.Queue()
+    stopped = Event()
+    listener = Thread(
+        target=_listen_for_results,
+        args=(load_queue, pending, lambda: told.put(True), stopped),
+    )
+    listener.start()
+    try:
+        load_queue.put(LoadResult(1, 1, None, None, complete=True))
+        assert told.get(timeout=1.0)
+        result = pending.take()
+        assert result is not None
+        assert result.load_number == 1
+        assert result.complete
+    finally:
+        stopped.set()
+        listener.join(timeout=LOAD_RESULT_WAIT_TIMEOUT * 4)
+    assert not listener.is_alive()
+
+
+def test_newer_result_replaces_pending_one():
+    pending = PendingResult()
+    assert pending.put(LoadResult(1, 1, box(), None), Event())
+    assert not pending.put(LoadResult(1, 2, box(), None), Event())
+    result = pending.take()
+    assert result is not None
+    assert result.sequence_number == 2
+    assert pending.take() is None
+
+
+def test_pending_result_that_must_arrive_is_waited_for():
+    pending = PendingResult()
+    pending.put(LoadResult(0, 0, None, None, job_id=1), Event())
+    put = Thread(target=pending.put, args=(LoadResult(1, 1, box(), None), Event()))
+    put.start()
+    put.join(timeout=LOAD_RESULT_WAIT_TIMEOUT)
+    assert put.is_alive()
+    first = pending.take()
+    assert first is not None and first.job_id == 1
+    put.join(timeout=LOAD_RESULT_WAIT_TIMEOUT * 4)
+    second = pending.take()
+    assert second is not None and second.load_number == 1
+
+
+@pytest.fixture
+def loader_process():
+    with patch("scadview.controller.MeshLoaderProcess") as loader_process:
+        yield loader_process
+
+
+@pytest.fixture
+def controller(loader_process: Mock):
+    controller = Controller()
+    yield controller
+    controller.stop_listening()
+
+
+def _check_until_result(controller: Controller, model_id: int) -> LoadResult:
+    # The feeder thread of the queue may not have delivered it yet
+    deadline = monotonic() + 1.0
+    result = controller.check_load_queue(model_id)
+    while result.load_number == 0 and monotonic() < deadline:
+        sleep(0.01)
+        result = controller.check_load_queue(model_id)
+    return result
+
+
+def test_each_model_has_its_own_loader(controller: Controller, loader_process: Mock):
+    controller.load_mesh("primary.py")
+    model_id = controller.add_model("second.py")
+    assert model_id != PRIMARY_MODEL_ID
+    assert loader_process.call_count == 2
+    assert [m.module_path for m in controller.models] == ["primary.py", "second.py"]
+    assert controller.module_path == "primary.py"
+
+
+def test_results_go_to_their_model(controller: Controller):
+    controller.load_mesh("primary.py")
+    model_id = controller.add_model("second.py")
+    controller.model(model_id).load_queue.put(LoadResult(1, 1, box(), None, True))
+    result = _check_until_result(controller, model_id)
+    assert result.model_id == model_id
+    assert controller.model(model_id).current_mesh is result.mesh
+    assert result.mesh is not None
+    assert controller.model(model_id).load_status == LoadStatus.COMPLETE
+    assert controller.current_mesh is None
+    assert controller.load_status == LoadStatus.START
+
+
+def test_other_models_do_not_change_the_primary_status(controller: Controller):
+    statuses: list[LoadStatus] = []
+    controller.on_load_status_change.subscribe(statuses.append)
+    model_id = controller.add_model("second.py")
+    controller.handle_load_result(
+        LoadResult(1, 1, box(), None, True, model_id=model_id)
+    )
+    assert statuses == []
+
+
+def test_reload_only_reloads_its_model(controller: Controller):
+    controller.load_mesh("primary.py")
+    model_id = controller.add_model("second.py")
+    controller.reload_mesh(model_id=model_id)
+    assert controller.model(model_id).load_count == 2
+    assert controller.model(PRIMARY_MODEL_ID).load_count == 1
+
+
+def test_auto_reload_restarts_a_load_that_has_not_sent_a_result(
+    controller: Controller,
+):
+    controller.load_mesh("primary.py")
+    model = controller.model(PRIMARY_MODEL_ID)
+    command_queue = model._command_queue  # pyright: ignore[reportPrivateUsage] - to see the commands
+    assert isinstance(command_queue.get(timeout=1.0), LoadMeshCommand)
+    assert controller.auto_reload()
+    assert isinstance(command_queue.get(timeout=1.0), LoadMeshCommand)
+    assert model.load_count == 2
+
+
+def test_removed_model_is_shut_down_and_its_results_dropped(controller: Controller):
+    changes: list[None] = []
+
+    def on_models_change():
+        changes.append(None)
+
+    controller.on_models_change.subscribe(on_models_change)
+    model_id = controller.add_model("second.py")
+    removed = controller.model(model_id)
+    controller.remove_model(model_id)
+    assert removed not in controller.models
+    removed._loader_process.terminate.assert_called_once()  # pyright: ignore[reportAttributeAccessIssue, reportPrivateUsage] - a mock
+    result = controller.handle_load_result(
+        LoadResult(1, 1, box(), None, True, model_id=model_id)
+    )
+    assert result.mesh is None
+    assert len(changes) == 2
+    with pytest.raises(ValueError):
+        controller.remove_model(PRIMARY_MODEL_ID)
+
+
+def test_set_model_visible(controller: Controller):
+    changes: list[None] = []
+
+    def on_models_change():
+        changes.append(None)
+
+    model_id = controller.add_model("second.py")
+    controller.on_models_change.subscribe(on_models_change)
+    controller.set_model_visible(model_id, False)
+    controller.set_model_visible(model_id, False)
+    assert not controller.model(model_id).visible
+    assert len(changes) == 1
+
+
+def _commands(controller: Controller, model_id: int = PRIMARY_MODEL_ID) -> list:
+    command_queue = controller.model(model_id)._command_queue  # pyright: ignore[reportPrivateUsage] - to see what was sent
+    commands = []
+    while True:
+        try:
+            commands.append(command_queue.get(timeout=0.2))
+        except queue.Empty:
+            return commands
+
+
+def test_set_param_reloads_then_prefetches_neighbours(loader_process: Mock, tmp_path):
+    # Prefetches only fill the result cache
+    controller = Controller(LoaderOptions(use_result_cache=True, fork_loads=True))
+    module_path = tmp_path / "sized.py"
+    module_path.write_text("def create_mesh(sides=6, label='a'):\n    pass\n")
+    changes = []
+
+    def on_parameters_change(parameters):
+        changes.append(parameters)
+
+    controller.on_parameters_change.subscribe(on_parameters_change)
+    controller.load_mesh(str(module_path))
+    assert changes == [[Parameter("sides", 6), Parameter("label", "a")]]
+    _commands(controller)
+
+    controller.set_param("sides", 7)
+    load, *prefetches = _commands(controller)
+    assert isinstance(load, LoadMeshCommand)
+    assert load.params == {"sides": 7}
+    assert all(isinstance(c, SubmitJobCommand) for c in prefetches)
+    jobs = [c.job for c in prefetches]
+    assert all(isinstance(job, PrefetchJob) for job in jobs)
+    # The default is left out of the parameters
+    assert [job.params for job in jobs] == [
+        {"sides": 8},
+        {},
+        {"sides": 9},
+        {"sides": 5},
+    ]
+    assert controller.model(PRIMARY_MODEL_ID).param_values == {"sides": 7, "label": "a"}
+    assert len(changes) == 1
+
+    with pytest.raises(ValueError):
+        controller.set_param("missing", 1)
+
+
+def test_set_param_does_not_prefetch_where_loads_are_not_forked(
+    loader_process: Mock, tmp_path
+):
+    controller = Controller(LoaderOptions(use_result_cache=True, fork_loads=False))
+    module_path = tmp_path / "sized.py"
+    module_path.write_text("def create_mesh(sides=6):\n    pass\n")
+    controller.load_mesh(str(module_path))
+    _commands(controller)
+    controller.set_param("sides", 7)
+    (load,) = _commands(controller)
+    assert isinstance(load, LoadMeshCommand)
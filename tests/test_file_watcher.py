@@ -0,0 +1,95 @@
+import os
+import time
+from threading import Event
+
+import pytest
+
+from scadview.file_watcher import FileWatcher
+
+POLL = 0.01
+DEBOUNCE = 0.05
+
+
+@pytest.fixture
+def changed():
+    return Event()
+
+
+@pytest.fixture
+def watcher(changed):
+    w = FileWatcher(changed.set, poll_interval=POLL, debounce=DEBOUNCE)
+    yield w
+    w.stop()
+
+
+def _touch(path, content):
+    path.write_text(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_content_change_is_reported(tmp_path, watcher, changed):
+    path = tmp_path / "model.py"
+    path.write_text("a")
+    watcher.watch([str(path)])
+    watcher.start()
+    _touch(path, "b")
+    assert changed.wait(1.0)
+
+
+def test_save_without_change_is_ignored(tmp_path, watcher, changed):
+    path = tmp_path / "model.py"
+    path.write_text("a")
+    watcher.watch([str(path)])
+    watcher.start()
+    _touch(path, "a")
+    assert not changed.wait(DEBOUNCE * 5)
+
+
+def test_burst_of_writes_is_coalesced(tmp_path):
+    calls = []
+    path = tmp_path / "model.py"
+    path.write_text("0")
+    watcher = FileWatcher(lambda: calls.append(1), poll_interval=POLL, debounce=0.2)
+    watcher.watch([str(path)])
+    watcher.start()
+    try:
+        for i in range(5):
+            _touch(path, str(i + 1))
+            time.sleep(POLL * 3)
+        time.sleep(0.5)
+    finally:
+        watcher.stop()
+    assert calls == [1]
+
+
+def test_mark_current_resets_baseline(tmp_path, watcher, changed):
+    path = tmp_path / "model.py"
+    path.write_text("a")
+    watcher.watch([str(path)])
+    path.write_text("b")
+    watcher.mark_current()
+    watcher.start()
+    assert not changed.wait(DEBOUNCE * 5)
+
+
+def test_watch_keeps_baseline_of_watched_files(tmp_path, watcher, changed):
+    path = tmp_path / "model.py"
+    helper = tmp_path / "helper.py"
+    path.write_text("a")
+    helper.write_text("h")
+    watcher.watch([str(path)])
+    _touch(path, "b")  # Changed while loading
+    watcher.watch([str(path), str(helper)])
+    watcher.start()
+    _touch(helper, "h")  # Wake the watcher up
+    assert changed.wait(1.0)
+
+
+def test_deleted_file_is_reported(tmp_path, watcher, changed):
+    path = tmp_path / "helper.py"
+    path.write_text("a")
+    watcher.watch([str(path)])
+    watcher.start()
+    os.remove(path)
+    assert changed.wait(1.0)
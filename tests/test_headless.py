@@ -0,0 +1,138 @@
+import argparse
+import subprocess
+import sys
+from time import perf_counter
+
+import pytest
+import trimesh
+
+from scadview.headless import (
+    ExportJob,
+    PhaseTimer,
+    export_module,
+    headless_options,
+    load_final_mesh,
+    run_export,
+)
+from scadview.job_scheduler import CancelToken, JobCancelled, run_in_child
+from scadview.mesh_loader_process import LoadWorker
+
+
+@pytest.fixture(autouse=True)
+def reset_load_number():
+    yield
+    LoadWorker.load_number = 0
+
+
+def _write_module(tmp_path, source):
+    path = tmp_path / "part.py"
+    path.write_text(source)
+    return str(path)
+
+
+MANIFOLD_FRAMES = """
+from manifold3d import Manifold
+
+def create_mesh():
+    for size in (1, 2, 3):
+        yield Manifold.cube((size, size, size))
+"""
+
+
+def test_load_final_mesh_converts_last_frame(tmp_path):
+    module_path = _write_module(tmp_path, MANIFOLD_FRAMES)
+    mesh = load_final_mesh(module_path, headless_options(use_result_cache=False))
+    assert isinstance(mesh, trimesh.Trimesh)
+    assert tuple(mesh.extents) == (3, 3, 3)
+
+
+def test_export_module_writes_file_and_times_phases(tmp_path):
+    module_path = _write_module(tmp_path, MANIFOLD_FRAMES)
+    output_path = tmp_path / "out" / "part.stl"
+    timer = PhaseTimer()
+    export_module(
+        module_path,
+        str(output_path),
+        options=headless_options(use_result_cache=False),
+        timer=timer,
+    )
+    assert tuple(trimesh.load(output_path).extents) == (3, 3, 3)
+    assert list(timer.times) == ["load", "export"]
+    assert timer.summary().splitlines()[-1].startswith("total")
+
+
+def test_failed_load_writes_no_file(tmp_path):
+    module_path = _write_module(
+        tmp_path, "def create_mesh():\n    raise RuntimeError('broken')\n"
+    )
+    output_path = tmp_path / "part.stl"
+    with pytest.raises(RuntimeError, match="broken"):
+        export_module(
+            module_path,
+            str(output_path),
+            options=headless_options(use_result_cache=False),
+        )
+    assert not output_path.exists()
+
+
+def test_run_export_rejects_unknown_format(tmp_path, capsys):
+    args = argparse.Namespace(
+        module="part.py", output=str(tmp_path / "part.xyz1"), format=None, cache=False
+    )
+    assert run_export(args, perf_counter()) == 2
+    assert "Unsupported format 'xyz1'" in capsys.readouterr().err
+
+
+def test_export_command_imports_no_ui(tmp_path):
+    module_path = _write_module(tmp_path, MANIFOLD_FRAMES)
+    output_path = tmp_path / "part.3mf"
+    check = f"""
+import sys
+sys.argv = ["scadview", "export", {module_path!r}, "-o", {str(output_path)!r},
+            "--format", "stl"]
+from scadview.__main__ import main
+try:
+    main()
+except SystemExit as e:
+    assert e.code == 0, e.code
+assert "wx" not in sys.modules and "moderngl" not in sys.modules
+"""
+    completed = subprocess.run(
+        [sys.executable, "-c", check],
+        check=False,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr
+    assert "load" in completed.stdout
+    assert output_path.exists()
+
+
+def test_export_job_writes_file(tmp_path):
+    module_path = _write_module(tmp_path, MANIFOLD_FRAMES)
+    output_path = str(tmp_path / "part.stl")
+    assert ExportJob(module_path, output_path).run(CancelToken()) == output_path
+    assert tuple(trimesh.load(output_path).extents) == (3, 3, 3)
+    assert LoadWorker.load_number == 0
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="Jobs are only forked on Linux")
+def test_forked_export_job_leaves_its_imports_in_the_child(tmp_path):
+    module_path = tmp_path / "forked_part.py"
+    module_path.write_text(MANIFOLD_FRAMES)
+    output_path = str(tmp_path / "part.stl")
+    job = ExportJob(str(module_path), output_path)
+    assert run_in_child(job, CancelToken()) == output_path
+    assert tuple(trimesh.load(output_path).extents) == (3, 3, 3)
+    assert "forked_part" not in sys.modules
+
+
+def test_cancelled_export_job_writes_no_file(tmp_path):
+    module_path = _write_module(tmp_path, MANIFOLD_FRAMES)
+    output_path = tmp_path / "part.stl"
+    token = CancelToken()
+    token.cancel()
+    with pytest.raises(JobCancelled):
+        ExportJob(module_path, str(output_path)).run(token)
+    assert not output_path.exists()
@@ -0,0 +1,234 @@
+import os
+import queue
+import sys
+import time
+from threading import Event, Timer
+
+import pytest
+
+from scadview.job_scheduler import (
+    CancelToken,
+    Job,
+    JobCancelled,
+    JobPriority,
+    JobScheduler,
+    run_in_child,
+)
+
+fork_only = pytest.mark.skipif(
+    sys.platform != "linux", reason="Jobs are only forked on Linux"
+)
+
+WAIT = 2.0
+
+
+class RecordJob(Job):
+    def __init__(self, name: str, ran: list[str], priority=JobPriority.BACKGROUND):
+        self.name = name
+        self.ran = ran
+        self.priority = priority
+
+    def run(self, token: CancelToken) -> str:
+        self.ran.append(self.name)
+        return self.name
+
+
+class BlockingJob(Job):
+    def __init__(self):
+        self.started = Event()
+        self.release = Event()
+
+    def run(self, token: CancelToken) -> str:
+        self.started.set()
+        while not self.release.wait(0.01):
+            token.raise_if_cancelled()
+        return "released"
+
+
+class FailingJob(Job):
+    def run(self, token: CancelToken):
+        raise RuntimeError("job failed")
+
+
+class PidJob(Job):
+    def run(self, token: CancelToken) -> int:
+        # Seen only by the process that runs it
+        os.environ["SCADVIEW_JOB_RAN"] = "1"
+        return os.getpid()
+
+
+class SleepingJob(Job):
+    def run(self, token: CancelToken):
+        # Never checks the token
+        time.sleep(60)
+
+
+class ExitingJob(Job):
+    def run(self, token: CancelToken):
+        os._exit(3)
+
+
+@pytest.fixture
+def done():
+    return queue.Queue()
+
+
+def _on_done(done: queue.Queue):
+    return lambda job_id, output, error: done.put((job_id, output, error))
+
+
+def test_job_result_is_reported(done):
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(7, RecordJob("a", []))
+    assert done.get(timeout=WAIT) == (7, "a", None)
+    scheduler.shut_down()
+
+
+def test_interactive_jobs_run_before_background_ones(done):
+    blocker = BlockingJob()
+    ran: list[str] = []
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(1, blocker)
+    assert blocker.started.wait(WAIT)
+    scheduler.submit(2, RecordJob("background", ran))
+    scheduler.submit(3, RecordJob("interactive", ran, JobPriority.INTERACTIVE))
+    blocker.release.set()
+    for _ in range(3):
+        done.get(timeout=WAIT)
+    assert ran == ["interactive", "background"]
+    scheduler.shut_down()
+
+
+def test_jobs_run_concurrently_on_several_workers(done):
+    blockers = [BlockingJob(), BlockingJob()]
+    scheduler = JobScheduler(2, _on_done(done))
+    for job_id, blocker in enumerate(blockers):
+        scheduler.submit(job_id, blocker)
+    assert all(blocker.started.wait(WAIT) for blocker in blockers)
+    for blocker in blockers:
+        blocker.release.set()
+    scheduler.shut_down()
+
+
+def test_cancel_pending_job(done):
+    blocker = BlockingJob()
+    ran: list[str] = []
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(1, blocker)
+    assert blocker.started.wait(WAIT)
+    scheduler.submit(2, RecordJob("cancelled", ran))
+    assert scheduler.cancel(2)
+    job_id, output, error = done.get(timeout=WAIT)
+    assert job_id == 2 and output is None
+    assert isinstance(error, JobCancelled)
+    blocker.release.set()
+    assert done.get(timeout=WAIT) == (1, "released", None)
+    assert ran == []
+    scheduler.shut_down()
+
+
+def test_cancel_running_job(done):
+    blocker = BlockingJob()
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(1, blocker)
+    assert blocker.started.wait(WAIT)
+    assert scheduler.cancel(1)
+    job_id, _, error = done.get(timeout=WAIT)
+    assert job_id == 1
+    assert isinstance(error, JobCancelled)
+    assert error.job_id == 1
+    assert not scheduler.cancel(1)
+    scheduler.shut_down()
+
+
+def test_failed_job_reports_its_error(done):
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(1, FailingJob())
+    _, _, error = done.get(timeout=WAIT)
+    assert isinstance(error, RuntimeError)
+    scheduler.shut_down()
+
+
+def test_job_waits_until_it_may_start(done):
+    allowed = Event()
+    scheduler = JobScheduler(1, _on_done(done), lambda _: allowed.is_set())
+    scheduler.submit(1, RecordJob("a", []))
+    with pytest.raises(queue.Empty):
+        done.get(timeout=0.3)
+    allowed.set()
+    scheduler.wake()
+    assert done.get(timeout=WAIT) == (1, "a", None)
+    scheduler.shut_down()
+
+
+def test_duplicate_job_id_is_refused(done):
+    scheduler = JobScheduler(1, _on_done(done), lambda _: False)
+    scheduler.submit(1, RecordJob("a", []))
+    with pytest.raises(ValueError):
+        scheduler.submit(1, RecordJob("b", []))
+    scheduler.shut_down()
+
+
+def test_cancel_priority_cancels_only_that_priority(done):
+    blocker = BlockingJob()
+    blocker.priority = JobPriority.SPECULATIVE
+    ran: list[str] = []
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(1, blocker)
+    assert blocker.started.wait(WAIT)
+    scheduler.submit(2, RecordJob("speculative", ran, JobPriority.SPECULATIVE))
+    scheduler.submit(3, RecordJob("background", ran))
+    assert scheduler.cancel_priority(JobPriority.SPECULATIVE) == 2
+    results = {done.get(timeout=WAIT)[0]: None for _ in range(3)}
+    assert set(results) == {1, 2, 3}
+    assert ran == ["background"]
+    scheduler.shut_down()
+
+
+def test_wait_for_priority_waits_for_running_jobs(done):
+    blocker = BlockingJob()
+    blocker.priority = JobPriority.SPECULATIVE
+    scheduler = JobScheduler(1, _on_done(done))
+    scheduler.submit(1, blocker)
+    assert blocker.started.wait(WAIT)
+    assert not scheduler.wait_for_priority(JobPriority.SPECULATIVE, 0.05)
+    assert scheduler.wait_for_priority(JobPriority.BACKGROUND, 0.05)
+    scheduler.cancel_priority(JobPriority.SPECULATIVE)
+    assert scheduler.wait_for_priority(JobPriority.SPECULATIVE, WAIT)
+    assert isinstance(done.get(timeout=WAIT)[2], JobCancelled)
+    scheduler.shut_down()
+
+
+def test_job_is_an_abstract_base_class():
+    with pytest.raises(TypeError):
+        Job()  # pyright: ignore[reportAbstractUsage] - to check it is abstract
+
+
+@fork_only
+def test_forked_job_runs_in_a_child(done):
+    scheduler = JobScheduler(1, _on_done(done), fork_jobs=True)
+    scheduler.submit(1, PidJob())
+    job_id, pid, error = done.get(timeout=WAIT)
+    assert (job_id, error) == (1, None)
+    assert pid != os.getpid()
+    assert "SCADVIEW_JOB_RAN" not in os.environ
+    scheduler.submit(2, FailingJob())
+    _, _, error = done.get(timeout=WAIT)
+    assert isinstance(error, RuntimeError)
+    scheduler.shut_down()
+
+
+@fork_only
+def test_cancelled_forked_job_is_killed():
+    token = CancelToken()
+    Timer(0.2, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(JobCancelled):
+        run_in_child(SleepingJob(), token)
+    assert time.monotonic() - start < WAIT
+
+
+@fork_only
+def test_forked_job_that_exits_reports_its_code():
+    with pytest.raises(ChildProcessError, match="code 3"):
+        run_in_child(ExitingJob(), CancelToken())
@@ -0,0 +1,116 @@
+import numpy as np
+import numpy.testing as npt
+from trimesh.creation import box, icosphere
+from trimesh.transformations import rotation_matrix
+
+from scadview.mesh_delta import (
+    MeshDelta,
+    MeshDeltaDetector,
+    apply_mesh_delta,
+    rigid_transform,
+    take_shared_vertices,
+)
+from scadview.mesh_transport import SharedArrays, share_arrays
+
+
+def _diffs(*meshes):
+    detector = MeshDeltaDetector()
+    return [detector.diff(mesh) for mesh in meshes]
+
+
+def test_first_mesh_has_no_delta():
+    assert _diffs(box()) == [None]
+
+
+def test_same_mesh_has_empty_delta():
+    _, delta = _diffs(box(), box())
+    assert delta == MeshDelta()
+    assert not delta.geometry_replaced
+
+
+def test_translation_is_a_transform():
+    _, delta = _diffs(box(), box().apply_translation((1, 2, 3)))
+    npt.assert_allclose(delta.transform[:3, 3], (1, 2, 3), atol=1e-9)
+    npt.assert_allclose(delta.transform[:3, :3], np.eye(3), atol=1e-9)
+    assert delta.vertices is None
+
+
+def test_rotation_is_a_transform():
+    rotation = rotation_matrix(0.5, (0, 0, 1), (1, 1, 1))
+    _, delta = _diffs(icosphere(), icosphere().apply_transform(rotation))
+    npt.assert_allclose(delta.transform, rotation, atol=1e-9)
+
+
+def test_same_mesh_changed_in_place_is_compared_with_its_last_state():
+    mesh = box()
+    detector = MeshDeltaDetector()
+    detector.diff(mesh)
+    delta = detector.diff(mesh.apply_translation((1, 0, 0)))
+    npt.assert_allclose(delta.transform[:3, 3], (1, 0, 0), atol=1e-9)
+
+
+def test_detector_without_copy_keeps_the_mesh_arrays():
+    mesh = box()
+    detector = MeshDeltaDetector(copy=False)
+    detector.diff(mesh)
+    assert np.shares_memory(detector._vertices, mesh.vertices)  # pyright: ignore[reportPrivateUsage, reportArgumentType] - to check it was not copied
+    delta = detector.diff(box().apply_translation((1, 0, 0)))
+    npt.assert_allclose(delta.transform[:3, 3], (1, 0, 0), atol=1e-9)
+
+
+def test_shared_vertices_are_taken_before_they_are_applied():
+    scaled = box(extents=(2, 2, 2))
+    delta = MeshDelta(vertices=share_arrays([np.asarray(scaled.vertices)]))
+    take_shared_vertices([delta])
+    assert not isinstance(delta.vertices, SharedArrays)
+    npt.assert_array_equal(apply_mesh_delta(box(), delta).vertices, scaled.vertices)
+
+
+def test_scale_replaces_vertices():
+    _, delta = _diffs(box(), box(extents=(2, 2, 2)))
+    assert delta.transform is None
+    npt.assert_array_equal(delta.vertices, box(extents=(2, 2, 2)).vertices)
+    assert delta.geometry_replaced
+
+
+def test_new_faces_replace_faces():
+    mesh = box()
+    flipped = box()
+    flipped.faces = np.fliplr(mesh.faces)
+    _, delta = _diffs(mesh, flipped)
+    npt.assert_array_equal(delta.faces, flipped.faces)
+    assert delta.vertices is None
+
+
+def test_color_change_is_metadata_only():
+    colored = box()
+    colored.metadata["scadview"] = {"color": [1.0, 0.0, 0.0, 1.0]}
+    _, delta = _diffs(box(), colored)
+    assert delta == MeshDelta(metadata={"color": [1.0, 0.0, 0.0, 1.0]})
+
+
+def test_new_topology_has_no_delta():
+    assert _diffs(box(), icosphere())[1] is None
+
+
+def test_reset_forgets_last_mesh():
+    detector = MeshDeltaDetector()
+    detector.diff(box())
+    detector.reset()
+    assert detector.diff(box()) is None
+
+
+def test_rigid_transform_rejects_non_rigid_change():
+    before = np.array(box().vertices)
+    assert rigid_transform(before, before * 2) is None
+
+
+def test_apply_mesh_delta_round_trips():
+    before = box()
+    after = box().apply_transform(rotation_matrix(1.0, (1, 0, 0)))
+    after.metadata["scadview"] = {"color": [0.0, 1.0, 0.0, 1.0]}
+    _, delta = _diffs(before, after)
+    applied = apply_mesh_delta(before, delta)
+    npt.assert_allclose(applied.vertices, after.vertices, atol=1e-9)
+    npt.assert_array_equal(applied.faces, after.faces)
+    assert applied.metadata["scadview"] == {"color": [0.0, 1.0, 0.0, 1.0]}
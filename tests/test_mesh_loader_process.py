@@ -1,16 +1,45 @@
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
 from unittest.mock import patch
 
+import numpy as np
 import numpy.testing as npt
 import pytest
+from manifold3d import Manifold
 from trimesh.creation import box, icosphere
 
+from scadview.api import cache as memo_cache
+from scadview.api.colors import set_mesh_color
+from scadview.controller import PendingResult, _listen_for_results
+from scadview.job_scheduler import CancelToken, JobCancelled, run_in_child
+from scadview.mesh_delta import MeshDelta, take_shared_vertices
 from scadview.mesh_loader_process import (
+    FORK_LOADS_SUPPORTED,
+    ForkedLoad,
+    FrameCounters,
+    FrameDelivery,
+    LoadBudgetExceeded,
+    LoaderOptions,
     LoadResult,
     LoadStatus,
     LoadWorker,
     MpLoadQueue,
     MpQueue,
+    PrefetchJob,
+    discard_result,
+    put_replacing_oldest,
 )
+from scadview.mesh_transport import (
+    SharedArrays,
+    SharedMesh,
+    SharedMeshReader,
+    WireMesh,
+    encode_wire_mesh,
+)
+from scadview.result_cache import ResultCache
 
 
 @pytest.fixture
@@ -106,6 +135,12 @@ def test_load_result_status():
     assert lr.status == LoadStatus.NONE
 
 
+def _received_mesh(result):
+    """The mesh of the result as the viewer unpacks it"""
+    assert isinstance(result.packed, (WireMesh, list))
+    return SharedMeshReader().unpack(result.packed)
+
+
 @pytest.fixture
 def mesh(request):
     m = getattr(request, "param", box())
@@ -147,8 +182,8 @@ def test_load_worker_put_in_queue(mesh, load_queue, started_load_worker):
     result = load_queue.get(timeout=1.0)
     assert result.load_number == 1
     assert result.sequence_number == 1
-    npt.assert_array_equal(result.mesh.vertices, mesh.vertices)
-    npt.assert_array_equal(result.mesh.faces, mesh.faces)
+    npt.assert_array_equal(_received_mesh(result).vertices, mesh.vertices)
+    npt.assert_array_equal(_received_mesh(result).faces, mesh.faces)
     assert not result.error
     assert not result.complete  # Even though no more meshes, not set complete
 
@@ -158,8 +193,8 @@ def test_load_worker_put_in_queue(mesh, load_queue, started_load_worker):
     result = load_queue.get(timeout=1.0)
     assert result.load_number == 1
     assert result.sequence_number == 1
-    npt.assert_array_equal(result.mesh.vertices, mesh.vertices)
-    npt.assert_array_equal(result.mesh.faces, mesh.faces)
+    npt.assert_array_equal(_received_mesh(result).vertices, mesh.vertices)
+    npt.assert_array_equal(_received_mesh(result).faces, mesh.faces)
     assert not result.error
     assert result.complete
 
@@ -171,16 +206,16 @@ def test_load_worker_put_in_queue_multi_mesh(mesh, load_queue, started_load_work
     result = load_queue.get(timeout=1.0)
     assert result.load_number == 1
     assert result.sequence_number == 1
-    npt.assert_array_equal(result.mesh.vertices, mesh[0].vertices)
-    npt.assert_array_equal(result.mesh.faces, mesh[0].faces)
+    npt.assert_array_equal(_received_mesh(result).vertices, mesh[0].vertices)
+    npt.assert_array_equal(_received_mesh(result).faces, mesh[0].faces)
     assert not result.error
     assert not result.complete
 
     result = load_queue.get(timeout=1.0)
     assert result.load_number == 1
     assert result.sequence_number == 2
-    npt.assert_array_equal(result.mesh.vertices, mesh[1].vertices)
-    npt.assert_array_equal(result.mesh.faces, mesh[1].faces)
+    npt.assert_array_equal(_received_mesh(result).vertices, mesh[1].vertices)
+    npt.assert_array_equal(_received_mesh(result).faces, mesh[1].faces)
     assert not result.error
     assert not result.complete  # Even though no more meshes, not set complete
 
@@ -190,8 +225,8 @@ def test_load_worker_put_in_queue_multi_mesh(mesh, load_queue, started_load_work
     result = load_queue.get(timeout=1.0)
     assert result.load_number == 1
     assert result.sequence_number == 2
-    npt.assert_array_equal(result.mesh.vertices, mesh[1].vertices)
-    npt.assert_array_equal(result.mesh.faces, mesh[1].faces)
+    npt.assert_array_equal(_received_mesh(result).vertices, mesh[1].vertices)
+    npt.assert_array_equal(_received_mesh(result).faces, mesh[1].faces)
     assert not result.error
     assert result.complete
 
@@ -208,8 +243,9 @@ def test_load_worker_colors_mesh_list(load_queue):
         assert not worker.is_alive()
 
     result = load_queue.get(timeout=1.0)
-    assert isinstance(result.mesh, list)
-    for tm in result.mesh:
+    mesh = _received_mesh(result)
+    assert isinstance(mesh, list)
+    for tm in mesh:
         assert "scadview" in tm.metadata
         assert tm.metadata["scadview"]["color"][3] == 0.5
 
@@ -220,3 +256,705 @@ def test_load_worker_cancel(started_load_worker):
     started_load_worker.cancel()
     started_load_worker.join(timeout=1.0)
     assert not started_load_worker.is_alive()
+
+
+def test_load_worker_shares_large_meshes(load_queue):
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        ml_instance = mock_module_loader.return_value
+        ml_instance.run_function.return_value = iter([icosphere()])
+        worker = LoadWorker(
+            "test/path", load_queue, LoaderOptions(shared_memory_min_faces=0)
+        )
+        worker.start()
+        worker.join(timeout=1.0)
+        LoadWorker.load_number = 0  # reset
+
+    reader = SharedMeshReader()
+    for complete in (False, True):
+        result = load_queue.get(timeout=1.0)
+        assert result.mesh is None
+        assert isinstance(result.packed, SharedMesh)
+        assert result.status == (LoadStatus.COMPLETE if complete else LoadStatus.START)
+        npt.assert_array_equal(reader.unpack(result.packed).faces, icosphere().faces)
+
+
+def _run_worker(module_path, load_queue, options):
+    """Run a load of an icosphere, returning whether the module ran and the results"""
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        ml_instance = mock_module_loader.return_value
+        ml_instance.run_function.return_value = iter([icosphere()])
+        worker = LoadWorker(module_path, load_queue, options)
+        worker.start()
+        results = [load_queue.get(timeout=5.0) for _ in range(2)]
+        worker.join(timeout=5.0)
+        LoadWorker.load_number = 0  # reset
+    return ml_instance.run_function.called, results
+
+
+def test_load_worker_uses_result_cache(tmp_path, load_queue):
+    module_path = tmp_path / "cached.py"
+    module_path.write_text("def create_mesh(): pass\n")
+    options = LoaderOptions(
+        shared_memory_min_faces=None,
+        use_result_cache=True,
+        result_cache_dir=str(tmp_path / "cache"),
+    )
+    ran, _ = _run_worker(str(module_path), load_queue, options)
+    assert ran
+
+    ran, results = _run_worker(str(module_path), load_queue, options)
+    assert not ran
+    assert [r.complete for r in results] == [False, True]
+    for result in results:
+        npt.assert_array_equal(_received_mesh(result).faces, icosphere().faces)
+
+    module_path.write_text("def create_mesh(): return None\n")
+    ran, _ = _run_worker(str(module_path), load_queue, options)
+    assert ran
+
+
+def test_load_worker_bypasses_result_cache(tmp_path, load_queue):
+    module_path = tmp_path / "uncached.py"
+    module_path.write_text("def create_mesh(): pass\n")
+    options = LoaderOptions(
+        use_result_cache=False, result_cache_dir=str(tmp_path / "cache")
+    )
+    assert _run_worker(str(module_path), load_queue, options)[0]
+    assert _run_worker(str(module_path), load_queue, options)[0]
+    assert not (tmp_path / "cache").exists()
+
+
+@pytest.fixture
+def frames_loader():
+    """Starts a load of five boxes of increasing size, or of the meshes given"""
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        ml_instance = mock_module_loader.return_value
+
+        def start(load_queue, options, meshes=None, viewer_ready=None):
+            if meshes is None:
+                meshes = [box(extents=(i, i, i)) for i in range(1, 6)]
+            ml_instance.run_function.return_value = iter(meshes)
+            worker = LoadWorker(
+                "test/path", load_queue, options, viewer_ready=viewer_ready
+            )
+            worker.start()
+            return worker
+
+        yield start
+        LoadWorker.load_number = 0  # reset
+
+
+def test_latest_frames_skips_frames_the_consumer_is_not_ready_for(frames_loader):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    # Never set, as the viewer takes nothing
+    viewer_ready = multiprocessing.Event()
+    worker = frames_loader(
+        load_queue, LoaderOptions(use_result_cache=False), viewer_ready=viewer_ready
+    )
+    worker.join(timeout=5.0)
+
+    result = load_queue.get(timeout=1.0)
+    assert result.complete
+    assert result.sequence_number == 5
+    npt.assert_array_equal(_received_mesh(result).extents, (5, 5, 5))
+    # Only the first frame was sent, then the final one replaced it
+    counters = result.frame_counters
+    assert counters == FrameCounters(produced=5, converted=2, delivered=1, dropped=4)
+
+
+def test_latest_frames_wait_for_the_viewer_past_the_listener(frames_loader):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    pending = PendingResult()
+    told = queue.Queue()
+    stopped = threading.Event()
+    listener = threading.Thread(
+        target=_listen_for_results,
+        args=(load_queue, pending, lambda: told.put(True), stopped),
+    )
+    listener.start()
+    try:
+        # The listener empties the load queue, but the viewer takes nothing
+        worker = frames_loader(
+            load_queue,
+            LoaderOptions(use_result_cache=False),
+            viewer_ready=pending.viewer_ready,
+        )
+        worker.join(timeout=5.0)
+        deadline = time.monotonic() + 5.0
+        while load_queue.full() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stopped.set()
+        listener.join(timeout=5.0)
+    result = pending.take()
+    assert result is not None and result.complete
+    assert result.sequence_number == 5
+    assert result.frame_counters.converted == 2
+    assert pending.viewer_ready.is_set()
+
+
+def test_every_frame_is_delivered_in_order(frames_loader):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    options = LoaderOptions(use_result_cache=False, frame_delivery=FrameDelivery.EVERY)
+    worker = frames_loader(load_queue, options)
+    results = [load_queue.get(timeout=5.0) for _ in range(6)]
+    worker.join(timeout=5.0)
+
+    assert [r.sequence_number for r in results] == [1, 2, 3, 4, 5, 5]
+    assert [r.complete for r in results] == [False] * 5 + [True]
+    assert results[-1].frame_counters == FrameCounters(
+        produced=5, converted=5, delivered=5, dropped=0
+    )
+
+
+def test_rate_limited_frames(frames_loader):
+    load_queue = MpLoadQueue(maxsize=10, type_=LoadResult)
+    options = LoaderOptions(
+        use_result_cache=False,
+        frame_delivery=FrameDelivery.RATE_LIMITED,
+        max_frame_rate=0.01,
+    )
+    worker = frames_loader(load_queue, options)
+    results = [load_queue.get(timeout=5.0) for _ in range(2)]
+    worker.join(timeout=5.0)
+
+    assert [r.sequence_number for r in results] == [1, 5]
+    assert results[-1].frame_counters == FrameCounters(
+        produced=5, converted=2, delivered=2, dropped=3
+    )
+
+
+def test_moved_frames_are_sent_as_transforms(frames_loader):
+    load_queue = MpLoadQueue(maxsize=10, type_=LoadResult)
+    options = LoaderOptions(use_result_cache=False, frame_delivery=FrameDelivery.EVERY)
+    meshes = [box().apply_translation((i, 0, 0)) for i in range(3)]
+    worker = frames_loader(load_queue, options, meshes)
+    results = [load_queue.get(timeout=5.0) for _ in range(4)]
+    worker.join(timeout=5.0)
+
+    assert results[0].deltas is None
+    npt.assert_array_equal(_received_mesh(results[0]).vertices, meshes[0].vertices)
+    for result in results[1:3]:
+        assert result.packed is None
+        assert result.status == LoadStatus.START
+        (delta,) = result.deltas
+        npt.assert_allclose(delta.transform[:3, 3], (1, 0, 0), atol=1e-9)
+    # The final mesh is always sent whole
+    assert results[3].complete
+    assert results[3].deltas is None
+    npt.assert_array_equal(_received_mesh(results[3]).vertices, meshes[2].vertices)
+
+
+def test_replaced_vertices_of_large_meshes_go_through_shared_memory(frames_loader):
+    load_queue = MpLoadQueue(maxsize=10, type_=LoadResult)
+    options = LoaderOptions(
+        use_result_cache=False,
+        shared_memory_min_faces=1,
+        frame_delivery=FrameDelivery.EVERY,
+    )
+    meshes = [box(extents=(i, i, i)) for i in (1, 2, 3)]
+    worker = frames_loader(load_queue, options, meshes)
+    results = [load_queue.get(timeout=5.0) for _ in range(4)]
+    worker.join(timeout=5.0)
+
+    (delta,) = results[1].deltas
+    assert isinstance(delta.vertices, SharedArrays)
+    take_shared_vertices(results[1].deltas)
+    npt.assert_array_equal(delta.vertices, meshes[1].vertices)
+    # Dropped without being taken
+    for result in results[2:]:
+        discard_result(result)
+
+
+def test_delta_takes_over_the_mesh_it_replaces_in_the_queue(load_worker):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    load_worker.load_queue = load_queue
+    first = box()
+    load_queue.put(LoadResult(1, 1, None, None, packed=encode_wire_mesh(first)))
+    moved = MeshDelta(transform=np.eye(4))
+    assert load_worker.put_in_queue(LoadResult(1, 2, None, None, deltas=[moved]))
+
+    result = load_queue.get(timeout=1.0)
+    assert result.sequence_number == 2
+    assert len(result.deltas) == 1
+    npt.assert_array_equal(result.deltas[0].transform, moved.transform)
+    npt.assert_array_equal(_received_mesh(result).vertices, first.vertices)
+
+
+def test_load_generates_while_converting(load_queue):
+    produced = []
+
+    def frames():
+        for i in range(3):
+            produced.append(i)
+            yield box()
+
+    ensure_trimesh = LoadWorker._ensure_trimesh
+    produced_at_conversion = []
+
+    def slow_ensure_trimesh(self, mesh, on_parts=None):
+        # Waits for create_mesh to move on, which it can only do in parallel
+        deadline = time.monotonic() + 5.0
+        while len(produced) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        produced_at_conversion.append(len(produced))
+        return ensure_trimesh(self, mesh, on_parts)
+
+    with (
+        patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader,
+        patch.object(LoadWorker, "_ensure_trimesh", slow_ensure_trimesh),
+    ):
+        mock_module_loader.return_value.run_function.return_value = frames()
+        options = LoaderOptions(
+            use_result_cache=False, frame_delivery=FrameDelivery.EVERY
+        )
+        worker = LoadWorker("test/path", load_queue, options)
+        worker.start()
+        results = [load_queue.get(timeout=10.0) for _ in range(4)]
+        worker.join(timeout=5.0)
+        LoadWorker.load_number = 0  # reset
+
+    assert produced_at_conversion[0] == 3
+    assert [r.sequence_number for r in results] == [1, 2, 3, 3]
+
+
+def test_list_parts_are_sent_as_they_are_converted(frames_loader):
+    load_queue = MpLoadQueue(maxsize=100, type_=LoadResult)
+    options = LoaderOptions(use_result_cache=False, frame_delivery=FrameDelivery.EVERY)
+    parts = [Manifold.cube((1, 1, 1)).translate((i, 0, 0)) for i in range(20)]
+    with patch("scadview.mesh_loader_process.PARTS_PROGRESS_INTERVAL", 0):
+        worker = frames_loader(load_queue, options, [parts])
+        worker.join(timeout=5.0)
+    results = []
+    while not results or not results[-1].complete:
+        results.append(load_queue.get(timeout=1.0))
+
+    partial = [r for r in results if r.parts_progress is not None]
+    # The first part is sent as soon as it is converted
+    assert partial[0].parts_progress[0] >= 1
+    for result in partial:
+        converted, total = result.parts_progress
+        assert total == 20
+        received = _received_mesh(result)
+        assert len(received) == converted
+        npt.assert_allclose(received[-1].bounds[0], (converted - 1, 0, 0))
+    whole = _received_mesh(results[-1])
+    assert results[-1].parts_progress is None
+    assert len(whole) == 20
+    for i, part in enumerate(whole):
+        npt.assert_allclose(part.bounds[0], (i, 0, 0))
+
+
+def test_list_part_of_wrong_type_is_an_error(frames_loader):
+    load_queue = MpLoadQueue(maxsize=10, type_=LoadResult)
+    worker = frames_loader(
+        load_queue, LoaderOptions(use_result_cache=False), [[box(), "box"]]
+    )
+    worker.join(timeout=5.0)
+
+    result = load_queue.get(timeout=1.0)
+    assert result.complete
+    assert isinstance(result.error, TypeError)
+    assert "mesh[1]" in str(result.error)
+
+
+def test_frames_keep_the_mesh_as_yielded(load_queue):
+    def frames():
+        # Moved in place after each yield, while earlier frames wait
+        mesh = box()
+        for _ in range(3):
+            yield mesh
+            mesh.apply_translation((1, 0, 0))
+
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        mock_module_loader.return_value.run_function.return_value = frames()
+        options = LoaderOptions(
+            use_result_cache=False,
+            frame_delivery=FrameDelivery.EVERY,
+            send_mesh_deltas=False,
+        )
+        worker = LoadWorker("test/path", load_queue, options)
+        worker.start()
+        results = [load_queue.get(timeout=10.0) for _ in range(4)]
+        worker.join(timeout=5.0)
+        LoadWorker.load_number = 0  # reset
+
+    lowest_x = [_received_mesh(r).bounds[0][0] for r in results]
+    assert lowest_x == [-0.5, 0.5, 1.5, 1.5]
+
+
+fork_only = pytest.mark.skipif(
+    not FORK_LOADS_SUPPORTED, reason="Loads are only forked on Linux"
+)
+
+
+def _write_module(tmp_path, name, source):
+    path = tmp_path / f"{name}.py"
+    path.write_text(source)
+    return str(path)
+
+
+@fork_only
+def test_forked_load_relays_results(tmp_path, load_queue):
+    module_path = _write_module(
+        tmp_path,
+        "forked_box",
+        """
+from trimesh.creation import box
+
+def create_mesh():
+    return box()
+""",
+    )
+    forked = ForkedLoad(module_path, load_queue, LoaderOptions(use_result_cache=False))
+    forked.start()
+    first = load_queue.get(timeout=5.0)
+    final = load_queue.get(timeout=5.0)
+    assert first.load_number == forked.load_number
+    assert first.sequence_number == 1
+    npt.assert_array_equal(_received_mesh(first).vertices, box().vertices)
+    assert final.complete
+    assert first.module_files is None
+    assert final.module_files == []
+    assert final.frame_counters == FrameCounters(
+        produced=1, converted=1, delivered=1, dropped=0
+    )
+    forked.cancel()
+    assert not forked.is_alive()
+    LoadWorker.load_number = 0  # reset
+
+
+@fork_only
+def test_forked_load_cancel_kills_busy_child(tmp_path, load_queue):
+    module_path = _write_module(
+        tmp_path,
+        "forked_busy",
+        """
+def create_mesh():
+    while True:
+        pass
+""",
+    )
+    forked = ForkedLoad(module_path, load_queue, LoaderOptions(use_result_cache=False))
+    forked.start()
+    assert forked.is_alive()
+    forked.cancel()
+    assert not forked.is_alive()
+    with pytest.raises(queue.Empty):
+        load_queue.get(timeout=0.2)
+    LoadWorker.load_number = 0  # reset
+
+
+@fork_only
+def test_forked_load_kills_child_over_time_budget(tmp_path, load_queue):
+    module_path = _write_module(
+        tmp_path,
+        "forked_runaway",
+        """
+from trimesh.creation import box
+
+def create_mesh():
+    yield box()
+    while True:
+        pass
+""",
+    )
+    options = LoaderOptions(
+        use_result_cache=False,
+        frame_delivery=FrameDelivery.EVERY,
+        load_time_budget=0.5,
+    )
+    forked = ForkedLoad(module_path, load_queue, options)
+    forked.start()
+    first = load_queue.get(timeout=5.0)
+    result = load_queue.get(timeout=5.0)
+    forked._relay.join(timeout=5.0)
+    LoadWorker.load_number = 0  # reset
+
+    assert not forked.is_alive()
+    assert first.sequence_number == 1
+    assert result.complete
+    assert isinstance(result.error, LoadBudgetExceeded)
+    assert result.error.budget == "time"
+    assert result.error.last_sequence_number == 1
+    assert result.error.elapsed >= 0.5
+    assert "time budget of 0.5 s" in str(result.error)
+
+
+@fork_only
+def test_forked_load_kills_child_over_memory_budget(tmp_path, load_queue):
+    module_path = _write_module(
+        tmp_path,
+        "forked_hungry",
+        """
+import time
+
+def create_mesh():
+    time.sleep(10)
+""",
+    )
+    options = LoaderOptions(use_result_cache=False, load_rss_budget=1)
+    forked = ForkedLoad(module_path, load_queue, options)
+    forked.start()
+    result = load_queue.get(timeout=5.0)
+    forked._relay.join(timeout=5.0)
+    LoadWorker.load_number = 0  # reset
+
+    assert not forked.is_alive()
+    assert isinstance(result.error, LoadBudgetExceeded)
+    assert result.error.budget == "memory"
+    assert result.error.last_sequence_number == 0
+
+
+def test_load_worker_stops_generator_over_time_budget(load_queue):
+    def endless():
+        while True:
+            time.sleep(0.01)
+            yield box()
+
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        mock_module_loader.return_value.run_function.return_value = endless()
+        options = LoaderOptions(use_result_cache=False, load_time_budget=0.2)
+        worker = LoadWorker("test/path", load_queue, options)
+        worker.start()
+        worker.join(timeout=5.0)
+        LoadWorker.load_number = 0  # reset
+
+    assert not worker.is_alive()
+    result = load_queue.get(timeout=1.0)
+    while not result.complete:
+        result = load_queue.get(timeout=1.0)
+    assert isinstance(result.error, LoadBudgetExceeded)
+    assert result.error.budget == "time"
+    assert result.sequence_number == result.error.last_sequence_number
+    assert result.status == LoadStatus.ERROR
+
+
+def test_load_worker_over_time_budget_that_finishes_is_not_an_error(load_queue):
+    def slow_return():
+        time.sleep(0.3)
+        yield box()
+
+    def slow_end():
+        yield box()
+        time.sleep(0.3)
+
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        for frames in (slow_return(), slow_end()):
+            mock_module_loader.return_value.run_function.return_value = frames
+            options = LoaderOptions(use_result_cache=False, load_time_budget=0.1)
+            worker = LoadWorker("test/path", load_queue, options)
+            worker.start()
+            worker.join(timeout=5.0)
+            LoadWorker.load_number = 0  # reset
+            result = load_queue.get(timeout=1.0)
+            while not result.complete:
+                result = load_queue.get(timeout=1.0)
+            assert result.error is None
+            assert result.status == LoadStatus.COMPLETE
+
+
+def test_load_budget_exceeded_pickles():
+    error = LoadBudgetExceeded("memory", 2**30, 2**31, 1.5, 3)
+    copy = pickle.loads(pickle.dumps(error))
+    assert (copy.budget, copy.limit, copy.used, copy.last_sequence_number) == (
+        "memory",
+        2**30,
+        2**31,
+        3,
+    )
+    assert str(copy) == str(error)
+
+
+@fork_only
+def test_forked_load_reports_crashed_child(tmp_path, load_queue):
+    module_path = _write_module(
+        tmp_path,
+        "forked_crash",
+        """
+import os
+
+def create_mesh():
+    os._exit(3)
+""",
+    )
+    forked = ForkedLoad(module_path, load_queue, LoaderOptions(use_result_cache=False))
+    forked.start()
+    result = load_queue.get(timeout=5.0)
+    assert result.complete
+    assert isinstance(result.error, ChildProcessError)
+    forked.cancel()
+    LoadWorker.load_number = 0  # reset
+
+
+@fork_only
+def test_forked_load_returns_memoized_results(tmp_path, load_queue, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(memo_cache, "_disk_store", None)
+    module_path = _write_module(
+        tmp_path,
+        "forked_memo",
+        """
+from trimesh.creation import box
+
+from scadview import cache
+
+@cache
+def part():
+    return box()
+
+def create_mesh():
+    return part()
+""",
+    )
+    forked = ForkedLoad(module_path, load_queue, LoaderOptions(use_result_cache=False))
+    forked.start()
+    load_queue.get(timeout=5.0)
+    load_queue.get(timeout=5.0)
+    forked._relay.join(timeout=5.0)
+    # The loader process now holds the result, so later forks start with it
+    assert len(memo_cache._memory) == 1
+    memo_cache.clear_cache()
+    LoadWorker.load_number = 0  # reset
+
+
+def test_job_result_is_not_replaced_by_a_frame():
+    load_queue: queue.Queue[LoadResult] = queue.Queue(maxsize=1)
+    job_result = LoadResult(0, 0, None, None, complete=True, job_id=1)
+    load_queue.put(job_result)
+    frame = LoadResult(1, 1, box(), None)
+    dropped: list[LoadResult] = []
+
+    def take_job_result():
+        time.sleep(0.2)
+        assert load_queue.get() is job_result
+
+    taker = threading.Thread(target=take_job_result)
+    taker.start()
+    assert put_replacing_oldest(load_queue, frame, lambda: False, dropped.append)
+    taker.join()
+    assert dropped == []
+    assert load_queue.get_nowait() is frame
+    assert job_result.status == LoadStatus.NONE
+
+
+def test_large_mesh_is_streamed_in_chunks(frames_loader):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    mesh = icosphere()
+    options = LoaderOptions(
+        use_result_cache=False, stream_min_faces=1000, stream_chunk_faces=500
+    )
+    worker = frames_loader(load_queue, options, [mesh])
+    chunks = []
+    result = load_queue.get(timeout=5.0)
+    while result.chunk is not None:
+        assert result.status == LoadStatus.START
+        chunks.append(result.chunk)
+        result = load_queue.get(timeout=5.0)
+    worker.join(timeout=5.0)
+    assert [c.first_face for c in chunks] == [0, 500, 1000]
+    assert chunks[-1].last
+    npt.assert_array_equal(chunks[0].bounds, mesh.bounds)
+    assert result.streamed
+    npt.assert_array_equal(_received_mesh(result).faces, mesh.faces)
+    # The final result repeats the frame, which is not streamed again
+    final = load_queue.get(timeout=5.0)
+    assert final.complete and not final.streamed
+
+
+def test_only_the_first_frame_of_a_load_is_streamed(frames_loader):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    options = LoaderOptions(
+        use_result_cache=False,
+        stream_min_faces=1000,
+        send_mesh_deltas=False,
+        frame_delivery=FrameDelivery.EVERY,
+    )
+    worker = frames_loader(load_queue, options, [icosphere(), icosphere(radius=2.0)])
+    results = []
+    while not results or not results[-1].complete:
+        results.append(load_queue.get(timeout=5.0))
+    worker.join(timeout=5.0)
+    streamed = [r.sequence_number for r in results if r.chunk is not None]
+    assert streamed and set(streamed) == {1}
+    assert [r.sequence_number for r in results if r.streamed] == [1]
+
+
+def test_small_or_transparent_meshes_are_not_streamed(frames_loader):
+    load_queue = MpLoadQueue(maxsize=1, type_=LoadResult)
+    transparent = icosphere()
+    set_mesh_color(transparent, [1.0, 0.0, 0.0], 0.5)
+    options = LoaderOptions(use_result_cache=False, stream_min_faces=1000)
+    worker = frames_loader(load_queue, options, [transparent])
+    result = load_queue.get(timeout=5.0)
+    worker.join(timeout=5.0)
+    assert result.chunk is None and not result.streamed
+
+
+def test_load_worker_passes_params_to_create_mesh(tmp_path, load_queue):
+    with patch("scadview.mesh_loader_process.ModuleLoader") as mock_module_loader:
+        ml_instance = mock_module_loader.return_value
+        ml_instance.run_function.return_value = iter([box()])
+        worker = LoadWorker(
+            "test/path", load_queue, LoaderOptions(use_result_cache=False), {"n": 2}
+        )
+        worker.start()
+        worker.join(timeout=5.0)
+        LoadWorker.load_number = 0  # reset
+    ml_instance.run_function.assert_called_once_with("test/path", {"n": 2})
+
+
+SIZED_BOX = """
+from trimesh.creation import box
+
+def create_mesh(size=1.0):
+    return box(extents=(size, size, size))
+"""
+
+
+@pytest.mark.parametrize(
+    "fork_loads",
+    [False, pytest.param(True, marks=fork_only)],
+)
+def test_prefetch_stores_the_result_for_its_params_where_loads_fork(
+    tmp_path, fork_loads
+):
+    module_path = _write_module(tmp_path, f"prefetched_{fork_loads}", SIZED_BOX)
+    cache_dir = str(tmp_path / "cache")
+    options = LoaderOptions(
+        use_result_cache=True, result_cache_dir=cache_dir, fork_loads=fork_loads
+    )
+    PrefetchJob(module_path, {"size": 2.0}, options).run(CancelToken())
+    cache = ResultCache(cache_dir)
+    assert cache.lookup(module_path) is None
+    stored = cache.lookup(module_path, {"size": 2.0})
+    if not fork_loads:
+        # On a thread it would reload the module beside the load
+        assert stored is None
+        return
+    assert stored is not None
+    (mesh,) = stored
+    npt.assert_allclose(mesh.extents, [2.0, 2.0, 2.0])
+
+
+@fork_only
+def test_cancelled_prefetch_is_killed(tmp_path):
+    module_path = _write_module(
+        tmp_path,
+        "prefetched_busy",
+        """
+import time
+
+def create_mesh(size=1.0):
+    time.sleep(60)
+""",
+    )
+    options = LoaderOptions(
+        use_result_cache=True, result_cache_dir=str(tmp_path / "cache")
+    )
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    start = time.monotonic()
+    with pytest.raises(JobCancelled):
+        run_in_child(PrefetchJob(module_path, {"size": 2.0}, options), token)
+    assert time.monotonic() - start < 5.0
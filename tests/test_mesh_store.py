@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from manifold3d import Manifold
+from trimesh.creation import box, icosphere
+
+from scadview.api.colors import set_mesh_color
+from scadview.mesh_store import MeshStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MeshStore(str(tmp_path / "store"), max_bytes=10**9)
+
+
+def test_get_missing(store):
+    assert store.get("missing") is None
+
+
+def test_put_and_get_round_trip(store):
+    mesh = set_mesh_color(icosphere(), [0.1, 0.2, 0.3], 0.4)
+    store.put("key", [mesh, [box(), mesh]])
+    values = store.get("key")
+    assert len(values) == 2
+    npt.assert_array_equal(values[0].vertices, mesh.vertices)
+    npt.assert_array_equal(values[0].faces, mesh.faces)
+    assert values[0].metadata["scadview"] == mesh.metadata["scadview"]
+    assert isinstance(values[1], list)
+    npt.assert_array_equal(values[1][0].faces, box().faces)
+
+
+def test_get_memory_maps_arrays(store):
+    store.put("key", [box()])
+    base = store.get("key")[0].vertices
+    while not isinstance(base, np.memmap):
+        base = base.base
+        assert base is not None
+
+
+def test_vertex_colors_are_kept(store):
+    mesh = box()
+    mesh.visual.vertex_colors = np.tile([10, 20, 30, 255], (len(mesh.vertices), 1))
+    store.put("key", [mesh])
+    npt.assert_array_equal(
+        store.get("key")[0].visual.vertex_colors, mesh.visual.vertex_colors
+    )
+
+
+def test_pending_entry_is_not_visible_until_commit(store):
+    pending = store.begin()
+    pending.add(box())
+    assert store.get("key") is None
+    pending.commit("key")
+    assert store.get("key") is not None
+
+
+def test_abort_removes_pending_entry(store):
+    pending = store.begin()
+    pending.add(box())
+    pending.abort()
+    assert os.listdir(store.directory) == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    mesh = icosphere()
+    store = MeshStore(str(tmp_path / "store"), max_bytes=10**9)
+    store.put("a", [mesh])
+    entry_size = store.size()
+    store.max_bytes = 2 * entry_size
+    store.put("b", [mesh])
+    os.utime(os.path.join(store.directory, "a", "entry.json"), (0, 0))
+    os.utime(os.path.join(store.directory, "b", "entry.json"), (1, 1))
+    store.get("a")  # a is now the most recently used
+    store.put("c", [mesh])
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.get("c") is not None
+
+
+def test_unreadable_entry_is_discarded(store):
+    store.put("key", [box()])
+    with open(os.path.join(store.directory, "key", "entry.json"), "w") as f:
+        f.write("not json")
+    assert store.get("key") is None
+    assert not os.path.exists(os.path.join(store.directory, "key"))
+
+
+def test_put_rejects_unknown_values(store):
+    with pytest.raises(TypeError):
+        store.put("key", [object()])
+
+
+def test_other_values_round_trip(store):
+    store.put("key", [(Manifold.cube((1, 2, 3)), np.arange(4), None, 1.5, "a")])
+    manifold, arr, none, number, text = store.get("key")[0]
+    assert manifold.volume() == pytest.approx(6)
+    npt.assert_array_equal(arr, np.arange(4))
+    assert (none, number, text) == (None, 1.5, "a")
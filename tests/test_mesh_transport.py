@@ -0,0 +1,221 @@
+import gc
+from multiprocessing import shared_memory
+
+import numpy as np
+import numpy.testing as npt
+import pytest
+from manifold3d import Manifold
+from trimesh.creation import box, icosphere
+
+from scadview.api.colors import set_mesh_color
+from scadview.api.utils import manifold_to_trimesh
+from scadview.mesh_transport import (
+    CompressedArray,
+    SharedArrays,
+    SharedMesh,
+    SharedMeshReader,
+    SharedMeshWriter,
+    WireMesh,
+    decode_wire_mesh,
+    encode_wire_mesh,
+    is_opaque,
+    mesh_chunks,
+    take_shared_arrays,
+    unlink_packed_mesh,
+    unlink_shared_arrays,
+)
+
+
+@pytest.fixture
+def writer():
+    w = SharedMeshWriter(min_faces=0)
+    yield w
+    w.close()
+
+
+def _segment_exists(name: str) -> bool:
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    return True
+
+
+def test_pack_below_threshold_is_not_shared():
+    writer = SharedMeshWriter(min_faces=1000)
+    assert writer.pack(box()) is None
+    assert writer.pack([box(), box()]) is None
+
+
+def test_pack_disabled():
+    writer = SharedMeshWriter(min_faces=None)
+    assert writer.pack(icosphere()) is None
+
+
+def test_pack_and_unpack_round_trip(writer):
+    mesh = set_mesh_color(icosphere(), [0.1, 0.2, 0.3], 0.4)
+    packed = writer.pack(mesh)
+    assert isinstance(packed, SharedMesh)
+    reader = SharedMeshReader()
+    unpacked = reader.unpack(packed)
+    npt.assert_array_equal(unpacked.vertices, mesh.vertices)
+    npt.assert_array_equal(unpacked.faces, mesh.faces)
+    assert unpacked.metadata["scadview"] == mesh.metadata["scadview"]
+    # The name is removed once mapped; the mapping stays valid
+    assert not _segment_exists(packed.segment_name)
+    del unpacked
+    reader.release()
+
+
+def test_vertices_of_large_meshes_are_shared_as_float32():
+    writer = SharedMeshWriter(min_faces=100, compact=True)
+    vertices = np.asarray(box().vertices)
+    shared = writer.pack_vertices(vertices, 100)
+    assert isinstance(shared, SharedArrays)
+    (taken,) = take_shared_arrays(shared)
+    assert taken.dtype == np.float32
+    npt.assert_array_equal(taken, vertices)
+    assert not _segment_exists(shared.segment_name)
+    # Only the compact form below the threshold
+    small = writer.pack_vertices(vertices, 99)
+    assert not isinstance(small, SharedArrays) and small.dtype == np.float32
+    assert SharedMeshWriter(min_faces=None).pack_vertices(vertices, 100) is vertices
+
+
+def test_unlinked_shared_vertices_are_removed():
+    writer = SharedMeshWriter(min_faces=0)
+    shared = writer.pack_vertices(np.asarray(box().vertices), 12)
+    assert isinstance(shared, SharedArrays)
+    unlink_shared_arrays(shared)
+    assert not _segment_exists(shared.segment_name)
+    unlink_shared_arrays(shared)
+
+
+def test_pack_list_only_shares_large_meshes():
+    writer = SharedMeshWriter(min_faces=100)
+    small = box()
+    packed = writer.pack([small, icosphere()])
+    assert isinstance(packed, list)
+    assert packed[0] is small
+    assert isinstance(packed[1], SharedMesh)
+    reader = SharedMeshReader()
+    unpacked = reader.unpack(packed)
+    assert len(unpacked) == 2
+    npt.assert_array_equal(unpacked[1].faces, icosphere().faces)
+
+
+def test_unpack_keeps_vertex_colors(writer):
+    mesh = box()
+    mesh.visual.vertex_colors = np.tile([10, 20, 30, 255], (len(mesh.vertices), 1))
+    reader = SharedMeshReader()
+    unpacked = reader.unpack(writer.pack(mesh))
+    npt.assert_array_equal(unpacked.visual.vertex_colors, mesh.visual.vertex_colors)
+
+
+def test_reader_closes_retired_segments_once_free(writer):
+    reader = SharedMeshReader()
+    first = reader.unpack(writer.pack(box()))
+    reader.unpack(writer.pack(box()))
+    # first is still referenced, so its mapping cannot close yet
+    assert len(reader._retired) == 1
+    del first
+    gc.collect()  # Trimesh holds reference cycles
+    reader.release()
+    assert reader._retired == []
+
+
+def test_recycled_segment_is_reused(writer):
+    packed = writer.pack(icosphere())
+    writer.recycle(packed)
+    reused = writer.pack(icosphere())
+    assert reused.segment_name == packed.segment_name
+    unlink_packed_mesh(reused)
+    assert not _segment_exists(reused.segment_name)
+
+
+def test_close_unlinks_spares():
+    writer = SharedMeshWriter(min_faces=0)
+    packed = writer.pack(box())
+    writer.recycle(packed)
+    writer.close()
+    assert not _segment_exists(packed.segment_name)
+
+
+def test_wire_mesh_uses_compact_dtypes():
+    mesh = manifold_to_trimesh(Manifold.sphere(1.0, 32))
+    wire = encode_wire_mesh(mesh)
+    assert wire.vertices.dtype == np.float32
+    assert wire.faces.dtype == np.uint16
+    decoded = decode_wire_mesh(wire)
+    npt.assert_array_equal(decoded.vertices, mesh.vertices)
+    npt.assert_array_equal(decoded.faces, mesh.faces)
+
+
+def test_wire_mesh_keeps_float64_vertices_float32_cannot_hold():
+    mesh = icosphere()
+    wire = encode_wire_mesh(mesh)
+    assert wire.vertices.dtype == np.float64
+    npt.assert_array_equal(decode_wire_mesh(wire).vertices, mesh.vertices)
+
+
+def test_wire_mesh_uses_uint32_faces_for_many_vertices():
+    mesh = icosphere(subdivisions=7)
+    assert len(mesh.vertices) > 2**16
+    wire = encode_wire_mesh(mesh)
+    assert wire.faces.dtype == np.uint32
+    npt.assert_array_equal(decode_wire_mesh(wire).faces, mesh.faces)
+
+
+def test_wire_mesh_compresses_large_arrays():
+    mesh = icosphere()
+    mesh.visual.vertex_colors = np.tile([10, 20, 30, 255], (len(mesh.vertices), 1))
+    wire = encode_wire_mesh(mesh, compress_min_bytes=len(mesh.vertices) * 4 + 1)
+    assert isinstance(wire.vertices, CompressedArray)
+    assert isinstance(wire.faces, CompressedArray)
+    # Colors are 4 bytes per vertex, just below the threshold
+    assert isinstance(wire.vertex_colors, np.ndarray)
+    decoded = decode_wire_mesh(wire)
+    npt.assert_array_equal(decoded.vertices, mesh.vertices)
+    npt.assert_array_equal(decoded.faces, mesh.faces)
+    npt.assert_array_equal(decoded.visual.vertex_colors, mesh.visual.vertex_colors)
+
+
+def test_wire_mesh_only_keeps_scadview_metadata():
+    mesh = set_mesh_color(box(), [0.1, 0.2, 0.3], 0.4)
+    mesh.metadata["file_name"] = "box.stl"
+    wire = encode_wire_mesh(mesh)
+    assert wire.metadata == {"scadview": mesh.metadata["scadview"]}
+
+
+def test_compact_writer_packs_unshared_meshes_as_wire_meshes():
+    writer = SharedMeshWriter(min_faces=100, compact=True)
+    assert isinstance(writer.pack(box()), WireMesh)
+    packed = writer.pack([box(), icosphere()])
+    assert isinstance(packed[0], WireMesh)
+    assert isinstance(packed[1], SharedMesh)
+    reader = SharedMeshReader()
+    unpacked = reader.unpack(packed)
+    npt.assert_array_equal(unpacked[0].faces, box().faces)
+    npt.assert_array_equal(unpacked[1].faces, icosphere().faces)
+
+
+def test_mesh_chunks_cover_every_face_in_order():
+    mesh = icosphere()
+    set_mesh_color(mesh, [1.0, 0.0, 0.0])
+    chunks = list(mesh_chunks(mesh, 500))
+    assert [c.first_face for c in chunks] == [0, 500, 1000]
+    assert [c.last for c in chunks] == [False, False, True]
+    npt.assert_allclose(
+        np.concatenate([c.triangles for c in chunks]), mesh.triangles, rtol=1e-6
+    )
+    npt.assert_array_equal(chunks[0].bounds, mesh.bounds)
+    assert chunks[0].metadata == {"scadview": mesh.metadata["scadview"]}
+    assert chunks[1].bounds is None and chunks[1].metadata is None
+
+
+def test_is_opaque():
+    mesh = box()
+    assert is_opaque(mesh)
+    set_mesh_color(mesh, [1.0, 0.0, 0.0], 0.5)
+    assert not is_opaque(mesh)
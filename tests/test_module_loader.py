@@ -1,6 +1,9 @@
+import os
+import sys
+
 import pytest
 
-from scadview.module_loader import ModuleLoader, yield_if_return
+from scadview.module_loader import ModuleLoader, imported_names, yield_if_return
 
 
 def test_yield_if_return():
@@ -101,3 +104,86 @@ def func_that_returns():
     loader = ModuleLoader("func_that_returns")
     assert list(loader.run_function(file_path1)) == [10]
     assert list(loader.run_function(file_path2)) == [20]
+
+
+def _write(path, source):
+    path.write_text(source)
+    # Make sure the change is seen even within the file system's mtime resolution
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def project(tmp_path):
+    """A main module importing a helper, which imports a slow module"""
+    _write(tmp_path / "inc_slow.py", "LOADS = []\nLOADS.append(1)\n")
+    _write(tmp_path / "inc_helper.py", "import inc_slow\nSIZE = 1\n")
+    _write(
+        tmp_path / "inc_main.py",
+        "from inc_helper import SIZE\nimport inc_slow\n\n"
+        "def create():\n    return SIZE, len(inc_slow.LOADS)\n",
+    )
+    yield tmp_path
+    for name in ["inc_slow", "inc_helper", "inc_main"]:
+        sys.modules.pop(name, None)
+
+
+def test_changed_helper_is_reloaded(project):
+    loader = ModuleLoader("create")
+    assert list(loader.run_function(str(project / "inc_main.py"))) == [(1, 1)]
+    _write(project / "inc_helper.py", "import inc_slow\nSIZE = 22\n")
+    # inc_slow is unchanged, so is not reloaded and LOADS keeps one entry
+    assert list(loader.run_function(str(project / "inc_main.py"))) == [(22, 1)]
+
+
+def test_dependents_of_changed_module_are_reloaded(project):
+    _write(project / "inc_helper.py", "import inc_slow\nSIZE = len(inc_slow.LOADS)\n")
+    loader = ModuleLoader("create")
+    assert list(loader.run_function(str(project / "inc_main.py"))) == [(1, 1)]
+    _write(project / "inc_slow.py", "LOADS = []\nLOADS.extend([1, 2])\n")
+    assert list(loader.run_function(str(project / "inc_main.py"))) == [(2, 2)]
+
+
+def test_unchanged_modules_are_not_reloaded(project):
+    loader = ModuleLoader("create")
+    list(loader.run_function(str(project / "inc_main.py")))
+    helper = sys.modules["inc_helper"]
+    helper.SIZE = 5  # Would be reset by a reload
+    assert list(loader.run_function(str(project / "inc_main.py"))) == [(5, 1)]
+
+
+def test_deleted_helper_fails_import(project):
+    loader = ModuleLoader("create")
+    list(loader.run_function(str(project / "inc_main.py")))
+    os.remove(project / "inc_helper.py")
+    with pytest.raises(ImportError):
+        list(loader.run_function(str(project / "inc_main.py")))
+
+
+def test_project_root_modules_are_reloaded(tmp_path):
+    lib = tmp_path / "lib"
+    lib.mkdir()
+    scripts = tmp_path / "scripts"
+    scripts.mkdir()
+    _write(lib / "inc_lib.py", "SIZE = 1\n")
+    _write(
+        scripts / "inc_script.py",
+        f"import sys\nsys.path.insert(0, {str(lib)!r})\nfrom inc_lib import SIZE\n\n"
+        "def create():\n    return SIZE\n",
+    )
+    loader = ModuleLoader("create", project_root=str(tmp_path))
+    try:
+        assert list(loader.run_function(str(scripts / "inc_script.py"))) == [1]
+        _write(lib / "inc_lib.py", "SIZE = 333\n")
+        assert list(loader.run_function(str(scripts / "inc_script.py"))) == [333]
+    finally:
+        sys.path.remove(str(lib))
+        for name in ["inc_lib", "inc_script"]:
+            sys.modules.pop(name, None)
+
+
+def test_imported_names_resolves_relative_imports(tmp_path):
+    path = tmp_path / "mod.py"
+    path.write_text("import a.b\nfrom . import c\nfrom .d import e\nfrom f import g\n")
+    names = imported_names(str(path), "pkg.sub")
+    assert {"a", "a.b", "pkg.sub", "pkg.sub.c", "pkg.sub.d", "f", "f.g"} <= names
@@ -28,6 +28,22 @@ def test_unsubscribe():
     assert results == []
 
 
+def test_unsubscribe_bound_method():
+    observable = Observable()
+    results = []
+
+    class TestObserver:
+        def callback(self, arg):
+            results.append(arg)
+
+    observer = TestObserver()
+    observable.subscribe(observer.callback)
+    observable.unsubscribe(observer.callback)
+    observable.notify("test")
+
+    assert results == []
+
+
 def test_multiple_subscribers():
     observable = Observable()
     results = []
@@ -0,0 +1,57 @@
+import pytest
+
+from scadview.parameters import (
+    Parameter,
+    create_mesh_parameters,
+    neighbour_values,
+    with_value,
+)
+
+
+def test_parameters_with_literal_defaults_are_found(tmp_path):
+    path = tmp_path / "model.py"
+    path.write_text(
+        """
+SIZE = 3
+
+def create_mesh(count, width=2.0, sides=6, /, *, hollow=False, label="a", size=SIZE):
+    pass
+"""
+    )
+    assert create_mesh_parameters(str(path)) == [
+        Parameter("width", 2.0),
+        Parameter("sides", 6),
+        Parameter("hollow", False),
+        Parameter("label", "a"),
+    ]
+
+
+def test_unreadable_module_has_no_parameters(tmp_path):
+    assert create_mesh_parameters(str(tmp_path / "missing.py")) == []
+    path = tmp_path / "broken.py"
+    path.write_text("def create_mesh(:\n")
+    assert create_mesh_parameters(str(path)) == []
+
+
+@pytest.mark.parametrize(
+    "default, step",
+    [(3, 1), (10.0, 1), (25.0, 1), (0.5, 0.01), (0.0, 0.1)],
+)
+def test_step(default, step):
+    assert Parameter("p", default).step == pytest.approx(step)
+
+
+def test_with_value_leaves_out_defaults():
+    width = Parameter("width", 2.0)
+    params = with_value({"sides": 5}, width, 3.0)
+    assert params == {"sides": 5, "width": 3.0}
+    assert with_value(params, width, 2.0) == {"sides": 5}
+
+
+def test_neighbours_continue_the_last_step_first():
+    sides = Parameter("sides", 6)
+    assert neighbour_values(sides, 7, previous=6) == [8, 6, 9, 5]
+    assert neighbour_values(sides, 5, previous=6) == [4, 6, 3, 7]
+    assert neighbour_values(Parameter("w", 0.1), 0.2) == [0.21, 0.19, 0.22, 0.18]
+    assert neighbour_values(Parameter("hollow", False), True) == [False]
+    assert neighbour_values(Parameter("label", "a"), "b") == []
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+from scadview.process_memory import peak_rss_bytes, reset_peak_rss, rss_bytes
+
+linux_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="Read from /proc on Linux"
+)
+
+
+@linux_only
+def test_rss_of_this_and_other_processes():
+    assert rss_bytes() > 0
+    assert rss_bytes(os.getpid()) > 0
+    assert rss_bytes(2**31 - 1) is None  # No such process
+
+
+def test_peak_rss_is_at_least_rss():
+    reset_peak_rss()
+    rss = rss_bytes()
+    peak = peak_rss_bytes()
+    assert peak is not None
+    if rss is not None:
+        assert peak >= rss
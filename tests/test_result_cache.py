@@ -0,0 +1,86 @@
+import sys
+import types
+
+import numpy.testing as npt
+import pytest
+from trimesh.creation import box
+
+from scadview.result_cache import ResultCache, user_module_files
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def module_path(tmp_path):
+    path = tmp_path / "model.py"
+    path.write_text("def create_mesh(): pass\n")
+    return path
+
+
+def _store(cache, module_path, frames):
+    entry = cache.begin(str(module_path))
+    for frame in frames:
+        entry.add(frame)
+    entry.commit()
+
+
+def test_miss_then_hit(cache, module_path):
+    assert cache.lookup(str(module_path)) is None
+    _store(cache, module_path, [box()])
+    frames = cache.lookup(str(module_path))
+    npt.assert_array_equal(frames[0].faces, box().faces)
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_stats_persist(cache, module_path):
+    cache.lookup(str(module_path))
+    assert ResultCache(cache.directory).stats.misses == 1
+
+
+def test_module_change_misses(cache, module_path):
+    _store(cache, module_path, [box()])
+    module_path.write_text("def create_mesh(): return None\n")
+    assert cache.lookup(str(module_path)) is None
+
+
+def test_helper_change_misses(cache, module_path, tmp_path, monkeypatch):
+    helper_path = tmp_path / "helper.py"
+    helper_path.write_text("SIZE = 1\n")
+    helper = types.ModuleType("helper")
+    helper.__file__ = str(helper_path)
+    monkeypatch.setitem(sys.modules, "helper", helper)
+    _store(cache, module_path, [box()])
+    assert cache.lookup(str(module_path)) is not None
+    helper_path.write_text("SIZE = 2\n")
+    assert cache.lookup(str(module_path)) is None
+
+
+def test_aborted_entry_is_not_stored(cache, module_path):
+    entry = cache.begin(str(module_path))
+    entry.add(box())
+    entry.abort()
+    entry.commit()
+    assert cache.lookup(str(module_path)) is None
+
+
+def test_user_module_files_excludes_the_module(module_path, tmp_path, monkeypatch):
+    helper = types.ModuleType("helper")
+    helper.__file__ = str(tmp_path / "helper.py")
+    model = types.ModuleType("model")
+    model.__file__ = str(module_path)
+    monkeypatch.setitem(sys.modules, "helper", helper)
+    monkeypatch.setitem(sys.modules, "model", model)
+    assert user_module_files(str(module_path)) == [str(tmp_path / "helper.py")]
+
+
+def test_parameters_are_part_of_the_key(cache, module_path):
+    entry = cache.begin(str(module_path), {"size": 2})
+    entry.add(box())
+    entry.commit()
+    assert cache.lookup(str(module_path)) is None
+    assert cache.lookup(str(module_path), {"size": 3}) is None
+    assert cache.lookup(str(module_path), {"size": 2}) is not None